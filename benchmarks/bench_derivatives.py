@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+下载后处理的基准：对一批合成 JPEG 封面生成 config.DERIVATIVE_SPECS 中的派生图片，对比
+旧做法（每种尺寸和格式各自完整解码一次原图，在当前进程中串行处理）与 DerivativePipeline
+（每张封面解码一次，JPEG 用 draft() 缩小解码，在进程池中并行处理）的总耗时。
+
+运行: python benchmarks/bench_derivatives.py [--covers 16] [--workers 4] [--size 1920x2700]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from PIL import Image  # noqa: E402
+
+from config.config import DERIVATIVE_SPECS  # noqa: E402
+from crawler.cover_store import CoverStore  # noqa: E402
+from crawler.derivatives import DerivativePipeline, derivative_path, supported_specs  # noqa: E402
+
+
+def make_covers(store: CoverStore, count: int, size: tuple) -> list:
+    """生成 count 张内容各不相同的 JPEG 封面，返回 [(内容哈希, 对象路径)]"""
+    covers = []
+    for i in range(count):
+        image = Image.effect_mandelbrot(size, (-2 + i * 0.05, -1.5, 1, 1.5), 100).convert('RGB')
+        path = os.path.join(store.root, f'{i}.jpg')
+        image.save(path, quality=90)
+        with open(path, 'rb') as f:
+            covers.append(store.put_bytes_if_absent(f.read(), '.jpg'))
+    return covers
+
+
+def legacy(covers: list, specs: list, root: str) -> None:
+    """旧做法：每个派生图片都重新打开并完整解码原图"""
+    for digest, path in covers:
+        for spec in specs:
+            with Image.open(path) as image:
+                image = image.convert('RGB')
+            height = round(image.height * spec.width / image.width)
+            output = derivative_path(root, digest, spec)
+            os.makedirs(os.path.dirname(output), exist_ok=True)
+            image.resize((spec.width, height), Image.LANCZOS).save(output, spec.format, quality=spec.quality)
+
+
+def pipeline(covers: list, specs: list, root: str, workers: int) -> None:
+    derivatives = DerivativePipeline(root, specs, workers)
+    futures = [derivatives.submit(path, digest) for digest, path in covers]
+    derivatives.close()
+    for future in futures:
+        future.result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--covers', type=int, default=16, help="封面数")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="进程池大小")
+    parser.add_argument('--size', default='1920x2700', help="原图分辨率 宽x高")
+    args = parser.parse_args()
+
+    size = tuple(int(v) for v in args.size.lower().split('x'))
+    specs = supported_specs(DERIVATIVE_SPECS)
+    workdir = tempfile.mkdtemp(prefix='anime-derivatives-')
+    try:
+        store = CoverStore(os.path.join(workdir, 'covers'))
+        os.makedirs(store.root)
+        covers = make_covers(store, args.covers, size)
+        print(f"{args.covers} 张 {size[0]}x{size[1]} 封面，每张 {len(specs)} 个派生图片: "
+              + ', '.join(f'{s.width}px {s.format}' for s in specs))
+
+        start = time.perf_counter()
+        legacy(covers, specs, os.path.join(workdir, 'legacy'))
+        before = time.perf_counter() - start
+
+        start = time.perf_counter()
+        pipeline(covers, specs, os.path.join(workdir, 'pipeline'), args.workers)
+        after = time.perf_counter() - start
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"  旧做法（串行，每个派生图片完整解码）  {before:>8.2f} s  {args.covers / before:>6.1f} 张/秒")
+    print(f"  DerivativePipeline（{args.workers} 个进程）      {after:>8.2f} s  {args.covers / after:>6.1f} 张/秒")
+    print(f"  加速 {before / after:.1f}x（含进程池启动）")
+
+
+if __name__ == '__main__':
+    main()
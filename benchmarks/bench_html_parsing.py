@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+网页解析的微基准：用与真实页面结构和大小相近的合成页面（4kvm 搜索页、MAL 搜索页和详情页、AniDB 搜索页），
+对比旧实现（html.parser 构建整个文档）与各解析后端只构建选择器所需子树时每页的 CPU 时间，
+并检查各方式提取出的结果一致。
+
+运行: python benchmarks/bench_html_parsing.py [--repeat 50] [--items 30] [--filler 400]
+"""
+
+import argparse
+import html
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from utils.html_parser import PARSERS, parse_html, resolve_parser  # noqa: E402
+
+_WORDS = ['名侦探柯南', '月色真美', '路人女主的养成方法', 'Re:Zero', '我们的重置人生', '进击的巨人',
+          'Kimi no Na wa', 'Saenai Heroine no Sodatekata', '剧场版', '第二季', 'OVA', 'Fate/stay night']
+
+
+def _filler(rng: random.Random, count: int) -> str:
+    """导航、侧栏、推荐列表、内联脚本等与结果无关的内容，真实页面的大部分字节都在这里"""
+    blocks = []
+    for i in range(count):
+        kind = i % 4
+        text = html.escape(' '.join(rng.choices(_WORDS, k=4)))
+        if kind == 0:
+            blocks.append(f'<li class="menu-item menu-item-{i}"><a href="/genre/{i}" title="{text}">{text}</a></li>')
+        elif kind == 1:
+            blocks.append(f'<div class="widget sidebar-{i}"><h3>{text}</h3><p>{text} {text}</p>'
+                          f'<img class="lazy" data-src="/img/side-{i}.jpg" alt="{text}"></div>')
+        elif kind == 2:
+            blocks.append(f'<table class="stats"><tr><td class="label">{i}</td><td>{text}</td></tr></table>')
+        else:
+            blocks.append(f'<script>window.__cfg_{i} = {{"id": {i}, "name": "{i}-{rng.random()}"}};</script>')
+    return f'<nav><ul>{"".join(blocks[::2])}</ul></nav><aside>{"".join(blocks[1::2])}</aside>'
+
+
+def _page(title: str, body: str, rng: random.Random, filler: int) -> str:
+    head = ''.join(f'<meta name="m{i}" content="{i}"><link rel="stylesheet" href="/css/{i}.css">' for i in range(20))
+    return (f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{html.escape(title)}</title>{head}</head>'
+            f'<body><header>{_filler(rng, filler // 4)}</header><main>{body}</main>'
+            f'<footer>{_filler(rng, filler)}</footer></body></html>')
+
+
+def make_fixtures(items: int, filler: int, seed: int = 0) -> dict:
+    """各来源的合成页面：名称 -> (页面, 只构建的元素, 提取函数)"""
+    rng = random.Random(seed)
+    titles = [' '.join(rng.choices(_WORDS, k=3)) for _ in range(items)]
+
+    fourkvm = ''.join(
+        f'<div class="result-item movies"><article>'
+        f'<div class="thumbnail animation-2"><a href="/m/{i}"><img src="/img/{i}.jpg" data-src="/img/{i}-l.jpg"></a></div>'
+        f'<div class="details"><div class="title"><a href="/m/{i}">{html.escape(t)}</a></div>'
+        f'<div class="meta"><span class="year">20{i:02d}</span></div><div class="contenido"><p>{html.escape(t)}</p></div></div>'
+        f'</article></div>' for i, t in enumerate(titles))
+    mal_search = ''.join(
+        f'<tr><td class="borderClass"><div class="picSurround"><a class="hoverinfo_trigger" href="/anime/{i}/x">'
+        f'<img data-src="/r/50x70/{i}.jpg"></a></div></td><td class="borderClass"><a class="hoverinfo_trigger fw-b fl-l" '
+        f'href="https://myanimelist.net/anime/{i}/x"><strong>{html.escape(t)}</strong></a>'
+        f'<div class="pt4">{html.escape(t)} ...</div></td></tr>' for i, t in enumerate(titles))
+    mal_detail = (f'<div class="leftside"><div><a href="/anime/1/x/pics"><img class="lazyloaded" itemprop="image" '
+                  f'src="https://cdn.myanimelist.net/images/anime/1/1.jpg" alt="{html.escape(titles[0])}"></a></div>'
+                  + ''.join(f'<div class="spaceit_pad"><span class="dark_text">{i}:</span> {html.escape(t)}</div>'
+                            for i, t in enumerate(titles)) + '</div>')
+    anidb = ''.join(
+        f'<div class="thumb_anime g_bubble"><a href="/anime/{i}"><img src="/images/main/{i}.jpg"></a>'
+        f'<span class="anime_title">{html.escape(t)}</span><span class="date">{i}</span></div>'
+        for i, t in enumerate(titles))
+
+    def fourkvm_extract(soup):
+        return [(item.select_one('.thumbnail img')['data-src'], item.select_one('.details .title a').text.strip())
+                for item in soup.select('.result-item article')]
+
+    def mal_search_extract(soup):
+        link = soup.select_one('a.hoverinfo_trigger')
+        return link['href'], link.text.strip()
+
+    def mal_detail_extract(soup):
+        return soup.select_one('img[itemprop="image"]')['src']
+
+    def anidb_extract(soup):
+        item = soup.select_one('.thumb_anime')
+        return item.select_one('img')['src'], item.select_one('.anime_title').text.strip()
+
+    return {
+        '4kvm': (_page('搜索结果', f'<div class="search-page">{fourkvm}</div>', rng, filler), '.result-item', fourkvm_extract),
+        'mal_search': (_page('Anime Search', f'<table>{mal_search}</table>', rng, filler), 'a.hoverinfo_trigger',
+                       mal_search_extract),
+        'mal_detail': (_page(titles[0], mal_detail, rng, filler), 'img[itemprop="image"]', mal_detail_extract),
+        'anidb': (_page('Anime List', anidb, rng, filler), '.thumb_anime', anidb_extract),
+    }
+
+
+def cpu_time(func, repeat: int) -> float:
+    """func 每次调用的 CPU 时间中位数（秒）"""
+    samples = []
+    for _ in range(repeat):
+        start = time.process_time()
+        func()
+        samples.append(time.process_time() - start)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=50, help="每种方式解析每个页面的次数")
+    parser.add_argument('--items', type=int, default=30, help="每个页面的搜索结果数")
+    parser.add_argument('--filler', type=int, default=400, help="每个页面中与结果无关的区块数")
+    args = parser.parse_args()
+
+    parsers = [p for p in PARSERS if resolve_parser(p) == p]
+    fixtures = make_fixtures(args.items, args.filler)
+    methods = [('html.parser 整页（旧）', 'html.parser', None)]
+    methods += [(f'{p} 整页', p, None) for p in parsers if p != 'html.parser']
+    methods += [(f'{p} 只解析子树', p, True) for p in parsers]
+
+    print(f"每页 CPU 时间中位数（毫秒），{args.repeat} 次:")
+    print(f"  {'页面':<12}{'大小':>8}" + ''.join(f"{label:>24}" for label, _, _ in methods))
+    totals = [0.0] * len(methods)
+    for name, (markup, only, extract) in fixtures.items():
+        expected = extract(parse_html(markup, parser='html.parser'))
+        row = []
+        for i, (label, backend, strained) in enumerate(methods):
+            target = only if strained else None
+            if extract(parse_html(markup, target, backend)) != expected:
+                raise SystemExit(f"{name}: {label} 提取的结果与整页解析不一致")
+            seconds = cpu_time(lambda: extract(parse_html(markup, target, backend)), args.repeat)
+            totals[i] += seconds
+            row.append(seconds)
+        print(f"  {name:<12}{len(markup.encode()) // 1024:>6}KB" + ''.join(f"{s * 1000:>24.2f}" for s in row))
+    print(f"  {'合计':<12}{'':>8}" + ''.join(f"{s * 1000:>24.2f}" for s in totals))
+    print(f"\n只解析子树（{methods[-len(parsers)][0].split()[0]}）相对旧实现: {totals[0] / totals[-len(parsers)]:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+离线端到端基准：在本地替身服务器上运行 AnimeDownloader.get_covers / download_image
+以及 scraper.start_scraping，报告每个标题的延迟分位数、批量吞吐量、传输字节数和峰值内存。
+
+替身服务器运行在子进程中（不计入峰值 RSS），所有状态（缓存、索引、封面、Cookie）写入临时目录，
+每次运行都从冷启动开始。结果以 JSON 保存，可用 --compare 与其他提交的结果对比。
+
+运行:
+    python benchmarks/bench_sources.py --titles 1000 --workers 16 --latency 0.02 --output after.json
+    python benchmarks/bench_sources.py --titles 1000 --workers 16 --latency 0.02 --compare before.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(BENCH_DIR, '..', 'src')
+sys.path.insert(0, SRC_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import standin_servers  # noqa: E402
+
+# 替身服务器可以模拟的来源（iyf 依赖 Selenium，不参与测试）
+SOURCES = ('4kvm', 'bilibili', 'bangumi', 'myanimelist', 'anidb', 'anilist')
+
+
+def percentiles(samples, points=(50, 90, 99)) -> dict:
+    """最近秩法计算分位数（秒）"""
+    if not samples:
+        return {f'p{p}': None for p in points}
+    ordered = sorted(samples)
+    result = {f'p{p}': ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))]
+              for p in points}
+    result['mean'] = sum(ordered) / len(ordered)
+    result['max'] = ordered[-1]
+    return result
+
+
+def peak_rss_mb() -> float:
+    """当前进程的峰值常驻内存（MB），Linux 上 ru_maxrss 单位为 KB，macOS 上为字节"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def server_stats(base_url: str) -> dict:
+    return requests.get(f'{base_url}/__stats/', timeout=10).json()
+
+
+def traffic_delta(before: dict, after: dict) -> dict:
+    """两次统计之间各主机的请求数和字节数"""
+    hosts = {}
+    for host, stats in after.items():
+        old = before.get(host, {'requests': 0, 'bytes': 0})
+        requests_count = stats['requests'] - old['requests']
+        if requests_count:
+            hosts[host] = {'requests': requests_count, 'bytes': stats['bytes'] - old['bytes']}
+    return {
+        'requests': sum(h['requests'] for h in hosts.values()),
+        'bytes': sum(h['bytes'] for h in hosts.values()),
+        'hosts': hosts,
+    }
+
+
+def make_downloader(sources, workers: int, rate_limits: bool):
+    """创建启用指定来源的下载器；默认不限速，以测量客户端自身的开销"""
+    from crawler.multi_source_downloader import AnimeDownloader, AnimeSource
+    from utils.rate_limiter import HostRateLimiter
+
+    limiter = None if rate_limits else HostRateLimiter({}, (1e9, 1e9))
+    downloader = AnimeDownloader(rate_limiter=limiter)
+    methods = {
+        AnimeSource.FOURKVM: downloader._get_4kvm_cover,
+        AnimeSource.BILIBILI: downloader._get_bili_cover,
+        AnimeSource.BANGUMI: downloader._get_bangumi_cover,
+        AnimeSource.MAL: downloader._get_mal_cover,
+        AnimeSource.ANIDB: downloader._get_anidb_cover,
+        AnimeSource.ANILIST: downloader._get_anilist_cover,
+    }
+    downloader.sources = {source: method for source, method in methods.items() if source.value in sources}
+    downloader.show_progress = False
+    return downloader
+
+
+def bench_downloader(args, base_url: str) -> dict:
+    """并发处理 args.titles 个标题：get_covers 后下载质量最高的封面"""
+    downloader = make_downloader(args.sources, args.workers, args.rate_limits)
+    titles = [f'基准动漫{i:05d}' for i in range(args.titles)]
+    search_times, download_times, title_times = [], [], []
+    counts = {'ok': 0, 'not_found': 0, 'failed': 0}
+    counts_lock = threading.Lock()
+
+    def run(title):
+        start = time.perf_counter()
+        results = downloader.get_covers(title)
+        searched = time.perf_counter()
+        search_times.append(searched - start)
+        if not results:
+            with counts_lock:
+                counts['not_found'] += 1
+            return
+        best = max(results, key=lambda r: r.get('quality_score', 0))
+        path = downloader.download_image(best['url'], title, best['source'], result=best)
+        done = time.perf_counter()
+        download_times.append(done - searched)
+        title_times.append(done - start)
+        with counts_lock:
+            counts['ok' if path else 'failed'] += 1
+
+    before = server_stats(base_url)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        for future in [executor.submit(run, title) for title in titles]:
+            future.result()
+    elapsed = time.perf_counter() - start
+    return {
+        'titles': len(titles),
+        'elapsed': elapsed,
+        'titles_per_second': len(titles) / elapsed,
+        'status': counts,
+        'get_covers': percentiles(search_times),
+        'download_image': percentiles(download_times),
+        'per_title': percentiles(title_times),
+        'traffic': traffic_delta(before, server_stats(base_url)),
+    }
+
+
+def bench_scraper(args, base_url: str) -> dict:
+    """依次运行 scraper.start_scraping（其中包含固定的 1 秒等待，因此只测少量标题）"""
+    from crawler import scraper
+
+    times = []
+    before = server_stats(base_url)
+    for i in range(args.scraper_titles):
+        start = time.perf_counter()
+        scraper.start_scraping(f'单源动漫{i:05d}')
+        times.append(time.perf_counter() - start)
+    return {
+        'titles': args.scraper_titles,
+        'per_title': percentiles(times),
+        'traffic': traffic_delta(before, server_stats(base_url)),
+    }
+
+
+def print_report(report: dict, baseline: dict = None) -> None:
+    def line(label, value, old=None, unit='', digits=4):
+        text = f"  {label:<28}{value:>12.{digits}f}{unit}"
+        if old:
+            text += f"   ({(value - old) / old * 100:+.1f}%)"
+        print(text)
+
+    def section(name):
+        return (baseline or {}).get(name) or {}
+
+    down, old_down = report.get('downloader'), section('downloader')
+    if down:
+        print(f"\n下载器: {down['titles']} 个标题, 状态 {down['status']}")
+        line('吞吐量 (标题/秒)', down['titles_per_second'], old_down.get('titles_per_second'), digits=1)
+        for stage in ('get_covers', 'download_image', 'per_title'):
+            for point in ('p50', 'p90', 'p99'):
+                value = down[stage][point]
+                if value is not None:
+                    line(f'{stage} {point} (秒)', value, (old_down.get(stage) or {}).get(point))
+        line('请求数', down['traffic']['requests'], (old_down.get('traffic') or {}).get('requests'), digits=0)
+        line('传输 (MB)', down['traffic']['bytes'] / 1048576,
+             ((old_down.get('traffic') or {}).get('bytes') or 0) / 1048576 or None, digits=2)
+    scr, old_scr = report.get('scraper'), section('scraper')
+    if scr:
+        print(f"\nscraper.start_scraping: {scr['titles']} 个标题")
+        line('per_title p50 (秒)', scr['per_title']['p50'], (old_scr.get('per_title') or {}).get('p50'))
+        line('传输 (MB)', scr['traffic']['bytes'] / 1048576, digits=2)
+    line('峰值 RSS (MB)', report['peak_rss_mb'], (baseline or {}).get('peak_rss_mb'), digits=1)
+
+    # 各来源、各阶段的累计耗时
+    stages = [item for item in report.get('metrics', []) if item['type'] == 'timer']
+    if stages:
+        print("\n阶段耗时（累计秒 / 次数）:")
+        for item in sorted(stages, key=lambda x: -x['sum']):
+            labels = item['labels']
+            print(f"  {labels.get('source', '-'):<12}{labels.get('stage', ''):<10}{item['sum']:>10.2f}{item['count']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--titles', type=int, default=1000, help="下载器测试的标题数")
+    parser.add_argument('--workers', type=int, default=16, help="同时处理的标题数")
+    parser.add_argument('--sources', default=','.join(SOURCES), help="启用的来源，逗号分隔")
+    parser.add_argument('--latency', type=float, default=0.02, help="替身服务器的平均延迟（秒）")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="替身服务器返回 503 的比例")
+    parser.add_argument('--candidates', type=int, default=10, help="每次搜索返回的条目数")
+    parser.add_argument('--image-size', default='1000x1400', help="封面分辨率，如 1000x1400")
+    parser.add_argument('--image-kb', type=int, default=300, help="封面文件大小（KB）")
+    parser.add_argument('--scraper-titles', type=int, default=5, help="scraper.start_scraping 的标题数，0 表示跳过")
+    parser.add_argument('--rate-limits', action='store_true', help="使用配置中的按主机限速（默认不限速）")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--keep-workdir', action='store_true', help="保留临时工作目录以便检查")
+    parser.add_argument('--output', help="结果 JSON 文件")
+    parser.add_argument('--compare', help="与之前保存的结果 JSON 对比")
+    args = parser.parse_args()
+    args.sources = [source.strip() for source in args.sources.split(',') if source.strip()]
+    width, height = (int(v) for v in args.image_size.lower().split('x'))
+
+    config = standin_servers.StandinConfig(args.latency, args.error_rate, args.candidates,
+                                           (width, height), args.image_kb * 1024, args.seed)
+    ready = multiprocessing.Queue()
+    server = multiprocessing.Process(target=standin_servers.serve, args=(config, 0, ready), daemon=True)
+    server.start()
+    base_url = f'http://127.0.0.1:{ready.get(timeout=30)}'
+    standin_servers.install(base_url, pool_maxsize=args.workers * 4)
+
+    invoked_from = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix='anime-bench-')
+    os.chdir(workdir)
+    logging.disable(logging.CRITICAL)
+    report = {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'params': {k: v for k, v in vars(args).items() if k not in ('output', 'compare', 'keep_workdir')},
+    }
+    try:
+        # 被测代码的输出和日志很多，测试期间丢弃
+        with contextlib.redirect_stdout(io.StringIO()):
+            report['downloader'] = bench_downloader(args, base_url) if args.titles else None
+            report['scraper'] = bench_scraper(args, base_url) if args.scraper_titles else None
+    finally:
+        logging.disable(logging.NOTSET)
+        server.terminate()
+    report['peak_rss_mb'] = peak_rss_mb()
+    from utils.metrics import METRICS
+    report['metrics'] = METRICS.snapshot()
+
+    baseline = None
+    if args.compare:
+        with open(os.path.join(invoked_from, args.compare), encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"对比基线: {baseline.get('revision')} -> 当前: {report['revision']}")
+    print_report(report, baseline)
+    os.chdir(invoked_from)
+    if args.keep_workdir:
+        print(f"\n工作目录: {workdir}")
+    else:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if args.output:
+        with open(os.path.join(invoked_from, args.output), 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
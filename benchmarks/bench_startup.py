@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+命令行启动开销基准：每次在新的 Python 进程和空的工作目录中导入 main_multi、创建 AnimeDownloader，
+并只启用 AniList 查询一个标题，测量从开始导入到发出第一个请求的时间。
+
+同时用 python -X importtime 列出导入最慢的模块，便于定位新引入的重量级依赖。
+请求发往本地替身服务器（见 standin_servers.py），不访问真实网站。
+
+运行:
+    python benchmarks/bench_startup.py --runs 20 --target-ms 150
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.abspath(os.path.join(BENCH_DIR, '..', 'src'))
+sys.path.insert(0, BENCH_DIR)
+
+
+def child(base_url: str) -> None:
+    """在子进程中运行：导入、创建下载器、查询一个标题，输出各时间点（秒）"""
+    start = time.perf_counter()
+    sys.path.insert(0, SRC_DIR)
+    import main_multi  # noqa: F401
+    from crawler.multi_source_downloader import AnimeDownloader, AnimeSource
+    imported = time.perf_counter()
+
+    # 替身服务器模块依赖 requests，放在计时之后导入，以免提前加载被测模块的依赖
+    import standin_servers
+    first_request = []
+    adapter = standin_servers.install(base_url)
+    send = adapter.send
+
+    def record_first(request, **kwargs):
+        if not first_request:
+            first_request.append(time.perf_counter())
+        return send(request, **kwargs)
+
+    adapter.send = record_first
+    downloader = AnimeDownloader()
+    downloader.sources = {AnimeSource.ANILIST: downloader._get_anilist_cover}
+    downloader.show_progress = False
+    constructed = time.perf_counter()
+    downloader.get_covers('启动基准')
+    done = time.perf_counter()
+    print(json.dumps({
+        'import': imported - start,
+        'construct': constructed - imported,
+        'first_request': first_request[0] - start if first_request else None,
+        'get_covers': done - constructed,
+        'modules': len(sys.modules),
+    }))
+
+
+def run_child(base_url: str) -> dict:
+    """在新进程和临时工作目录中运行一次 child，另外记录包括解释器启动在内的总耗时"""
+    workdir = tempfile.mkdtemp(prefix='anime-startup-')
+    try:
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', base_url],
+                                cwd=workdir, capture_output=True, text=True, check=True).stdout
+        wall = time.perf_counter() - start
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    result = json.loads(output.strip().splitlines()[-1])
+    result['process'] = wall
+    return result
+
+
+def slowest_imports(count: int) -> list:
+    """python -X importtime 中累计耗时最长的模块：[(模块, 毫秒)]"""
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import main_multi'],
+                            cwd=SRC_DIR, capture_output=True, text=True, check=True).stderr
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        modules.append((name.strip(), int(cumulative) / 1000))
+    return sorted(modules, key=lambda m: -m[1])[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=20, help="运行次数")
+    parser.add_argument('--target-ms', type=float, default=150, help="导入到第一个请求的中位数目标（毫秒）")
+    parser.add_argument('--top', type=int, default=15, help="列出的最慢导入模块数")
+    parser.add_argument('--output', help="结果 JSON 文件")
+    parser.add_argument('--child', metavar='URL', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(args.child)
+
+    import standin_servers
+
+    ready = multiprocessing.Queue()
+    server = multiprocessing.Process(target=standin_servers.serve,
+                                     args=(standin_servers.StandinConfig(), 0, ready), daemon=True)
+    server.start()
+    base_url = f'http://127.0.0.1:{ready.get(timeout=30)}'
+    try:
+        runs = [run_child(base_url) for _ in range(args.runs)]
+    finally:
+        server.terminate()
+
+    report = {key: statistics.median(run[key] for run in runs)
+              for key in ('import', 'construct', 'first_request', 'get_covers', 'process')}
+    report['modules'] = runs[-1]['modules']
+    report['slowest_imports'] = slowest_imports(args.top)
+
+    print(f"{args.runs} 次运行的中位数（毫秒）:")
+    for key, label in (('import', '导入'), ('construct', '创建下载器'), ('first_request', '导入到第一个请求'),
+                       ('get_covers', 'get_covers'), ('process', '进程总耗时')):
+        print(f"  {label:<16}{report[key] * 1000:>10.1f}")
+    print(f"  已加载模块数      {report['modules']:>10}")
+    print(f"\n导入最慢的模块（累计毫秒）:")
+    for name, ms in report['slowest_imports']:
+        print(f"  {name:<48}{ms:>8.1f}")
+    passed = report['first_request'] * 1000 <= args.target_ms
+    print(f"\n导入到第一个请求: {report['first_request'] * 1000:.1f} ms，目标 {args.target_ms:.0f} ms: "
+          f"{'通过' if passed else '未达标'}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == '__main__':
+    main()
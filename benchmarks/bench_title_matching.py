@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+标题清理与相似度打分的微基准：对比旧实现（每次构建 BeautifulSoup、逐个 fuzz.ratio、
+循环内重复标准化查询标题）与 TitleMatcher 的批量打分。
+
+运行: python benchmarks/bench_title_matching.py [--candidates 50] [--repeat 200]
+"""
+
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from rapidfuzz import fuzz  # noqa: E402
+
+from utils.title_matcher import TitleMatcher  # noqa: E402
+
+_WORDS = ['名侦探柯南', '月色真美', '路人女主的养成方法', 'Re:Zero', '我们的重置人生', '进击的巨人',
+          'Kimi no Na wa', 'Saenai Heroine no Sodatekata', '剧场版', '第二季', 'OVA', 'Fate/stay night']
+
+
+def legacy_clean_title(title: str) -> str:
+    """旧版 clean_title：每次调用导入 bs4 并构建完整的解析树"""
+    from bs4 import BeautifulSoup
+    if not title:
+        return ""
+    soup = BeautifulSoup(title, 'html.parser')
+    return soup.get_text().strip()
+
+
+def legacy_normalize_title(title: str) -> str:
+    """旧版 normalize_title：每次调用导入 re 并使用未编译的正则"""
+    import re
+    if not title:
+        return ""
+    return re.sub(r'[^\w]', '', title).lower()
+
+
+def legacy_scores(anime_name, titles):
+    """旧版各来源的打分循环"""
+    scores = []
+    for title in titles:
+        normalized = legacy_normalize_title(legacy_clean_title(title))
+        scores.append(int(round(fuzz.ratio(legacy_normalize_title(anime_name), normalized))))
+    return scores
+
+
+def make_candidates(count: int):
+    rng = random.Random(42)
+    titles = []
+    for _ in range(count):
+        words = rng.sample(_WORDS, 2)
+        # 约一半带 Bilibili 搜索结果中的 <em> 高亮标签
+        if rng.random() < 0.5:
+            words[0] = f'<em class="keyword">{words[0]}</em>'
+        titles.append(' '.join(words))
+    return titles
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--candidates', type=int, default=50, help="每次查询的候选标题数")
+    parser.add_argument('--repeat', type=int, default=200, help="重复查询次数")
+    args = parser.parse_args()
+
+    query = '名侦探柯南'
+    titles = make_candidates(args.candidates)
+    assert legacy_scores(query, titles) == TitleMatcher(query).scores(titles)
+
+    legacy = timeit.timeit(lambda: legacy_scores(query, titles), number=args.repeat)
+    batched = timeit.timeit(lambda: TitleMatcher(query).scores(titles), number=args.repeat)
+    per_query = 1000 / args.repeat
+    print(f"候选数 {args.candidates}，重复 {args.repeat} 次")
+    print(f"旧实现:       {legacy * per_query:8.3f} ms/查询")
+    print(f"TitleMatcher: {batched * per_query:8.3f} ms/查询")
+    print(f"加速比:       {legacy / batched:8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
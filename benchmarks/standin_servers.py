@@ -0,0 +1,318 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+各数据源的本地替身服务器，供离线基准测试使用。
+
+一个 HTTP 服务器按路径前缀模拟全部主机：请求 https://api.bgm.tv/search/subject/xx 时，
+StandinAdapter 会把它改写为 http://127.0.0.1:<port>/api.bgm.tv/search/subject/xx。
+响应内容按查询标题确定性生成，延迟、错误率、候选数和图片大小均可配置。
+GET /__stats 返回各主机的请求数和发送字节数。
+
+单独运行: python benchmarks/standin_servers.py --port 8765 --latency 0.05 --error-rate 0.01
+"""
+
+import argparse
+import html
+import io
+import json
+import random
+import re
+import sys
+import threading
+import time
+import zlib
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class StandinConfig:
+    """
+    替身服务器的行为配置。
+
+    Args:
+        latency (float): 每个请求的平均延迟（秒），实际延迟在 0.5 - 1.5 倍之间均匀分布。
+        error_rate (float): 返回 503 的请求比例（主页和统计接口除外）。
+        candidates (int): 每次搜索返回的条目数。
+        image_size (tuple): 封面图片分辨率 (宽, 高)。
+        image_bytes (int): 封面图片文件大小（字节），不足的部分在 JPEG 结束标记后填充。
+        seed (int): 随机数种子，保证相同配置下的延迟和错误序列可复现。
+    """
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, candidates: int = 10,
+                 image_size: tuple = (1000, 1400), image_bytes: int = 300 * 1024, seed: int = 0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.candidates = candidates
+        self.image_size = image_size
+        self.image_bytes = image_bytes
+        self.seed = seed
+
+
+def make_image(size: tuple, total_bytes: int) -> bytes:
+    """生成指定分辨率的 JPEG，并填充到指定字节数"""
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (200, 120, 80)).save(buffer, 'JPEG', quality=85)
+    data = buffer.getvalue()
+    return data + b'\0' * max(0, total_bytes - len(data))
+
+
+def _variants(query: str, count: int, suffix: str):
+    """第一个候选与查询标题完全相同，其余为续作标题"""
+    return [query] + [f"{query} {suffix}{i + 1}" for i in range(1, count)]
+
+
+def _item_id(query: str, index: int) -> int:
+    """由查询标题和序号生成稳定的条目 ID"""
+    return zlib.crc32(f'{query}#{index}'.encode('utf-8'))
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def config(self) -> StandinConfig:
+        return self.server.config
+
+    # ---- 通用 ----
+
+    def _send(self, status: int, body: bytes, content_type: str = 'application/json',
+              headers: dict = None) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+        self.server.count(self._host, len(body))
+
+    def _send_json(self, data, status: int = 200) -> None:
+        self._send(status, json.dumps(data, ensure_ascii=False).encode('utf-8'))
+
+    def _send_html(self, text: str) -> None:
+        self._send(200, text.encode('utf-8'), 'text/html; charset=utf-8')
+
+    def _split(self):
+        parts = urlsplit(self.path)
+        host, _, path = parts.path.lstrip('/').partition('/')
+        return host, '/' + path, parse_qs(parts.query)
+
+    def _delay_and_fail(self) -> bool:
+        """模拟延迟，按错误率返回 503；返回 True 表示已发送错误响应"""
+        rng = self.server.rng()
+        if self.config.latency:
+            time.sleep(self.config.latency * rng.uniform(0.5, 1.5))
+        if self.config.error_rate and rng.random() < self.config.error_rate:
+            self._send(503, b'{"error": "unavailable"}')
+            return True
+        return False
+
+    def do_GET(self):
+        self._dispatch()
+
+    def do_HEAD(self):
+        self._dispatch()
+
+    def do_POST(self):
+        self._dispatch()
+
+    def _dispatch(self):
+        host, path, query = self._split()
+        self._host = host
+        if host == '__stats':
+            body = json.dumps(self.server.snapshot()).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if path == '/' and host in ('www.bilibili.com', 'www.4kvm.net'):
+            # 会话预热的主页只下发 Cookie
+            return self._send(200, b'<html></html>', 'text/html',
+                              {'Set-Cookie': 'buvid3=standin; Path=/; Max-Age=86400'})
+        if self._delay_and_fail():
+            return
+        if re.search(r'\.(jpg|jpeg|png)$', path):
+            return self._image()
+        handler = {
+            'api.bgm.tv': self._bangumi,
+            'api.bilibili.com': self._bilibili,
+            'graphql.anilist.co': self._anilist,
+            'www.4kvm.net': self._fourkvm,
+            'myanimelist.net': self._mal,
+            'anidb.net': self._anidb,
+        }.get(host)
+        if handler is None:
+            return self._send(404, b'{}')
+        handler(path, query)
+
+    # ---- 图片（支持 Range 请求）----
+
+    def _image(self):
+        data = self.server.image
+        match = re.match(r'bytes=(\d+)-(\d*)$', self.headers.get('Range', ''))
+        if match:
+            start = int(match.group(1))
+            end = min(int(match.group(2)) if match.group(2) else len(data) - 1, len(data) - 1)
+            return self._send(206, data[start:end + 1], 'image/jpeg',
+                              {'Content-Range': f'bytes {start}-{end}/{len(data)}', 'Accept-Ranges': 'bytes'})
+        self._send(200, data, 'image/jpeg', {'Accept-Ranges': 'bytes'})
+
+    # ---- 各数据源 ----
+
+    def _bangumi(self, path, query):
+        name = unquote(path.rsplit('/', 1)[-1])
+        items = [{
+            'id': _item_id(name, i),
+            'name': title + '（日文）',
+            'name_cn': title,
+            'images': {'large': f'https://lain.bgm.tv/pic/cover/l/{_item_id(name, i)}.jpg'},
+        } for i, title in enumerate(_variants(name, self.config.candidates, '第'))]
+        self._send_json({'results': len(items), 'list': items})
+
+    def _bilibili(self, path, query):
+        name = query.get('keyword', [''])[0]
+        items = [{
+            'season_id': _item_id(name, i),
+            'title': f'<em class="keyword">{html.escape(name)}</em>{title[len(name):]}',
+            'org_title': title + '（原名）',
+            'cover': f'http://i0.hdslb.com/bfs/bangumi/{_item_id(name, i)}.jpg',
+        } for i, title in enumerate(_variants(name, self.config.candidates, '第'))]
+        self._send_json({'code': 0, 'data': {'result': items}})
+
+    def _anilist(self, path, query):
+        length = int(self.headers.get('Content-Length') or 0)
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        per_page = int((re.search(r'perPage: (\d+)', payload.get('query', '')) or [0, 10])[1])
+        data = {}
+        for variable, name in (payload.get('variables') or {}).items():
+            data['q' + variable[1:]] = {'media': [{
+                'id': _item_id(name, i),
+                'coverImage': {
+                    'extraLarge': f'https://s4.anilist.co/file/anilistcdn/media/anime/cover/large/{_item_id(name, i)}.jpg',
+                    'large': f'https://s4.anilist.co/file/anilistcdn/media/anime/cover/medium/{_item_id(name, i)}.jpg',
+                },
+                'title': {'romaji': title, 'english': None, 'native': title + '（日文）'},
+                'synonyms': [],
+            } for i, title in enumerate(_variants(name, min(per_page, self.config.candidates), 'Season '))]}
+        self._send_json({'data': data})
+
+    def _fourkvm(self, path, query):
+        name = query.get('s', [''])[0]
+        items = ''.join(
+            f'<div class="result-item"><article>'
+            f'<div class="thumbnail"><img src="https://www.4kvm.net/img/{_item_id(name, i)}.jpg"></div>'
+            f'<div class="details"><div class="title"><a href="#">{html.escape(title)}</a></div></div>'
+            f'</article></div>'
+            for i, title in enumerate(_variants(name, self.config.candidates, '第'))
+        )
+        self._send_html(f'<html><head><title>{html.escape(name)}</title></head><body>{items}</body></html>')
+
+    def _mal(self, path, query):
+        if path.startswith('/anime/'):
+            anime_id = path.split('/')[2]
+            return self._send_html(
+                f'<html><body><img itemprop="image" src="https://cdn.myanimelist.net/images/anime/{anime_id}.jpg">'
+                f'</body></html>'
+            )
+        name = query.get('q', [''])[0]
+        anime_id = _item_id(name, 0)
+        self._send_html(
+            f'<html><body><a class="hoverinfo_trigger" href="https://myanimelist.net/anime/{anime_id}/{quote(name)}">'
+            f'{html.escape(name)}</a></body></html>'
+        )
+
+    def _anidb(self, path, query):
+        name = query.get('adb.search', [''])[0]
+        self._send_html(
+            f'<html><body><div class="thumb_anime"><img src="/images/main/{_item_id(name, 0)}.jpg">'
+            f'<span class="anime_title">{html.escape(name)}</span></div></body></html>'
+        )
+
+
+class StandinServer(ThreadingHTTPServer):
+    """多线程替身服务器，记录每个主机的请求数和发送字节数"""
+
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, address, config: StandinConfig):
+        super().__init__(address, StandinHandler)
+        self.config = config
+        self.image = make_image(config.image_size, config.image_bytes)
+        self._stats = defaultdict(lambda: {'requests': 0, 'bytes': 0})
+        self._lock = threading.Lock()
+        self._rng = random.Random(config.seed)
+
+    def handle_error(self, request, client_address):
+        # 客户端提前关闭连接（如 Range 探测读够字节后断开）属于正常情况
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def rng(self) -> random.Random:
+        """每个请求从共享的种子序列派生独立的随机数生成器"""
+        with self._lock:
+            return random.Random(self._rng.random())
+
+    def count(self, host: str, size: int) -> None:
+        with self._lock:
+            self._stats[host]['requests'] += 1
+            self._stats[host]['bytes'] += size
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {host: dict(stats) for host, stats in self._stats.items()}
+
+
+def serve(config: StandinConfig, port: int = 0, ready=None) -> None:
+    """在当前进程中运行服务器；ready 为 multiprocessing 队列时通过它返回实际端口"""
+    server = StandinServer(('127.0.0.1', port), config)
+    if ready is not None:
+        ready.put(server.server_address[1])
+    server.serve_forever()
+
+
+class StandinAdapter(HTTPAdapter):
+    """把发往真实主机的请求改写到替身服务器，主机名作为路径前缀"""
+
+    def __init__(self, base_url: str, pool_maxsize: int = 64):
+        super().__init__(pool_connections=4, pool_maxsize=pool_maxsize)
+        self.base_url = base_url.rstrip('/')
+
+    def send(self, request, **kwargs):
+        parts = urlsplit(request.url)
+        if not request.url.startswith(self.base_url):
+            request.url = f"{self.base_url}/{parts.netloc}{parts.path}" + (f"?{parts.query}" if parts.query else '')
+        return super().send(request, **kwargs)
+
+
+def install(base_url: str, pool_maxsize: int = 64) -> StandinAdapter:
+    """让进程内所有 requests 会话（包括 requests.get 等模块级函数）都经过替身服务器"""
+    adapter = StandinAdapter(base_url, pool_maxsize)
+    requests.Session.get_adapter = lambda self, url: adapter
+    return adapter
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--candidates', type=int, default=10)
+    args = parser.parse_args()
+    print(f"替身服务器运行于 http://127.0.0.1:{args.port}")
+    serve(StandinConfig(args.latency, args.error_rate, args.candidates), args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,4 +4,130 @@
 BASE_URL = "https://example.com/anime"  # 替换为实际的动漫网站
 TIMEOUT = 10  # 请求超时时间（秒）
 MAX_RETRIES = 3  # 最大重试次数
-USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
\ No newline at end of file
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+
+# 按主机限速配置：主机名 -> (每秒请求数, 突发上限)
+HOST_RATE_LIMITS = {
+    'www.4kvm.net': (0.5, 2),
+    'www.bilibili.com': (0.5, 2),
+    'api.bilibili.com': (1, 3),
+    'api.bgm.tv': (2, 5),
+    'graphql.anilist.co': (1.5, 5),  # AniList 官方限制 90 次/分钟
+    'myanimelist.net': (0.3, 1),
+    'anidb.net': (0.5, 1),
+}
+# 未单独配置的主机（如图片 CDN）使用的默认限速
+DEFAULT_RATE_LIMIT = (5, 10)
+
+# 图片字节缓存：内存预算、写入临时目录的单张大小阈值、临时目录预算（字节）
+IMAGE_CACHE_MEMORY_BUDGET = 64 * 1024 * 1024
+IMAGE_CACHE_SPILL_THRESHOLD = 4 * 1024 * 1024
+IMAGE_CACHE_DISK_BUDGET = 512 * 1024 * 1024
+
+# 搜索 API 响应缓存：数据库路径、容量上限（字节）、各来源的有效期（秒）
+HTTP_CACHE_PATH = "cache/http_cache.sqlite3"
+HTTP_CACHE_MAX_BYTES = 256 * 1024 * 1024
+HTTP_CACHE_TTLS = {
+    'bangumi': 7 * 24 * 3600,
+    'bilibili': 24 * 3600,
+    'anilist': 7 * 24 * 3600,
+}
+
+# 封面保存目录
+COVERS_DIR = "covers"
+# 已下载封面索引（SQLite）
+COVER_INDEX_PATH = "covers/index.sqlite3"
+
+# 长期会话的 Cookie 保存目录及最长有效时间（秒）
+COOKIE_DIR = "cache/cookies"
+COOKIE_MAX_AGE = 24 * 3600
+
+# AniList 合并查询：每个请求最多包含的标题数，以及等待并发标题加入批次的时间（秒）
+ANILIST_BATCH_SIZE = 10
+ANILIST_BATCH_WINDOW = 0.05
+
+# 候选封面的两阶段评估：先按元数据排序，每个相似度档位最多探测前 K 张图片
+CANDIDATE_PROBE_TOP_K = 3
+
+# 本地别名索引（SQLite）及查询标题解析为已知作品所需的最低相似度
+ALIAS_INDEX_PATH = "cache/aliases.sqlite3"
+ALIAS_MIN_SIMILARITY = 90
+
+# 封面下载：超过 PART_SIZE 字节且服务器支持 Range 时，拆成最多 MAX_PARTS 个连接并行下载
+RANGE_DOWNLOAD_PART_SIZE = 1024 * 1024
+RANGE_DOWNLOAD_MAX_PARTS = 4
+
+# 调试快照：默认关闭，用 --capture-html 按来源开启（SOURCES 中 'all' 表示所有来源），开启后按 SAMPLE_RATE 抽样；
+# 搜索页在后台线程中 gzip 压缩写入 DIR，目录总大小超过 MAX_BYTES 时删除最旧的文件，
+# 等待写入的快照超过 QUEUE_SIZE 个时丢弃新快照
+DEBUG_CAPTURE_DIR = "temp_html"
+DEBUG_CAPTURE_MAX_BYTES = 50 * 1024 * 1024
+DEBUG_CAPTURE_SOURCES = ()
+DEBUG_CAPTURE_SAMPLE_RATE = 1.0
+DEBUG_CAPTURE_QUEUE_SIZE = 64
+
+# 下载后处理（--derivatives）：由每张封面生成的缩略图和其他格式，每项为 (最大宽度, 格式, 质量)，
+# 格式可选 JPEG、WEBP、AVIF、PNG；保存为 DIR/<哈希前两位>/<原图哈希>_<宽度>.<扩展名>，
+# 在 WORKERS 个进程中处理（None 为 CPU 核数），不阻塞下载
+DERIVATIVES_DIR = "covers/derivatives"
+DERIVATIVE_SPECS = (
+    (320, 'WEBP', 80),
+    (320, 'JPEG', 85),
+    (800, 'WEBP', 80),
+    (800, 'AVIF', 60),
+)
+DERIVATIVE_WORKERS = None
+
+# 网页解析后端：'lxml'（未安装时自动退回）或 'html.parser'；各来源只解析选择器需要的子树
+HTML_PARSER = 'lxml'
+
+# 质量目标模式（--target）：标题相似度下限，得到分辨率和相似度都达标的封面后不再等待其他来源
+QUALITY_TARGET_MIN_SIMILARITY = 95
+
+# 自适应超时：每个主机保留最近 LATENCY_WINDOW 个请求耗时，样本达到 LATENCY_MIN_SAMPLES 后
+# 超时取 p99 * FACTOR 并限制在 BOUNDS 之内，样本不足时使用 TIMEOUT
+LATENCY_WINDOW = 200
+LATENCY_MIN_SAMPLES = 20
+ADAPTIVE_TIMEOUT_FACTOR = 3
+ADAPTIVE_TIMEOUT_BOUNDS = (2, 30)
+
+# 对冲请求：GET 请求超过该主机的 p95 仍未返回时再发一份，对冲数不超过请求数的 HEDGE_MAX_RATIO；
+# HEDGE_POOL_SIZE 为发送可对冲请求的线程数
+HEDGE_PERCENTILE = 95
+HEDGE_MAX_RATIO = 0.1
+HEDGE_POOL_SIZE = 128
+
+# 来源熔断：连续失败 FAILURE_THRESHOLD 次，或最近 WINDOW 次查询中失败比例达到 ERROR_RATE 时，
+# 跳过该来源 COOLDOWN 秒，之后放行一次试探查询
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_ERROR_RATE = 0.5
+CIRCUIT_WINDOW = 20
+CIRCUIT_COOLDOWN = 300
+
+# 重试：连接错误、超时、429 / 5xx 最多尝试 MAX_RETRIES 次，退避从 BASE_DELAY 秒开始翻倍（全抖动），
+# 单次等待不超过 MAX_DELAY 秒（Retry-After 更长时放弃）；每个来源的重试数不超过请求数的 BUDGET_RATIO，
+# 可积攒 BUDGET_RESERVE 次
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 30
+RETRY_BUDGET_RATIO = 0.2
+RETRY_BUDGET_RESERVE = 10
+
+# 连接池：各主机保持的最大连接数（大致等于同时发往该主机的请求数，图片 CDN 需考虑分段下载的连接），
+# 未配置的主机使用 DEFAULT_POOL_SIZE
+HOST_POOL_SIZES = {
+    'www.4kvm.net': 4,
+    'api.bilibili.com': 4,
+    'i0.hdslb.com': 32,
+    'api.bgm.tv': 8,
+    'lain.bgm.tv': 32,
+    'graphql.anilist.co': 4,
+    's4.anilist.co': 32,
+    'myanimelist.net': 2,
+    'cdn.myanimelist.net': 16,
+    'anidb.net': 2,
+    'cdn.anidb.net': 16,
+}
+DEFAULT_POOL_SIZE = 16
+# 安装 httpx[http2] 后经 HTTP/2 访问的主机，多个并发请求复用一个连接；
+# 只列出不依赖 Cookie 的搜索 API 和图片 CDN（HTTP/2 适配器不会把 Set-Cookie 写回会话）
+HTTP2_HOSTS = ('graphql.anilist.co', 's4.anilist.co', 'api.bgm.tv', 'lain.bgm.tv', 'i0.hdslb.com')
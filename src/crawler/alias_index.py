@@ -0,0 +1,274 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from rapidfuzz import fuzz, process
+
+from utils.title_matcher import title_key
+
+# 各来源搜索时依次尝试的 (别名来源, 别名类型)：先用该来源自己记录的标题（AniList 用罗马音搜索效果最好），
+# 该来源还没有条目时借用其他来源记录的同语言标题，例如 AniList 借用 Bangumi 的日文原名或 Bilibili 的原标题，
+# 而不是退回原始查询（中文查询在 AniList 上通常搜不到，作品也就一直合并不到 AniList 的条目）
+SEARCH_KINDS = {
+    'anilist': (('anilist', 'romaji'), ('anilist', 'english'), ('anilist', 'native'),
+                ('bangumi', 'name'), ('bilibili', 'org_title')),
+    'bangumi': (('bangumi', 'name_cn'), ('bangumi', 'name'),
+                ('bilibili', 'title'), ('anilist', 'native')),
+    'bilibili': (('bilibili', 'title'), ('bilibili', 'org_title'),
+                 ('bangumi', 'name_cn'), ('anilist', 'native')),
+}
+
+# 倒排索引使用的字符 n-gram 长度；二元组对中文和罗马音都有足够的区分度
+NGRAM_SIZE = 2
+# 模糊查询时进入精确打分的候选别名数
+FUZZY_CANDIDATES = 20
+
+_DIGITS_RE = re.compile(r'\d+')
+
+
+def ngrams(key: str, n: int = NGRAM_SIZE) -> set:
+    """标题比较键的字符 n-gram 集合，短于 n 的键整体作为一个 gram"""
+    if len(key) <= n:
+        return {key} if key else set()
+    return {key[i:i + n] for i in range(len(key) - n + 1)}
+
+
+class AliasIndex:
+    """
+    本地多语言别名索引：把各来源搜索结果中的标题映射到稳定的作品 ID。
+
+    每个来源的条目（来源, 条目 ID）对应一个作品，记录其全部标题（如 Bangumi 的 name_cn / name，
+    AniList 的 romaji / english / native / synonyms，Bilibili 的 title / org_title），
+    以及搜索后实际选中的封面 URL（见 set_cover）。
+    不同来源的条目只要有一个标题完全相同（且该标题不属于多个作品），就归入同一作品；
+    同一来源的两个条目（如同名的新旧两版）不会合并，共用的标题因此属于多个作品，查询它时不会得出结果。
+    这样中文查询可以直接得到 AniList 需要的罗马音，或者直接得到已知的封面 URL，
+    无需翻译，也无需额外的搜索请求。
+
+    模糊查询通过内存中的 n-gram 倒排索引筛选候选别名，再用 fuzz.ratio 精确打分。
+
+    Args:
+        path (str): SQLite 数据库文件路径。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        # 倒排索引：gram -> 别名下标；首次模糊查询时从数据库构建，之后随写入增量更新
+        self._postings: Optional[Dict[str, List[int]]] = None
+        self._alias_keys: List[str] = []
+        self._alias_works: List[int] = []
+        self._known: set = set()
+
+    def _connect(self) -> sqlite3.Connection:
+        """首次使用时打开数据库并建表"""
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS works (work_id INTEGER PRIMARY KEY AUTOINCREMENT, created_at REAL NOT NULL)')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                ' source TEXT NOT NULL,'
+                ' source_id TEXT NOT NULL,'
+                ' work_id INTEGER NOT NULL,'
+                ' cover_url TEXT,'
+                ' updated_at REAL NOT NULL,'
+                ' PRIMARY KEY (source, source_id))'
+            )
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS aliases ('
+                ' alias_key TEXT NOT NULL,'
+                ' work_id INTEGER NOT NULL,'
+                ' source TEXT NOT NULL,'
+                ' kind TEXT NOT NULL,'
+                ' alias TEXT NOT NULL,'
+                ' PRIMARY KEY (alias_key, work_id, source, kind))'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_aliases_work ON aliases (work_id)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_entries_work ON entries (work_id)')
+            self._conn = conn
+        return self._conn
+
+    def record(self, source: str, source_id, titles: Sequence[Tuple[str, str]],
+               cover_url: Optional[str] = None) -> Optional[int]:
+        """
+        记录一个来源条目及其标题，返回所属的作品 ID。
+
+        Args:
+            source (str): 来源名称（AnimeSource 的值）。
+            source_id: 条目在来源中的 ID。
+            titles (Sequence[Tuple[str, str]]): (类型, 标题) 列表，类型如 'romaji'、'name_cn'、'synonym'。
+            cover_url (str): 条目被选中时的封面 URL；为 None 时保留已记录的封面。
+        """
+        return self.record_many(source, [(source_id, titles, cover_url)])[0]
+
+    def record_many(self, source: str,
+                    items: Iterable[Tuple[object, Sequence[Tuple[str, str]], Optional[str]]]) -> List[Optional[int]]:
+        """在一个事务中记录一次搜索返回的全部条目，参数含义同 record"""
+        work_ids = []
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                for source_id, titles, cover_url in items:
+                    work_ids.append(self._record_locked(conn, source, source_id, titles, cover_url))
+        return work_ids
+
+    def _record_locked(self, conn: sqlite3.Connection, source: str, source_id, titles, cover_url) -> Optional[int]:
+        aliases = [(kind, title.strip(), title_key(title)) for kind, title in titles if title and title.strip()]
+        aliases = [(kind, title, key) for kind, title, key in aliases if key]
+        if source_id is None or not aliases:
+            return None
+        source_id = str(source_id)
+        now = time.time()
+
+        row = conn.execute('SELECT work_id FROM entries WHERE source = ? AND source_id = ?',
+                           (source, source_id)).fetchone()
+        if row is not None:
+            work_id = row['work_id']
+        else:
+            work_id = self._match_work_locked(conn, {key for _, _, key in aliases}, source)
+            if work_id is None:
+                work_id = conn.execute('INSERT INTO works (created_at) VALUES (?)', (now,)).lastrowid
+        conn.execute('INSERT INTO entries VALUES (?, ?, ?, ?, ?) ON CONFLICT (source, source_id) DO UPDATE SET'
+                     ' cover_url = COALESCE(excluded.cover_url, cover_url), updated_at = excluded.updated_at',
+                     (source, source_id, work_id, cover_url, now))
+        for kind, title, key in aliases:
+            conn.execute('INSERT OR REPLACE INTO aliases VALUES (?, ?, ?, ?, ?)', (key, work_id, source, kind, title))
+            self._add_posting(key, work_id)
+        return work_id
+
+    @staticmethod
+    def _match_work_locked(conn: sqlite3.Connection, keys: set, source: str) -> Optional[int]:
+        """
+        找出与这些标题完全相同的已有作品。某个标题同时属于多个作品时不据此合并；
+        已有同一来源其他条目的作品也不合并，同一来源的不同条目是不同的作品。
+        """
+        matched = set()
+        for key in keys:
+            works = {row['work_id'] for row in conn.execute('SELECT DISTINCT work_id FROM aliases WHERE alias_key = ?', (key,))}
+            if len(works) == 1:
+                matched |= works
+        if len(matched) != 1:
+            return None
+        work_id = matched.pop()
+        taken = conn.execute('SELECT 1 FROM entries WHERE work_id = ? AND source = ? LIMIT 1', (work_id, source)).fetchone()
+        return None if taken else work_id
+
+    def set_cover(self, source: str, source_id, cover_url: str) -> None:
+        """记录某个来源条目在搜索后被选中的封面 URL，之后完全匹配的查询可以跳过该来源的搜索"""
+        if source_id is None:
+            return
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute('UPDATE entries SET cover_url = ?, updated_at = ? WHERE source = ? AND source_id = ?',
+                             (cover_url, time.time(), source, str(source_id)))
+
+    def _add_posting(self, key: str, work_id: int) -> None:
+        if self._postings is None or (key, work_id) in self._known:
+            return
+        self._known.add((key, work_id))
+        index = len(self._alias_keys)
+        self._alias_keys.append(key)
+        self._alias_works.append(work_id)
+        for gram in ngrams(key):
+            self._postings[gram].append(index)
+
+    def _ensure_postings_locked(self, conn: sqlite3.Connection) -> None:
+        """首次模糊查询时从数据库构建 n-gram 倒排索引"""
+        if self._postings is not None:
+            return
+        self._postings = defaultdict(list)
+        for row in conn.execute('SELECT DISTINCT alias_key, work_id FROM aliases'):
+            self._add_posting(row['alias_key'], row['work_id'])
+
+    def lookup(self, query: str, min_score: int = 90) -> Optional[Tuple[int, int]]:
+        """
+        查找查询标题对应的作品。
+
+        先查完全相同的别名，再通过 n-gram 倒排索引取重合度最高的 FUZZY_CANDIDATES 个别名，
+        用 fuzz.ratio 精确打分。模糊匹配要求标题中的数字完全一致，以免把续作（第二季、剧场版 2）
+        当成同一作品。
+
+        Returns:
+            Optional[Tuple[int, int]]: (作品 ID, 相似度)，未找到或匹配到多个作品时返回 None。
+        """
+        key = title_key(query)
+        if not key:
+            return None
+        with self._lock:
+            conn = self._connect()
+            works = {row['work_id'] for row in conn.execute('SELECT DISTINCT work_id FROM aliases WHERE alias_key = ?', (key,))}
+            if len(works) == 1:
+                return works.pop(), 100
+            if works:
+                return None
+            self._ensure_postings_locked(conn)
+            overlap = defaultdict(int)
+            for gram in ngrams(key):
+                for index in self._postings.get(gram, ()):
+                    overlap[index] += 1
+            shortlist = sorted(overlap, key=overlap.get, reverse=True)[:FUZZY_CANDIDATES]
+            digits = _DIGITS_RE.findall(key)
+            shortlist = [index for index in shortlist if _DIGITS_RE.findall(self._alias_keys[index]) == digits]
+            keys = [self._alias_keys[index] for index in shortlist]
+            work_ids = [self._alias_works[index] for index in shortlist]
+
+        if not keys:
+            return None
+        _, score, position = process.extractOne(key, keys, scorer=fuzz.ratio)
+        score = int(round(score))
+        return (work_ids[position], score) if score >= min_score else None
+
+    def resolve(self, query: str, min_score: int = 90) -> Optional[Dict]:
+        """
+        把查询标题解析为作品信息。
+
+        某个来源还没有条目时，搜索词取其他来源记录的同语言标题（见 SEARCH_KINDS）。
+        作品在某个来源有多个条目时（旧版本可能把同一来源的不同条目合并进同一作品），
+        该来源的封面无法确定，不出现在 covers 中，调用方会重新搜索。
+
+        Returns:
+            Optional[Dict]: {'work_id', 'similarity', 'terms': {来源: 搜索词}, 'covers': {来源: 封面 URL}}，
+            未找到时返回 None。
+        """
+        found = self.lookup(query, min_score)
+        if found is None:
+            return None
+        work_id, similarity = found
+        with self._lock:
+            conn = self._connect()
+            aliases = conn.execute('SELECT source, kind, alias FROM aliases WHERE work_id = ?', (work_id,)).fetchall()
+            entries = conn.execute('SELECT source, cover_url FROM entries WHERE work_id = ?', (work_id,)).fetchall()
+
+        known = {(row['source'], row['kind']): row['alias'] for row in aliases if row['alias']}
+        terms = {}
+        for source, kinds in SEARCH_KINDS.items():
+            for key in kinds:
+                if key in known:
+                    terms[source] = known[key]
+                    break
+        by_source = defaultdict(list)
+        for row in entries:
+            by_source[row['source']].append(row['cover_url'])
+        covers = {source: urls[0] for source, urls in by_source.items() if len(urls) == 1 and urls[0]}
+        return {'work_id': work_id, 'similarity': similarity, 'terms': terms, 'covers': covers}
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import requests
+
+from utils.http_cache import HttpCache
+
+logger = logging.getLogger(__name__)
+
+ANILIST_URL = 'https://graphql.anilist.co'
+
+# 每个搜索结果需要的字段
+MEDIA_FIELDS = 'id coverImage { extraLarge large } title { romaji english native } synonyms'
+
+
+def build_batch_query(count: int, per_page: int = 10) -> str:
+    """
+    生成包含 count 个别名搜索的 GraphQL 查询。
+
+    第 i 个搜索使用变量 $s{i}，结果位于 data.q{i}.media。
+    """
+    variables = ', '.join(f'$s{i}: String' for i in range(count))
+    pages = '\n'.join(
+        f'    q{i}: Page(page: 1, perPage: {per_page}) {{ media(search: $s{i}, type: ANIME) {{ {MEDIA_FIELDS} }} }}'
+        for i in range(count)
+    )
+    return f'query ({variables}) {{\n{pages}\n}}'
+
+
+class AniListError(requests.HTTPError):
+    """
+    AniList 在响应体中报告的 GraphQL 错误（HTTP 状态码可能是 200）。
+
+    status 为错误中给出的状态码（如限流时的 429），没有时为 500；暂时性的状态码会被 RetryPolicy 重试。
+    """
+
+    def __init__(self, message: str, status: int, response: requests.Response):
+        super().__init__(message, response=response)
+        self.status = status
+
+
+def _is_complexity_error(response: requests.Response) -> bool:
+    """AniList 是否因查询复杂度超限拒绝了请求"""
+    try:
+        errors = response.json().get('errors') or []
+    except ValueError:
+        return False
+    return any('complexity' in str(error.get('message', '')).lower() for error in errors)
+
+
+def _graphql_error(response: requests.Response) -> Optional[AniListError]:
+    """成功状态码的响应中带有 errors 或缺少 data 时返回对应的 AniListError"""
+    if not response.ok:
+        return None
+    try:
+        body = response.json()
+    except ValueError:
+        return AniListError("AniList: 响应不是 JSON", 500, response)
+    errors = body.get('errors') or []
+    if not errors and isinstance(body.get('data'), dict):
+        return None
+    messages = '; '.join(str(error.get('message', '')) for error in errors) or '响应缺少 data'
+    status = next((error['status'] for error in errors if isinstance(error.get('status'), int)), 500)
+    return AniListError(f"AniList: {messages}", status, response)
+
+
+def check_response(response: requests.Response) -> None:
+    """
+    每次尝试得到响应后调用（见 AnimeDownloader._request 的 validate），让 GraphQL 错误在重试策略内抛出。
+
+    复杂度超限不在这里抛出，由 AniListClient 拆分批次后重新请求。
+    """
+    if _is_complexity_error(response):
+        return
+    error = _graphql_error(response)
+    if error is not None:
+        raise error
+
+
+class _Call:
+    """等待合并请求结果的单个标题"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Optional[List[dict]] = None
+        self.error: Optional[BaseException] = None
+
+
+class AniListClient:
+    """
+    合并查询的 AniList 客户端：多个标题的搜索通过 GraphQL 别名放进同一个请求。
+
+    search() 会把 batch_window 秒内并发到达的标题合并为一批（最多 batch_size 个）；
+    search_many() 用于调用方已经持有标题列表的情况。查询复杂度超限时自动对半拆分重试。
+    传入 cache 时按标题缓存结果，命中的标题不会进入批次；响应带有 GraphQL 错误或缺少 data 时抛出
+    AniListError，整批都不写入缓存，响应中缺少某个标题的结果时该标题也不写入缓存。
+
+    Args:
+        request (Callable): 发送请求的函数，签名同 AnimeDownloader._request(method, url, validate=None, **kwargs)。
+        batch_size (int): 每个请求最多包含的标题数。
+        per_page (int): 每个标题返回的候选条目数。
+        batch_window (float): 等待其他并发标题加入批次的时间（秒）。
+        headers (dict): 附加的请求头。
+        cache (HttpCache): 按标题缓存搜索结果。
+        cache_ttl (float): 缓存有效期（秒）。
+    """
+
+    def __init__(self, request: Callable[..., requests.Response], batch_size: int = 10, per_page: int = 10,
+                 batch_window: float = 0.05, headers: Optional[Dict[str, str]] = None,
+                 cache: Optional[HttpCache] = None, cache_ttl: Optional[float] = None):
+        self.request = request
+        self.batch_size = max(1, batch_size)
+        self.per_page = per_page
+        self.batch_window = batch_window
+        self.headers = {'Content-Type': 'application/json', 'Accept': 'application/json', **(headers or {})}
+        self.cache = cache
+        self.cache_ttl = cache_ttl
+        self._queue: List[str] = []
+        self._pending: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+
+    def _cache_key(self, title: str) -> str:
+        return HttpCache.make_key('POST', ANILIST_URL, json_body={'search': title, 'perPage': self.per_page})
+
+    def _load_cached(self, title: str) -> Optional[List[dict]]:
+        if self.cache is None or not self.cache_ttl:
+            return None
+        entry = self.cache.get(self._cache_key(title))
+        if entry is None or time.time() - entry['fetched_at'] >= self.cache_ttl:
+            return None
+        return json.loads(entry['body'])
+
+    def _store_cached(self, title: str, media_list: List[dict]) -> None:
+        if self.cache is None or not self.cache_ttl:
+            return
+        body = json.dumps(media_list, ensure_ascii=False).encode('utf-8')
+        self.cache.put_body(self._cache_key(title), ANILIST_URL, body, {'Content-Type': 'application/json'})
+
+    def _execute(self, titles: List[str]) -> Dict[str, List[dict]]:
+        """发送一个合并请求，复杂度超限时对半拆分；GraphQL 错误抛出 AniListError"""
+        payload = {
+            'query': build_batch_query(len(titles), self.per_page),
+            'variables': {f's{i}': title for i, title in enumerate(titles)},
+        }
+        logger.debug(f"AniList: 合并查询 {len(titles)} 个标题")
+        response = self.request('POST', ANILIST_URL, json=payload, headers=self.headers, validate=check_response)
+        if len(titles) > 1 and _is_complexity_error(response):
+            middle = len(titles) // 2
+            logger.info(f"AniList: 查询复杂度超限，拆分为 {middle} + {len(titles) - middle} 个标题")
+            return {**self._execute(titles[:middle]), **self._execute(titles[middle:])}
+        response.raise_for_status()
+        error = _graphql_error(response)
+        if error is not None:
+            raise error
+
+        pages = response.json()['data']
+        results = {}
+        for i, title in enumerate(titles):
+            page = pages.get(f'q{i}')
+            if not isinstance(page, dict):
+                logger.warning(f"AniList: 响应中缺少标题 '{title}' 的结果")
+                results[title] = []
+                continue
+            media_list = page.get('media') or []
+            results[title] = media_list
+            self._store_cached(title, media_list)
+        return results
+
+    def search_many(self, titles: List[str]) -> Dict[str, List[dict]]:
+        """搜索多个标题，返回 标题 -> 候选条目列表；每 batch_size 个标题一个请求"""
+        results = {}
+        missing = []
+        for title in dict.fromkeys(titles):
+            cached = self._load_cached(title)
+            if cached is None:
+                missing.append(title)
+            else:
+                results[title] = cached
+        for start in range(0, len(missing), self.batch_size):
+            results.update(self._execute(missing[start:start + self.batch_size]))
+        return results
+
+    def search(self, title: str) -> List[dict]:
+        """搜索单个标题，与同一时间窗口内的其他并发搜索合并为一个请求"""
+        cached = self._load_cached(title)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            call = self._pending.get(title)
+            is_new = call is None
+            if is_new:
+                call = self._pending[title] = _Call()
+                self._queue.append(title)
+            # 第一个进入队列的调用方负责在时间窗口结束后发送；队列满时由填满它的调用方立即发送
+            is_first = is_new and len(self._queue) == 1
+            batch = self._take_locked() if len(self._queue) >= self.batch_size else None
+
+        if batch:
+            self._run(batch)
+        elif is_first:
+            time.sleep(self.batch_window)
+            with self._lock:
+                batch = self._take_locked()
+            if batch:
+                self._run(batch)
+
+        call.event.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def _take_locked(self) -> Dict[str, _Call]:
+        titles, self._queue = self._queue[:self.batch_size], self._queue[self.batch_size:]
+        return {title: self._pending.pop(title) for title in titles}
+
+    def _run(self, batch: Dict[str, _Call]) -> None:
+        try:
+            results = self._execute(list(batch))
+            for title, call in batch.items():
+                call.result = results.get(title, [])
+        except BaseException as e:
+            for call in batch.values():
+                call.error = e
+        finally:
+            for call in batch.values():
+                call.event.set()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, Optional
+
+from crawler.multi_source_downloader import AnimeDownloader, AnimeSource, QualityTarget, OUTCOME_NOT_FOUND
+
+logger = logging.getLogger(__name__)
+
+# 选择策略：只下载质量最高的封面，或下载所有来源的封面
+SELECT_BEST = 'best'
+SELECT_ALL = 'all'
+
+
+def iter_titles(path: str) -> Iterator[str]:
+    """逐行读取标题，path 为 "-" 时读取标准输入；跳过空行和 # 开头的注释行"""
+    stream = sys.stdin if path == '-' else open(path, encoding='utf-8')
+    try:
+        for line in stream:
+            title = line.strip()
+            if title and not title.startswith('#'):
+                yield title
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+class Checkpoint:
+    """
+    批量任务的进度文件（JSON Lines），每处理完一个标题追加一行。
+
+    重新运行时已成功处理（或确认所有来源都没有结果）的标题会被跳过，因此中断的任务可以从断点继续。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._done = set()
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # 进程被杀时最后一行可能不完整
+                        continue
+                    # 失败的标题在下次运行时重试
+                    if entry.get('status') != 'failed':
+                        self._done.add(entry['title'])
+
+    def is_done(self, title: str) -> bool:
+        with self._lock:
+            return title in self._done
+
+    def record(self, entry: Dict) -> None:
+        """追加一条处理结果并立即落盘"""
+        line = json.dumps(entry, ensure_ascii=False)
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            self._done.add(entry['title'])
+
+
+def process_title(downloader: AnimeDownloader, anime_name: str, select: str = SELECT_BEST,
+                  sources: Optional[list] = None, refresh: bool = False,
+                  target: Optional[QualityTarget] = None, deadline: Optional[float] = None) -> Dict:
+    """
+    搜索并下载单个标题的封面，不与用户交互。target 和 deadline 原样传给 get_covers。
+
+    只有所有启用的来源都正常返回且没有结果时才记为 not_found；有来源被熔断跳过、请求失败或超时
+    而没有得到任何结果时记为 failed，下次从断点继续时会重试。
+
+    Returns:
+        Dict: 处理结果，包含标题、状态（ok / not_found / failed）和已保存的文件。
+    """
+    outcome = {}
+    results = downloader.get_covers(anime_name, sources or list(AnimeSource), refresh=refresh,
+                                    target=target, deadline=deadline, outcome=outcome)
+    if not results:
+        unanswered = {source.value: state for source, state in outcome.items() if state != OUTCOME_NOT_FOUND}
+        if unanswered:
+            error = ', '.join(f"{source}: {state}" for source, state in unanswered.items())
+            return {'title': anime_name, 'status': 'failed', 'files': [], 'error': f"来源未返回结果（{error}）"}
+        return {'title': anime_name, 'status': 'not_found', 'files': []}
+
+    sorted_results = sorted(results, key=lambda x: x.get('quality_score', 0), reverse=True)
+    download_list = sorted_results if select == SELECT_ALL else sorted_results[:1]
+
+    files = []
+    for result in download_list:
+        saved_path = downloader.download_image(result['url'], anime_name, result['source'], result=result)
+        if saved_path:
+            files.append({
+                'source': result['source'],
+                'url': result['url'],
+                'resolution': list(result.get('resolution', (0, 0))),
+                'quality_score': result.get('quality_score', 0),
+                'path': saved_path,
+            })
+    return {'title': anime_name, 'status': 'ok' if files else 'failed', 'files': files}
+
+
+def run_batch(downloader: AnimeDownloader, titles: Iterable[str], select: str = SELECT_BEST,
+              workers: int = 4, checkpoint: Optional[Checkpoint] = None, refresh: bool = False,
+              target: Optional[QualityTarget] = None, deadline: Optional[float] = None) -> Dict[str, int]:
+    """
+    并发处理标题流，同时进行中的标题不超过 workers 个。
+
+    标题按需从 titles 中读取，不会一次性载入内存；已在 checkpoint 中记录的标题会被跳过。
+
+    Returns:
+        Dict[str, int]: 各状态的标题数量统计。
+    """
+    stats = {'ok': 0, 'not_found': 0, 'failed': 0, 'skipped': 0}
+    stats_lock = threading.Lock()
+    slots = threading.BoundedSemaphore(workers)
+
+    def worker(title: str) -> None:
+        try:
+            try:
+                entry = process_title(downloader, title, select, refresh=refresh, target=target, deadline=deadline)
+            except Exception as e:
+                logger.error(f"处理 {title} 失败: {str(e)}")
+                entry = {'title': title, 'status': 'failed', 'files': [], 'error': str(e)}
+            if checkpoint is not None:
+                checkpoint.record(entry)
+            with stats_lock:
+                stats[entry['status']] += 1
+            print(f"[{entry['status']}] {title} ({len(entry['files'])} 个文件)")
+        finally:
+            slots.release()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for title in titles:
+            if checkpoint is not None and checkpoint.is_done(title):
+                with stats_lock:
+                    stats['skipped'] += 1
+                continue
+            slots.acquire()
+            executor.submit(worker, title)
+    return stats
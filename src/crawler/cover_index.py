@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from utils.title_matcher import title_key
+
+# 按分辨率和文件大小排序，与各来源写入的 quality_score 的单位无关（旧版本写入的评分单位不一致）
+_QUALITY_ORDER = 'width * height * file_size DESC'
+
+_COLUMNS = ('title_key', 'source', 'title', 'url', 'width', 'height', 'file_size',
+            'quality_score', 'content_hash', 'path', 'fetched_at')
+
+
+def quality_score(resolution: Tuple[int, int], file_size: float) -> float:
+    """质量评分 = 宽度 × 高度 × 文件大小（MB），所有来源和下载记录统一使用"""
+    return resolution[0] * resolution[1] * file_size
+
+
+class CoverIndex:
+    """
+    已下载封面的 SQLite 索引，按（标准化标题, 来源）唯一。
+
+    记录 URL、分辨率、文件大小（字节）、质量评分、内容哈希、文件路径和获取时间，
+    用于跳过已完成的搜索和下载，并快速查询某个标题已有的最佳封面。
+
+    Args:
+        path (str): SQLite 数据库文件路径。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """首次使用时打开数据库并建表"""
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS covers ('
+                ' title_key TEXT NOT NULL,'
+                ' source TEXT NOT NULL,'
+                ' title TEXT NOT NULL,'
+                ' url TEXT NOT NULL,'
+                ' width INTEGER NOT NULL,'
+                ' height INTEGER NOT NULL,'
+                ' file_size INTEGER NOT NULL,'
+                ' quality_score REAL NOT NULL,'
+                ' content_hash TEXT NOT NULL,'
+                ' path TEXT NOT NULL,'
+                ' fetched_at REAL NOT NULL,'
+                ' PRIMARY KEY (title_key, source))'
+            )
+            self._conn = conn
+        return self._conn
+
+    def record(self, anime_name: str, source: str, title: str, url: str, resolution: Tuple[int, int],
+               file_size: int, quality_score: float, content_hash: str, path: str) -> None:
+        """写入或更新一条下载记录"""
+        row = (title_key(anime_name), source, title, url, resolution[0], resolution[1], file_size,
+               quality_score, content_hash, path, time.time())
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute(f"INSERT OR REPLACE INTO covers ({', '.join(_COLUMNS)}) "
+                             f"VALUES ({', '.join('?' * len(_COLUMNS))})", row)
+
+    def get(self, anime_name: str, source: str) -> Optional[Dict]:
+        """查询某个标题在某个来源的记录"""
+        with self._lock:
+            row = self._connect().execute(
+                'SELECT * FROM covers WHERE title_key = ? AND source = ?', (title_key(anime_name), source)
+            ).fetchone()
+        return _to_result(row) if row else None
+
+    def all(self, anime_name: str) -> List[Dict]:
+        """查询某个标题的全部记录，按分辨率 × 文件大小从高到低排序"""
+        with self._lock:
+            rows = self._connect().execute(
+                f'SELECT * FROM covers WHERE title_key = ? ORDER BY {_QUALITY_ORDER}', (title_key(anime_name),)
+            ).fetchall()
+        return [_to_result(row) for row in rows]
+
+    def best(self, anime_name: str) -> Optional[Dict]:
+        """查询某个标题已有的质量最高的封面"""
+        with self._lock:
+            row = self._connect().execute(
+                f'SELECT * FROM covers WHERE title_key = ? ORDER BY {_QUALITY_ORDER} LIMIT 1',
+                (title_key(anime_name),)
+            ).fetchone()
+        return _to_result(row) if row else None
+
+    def remove(self, anime_name: str, source: str) -> None:
+        """删除记录（例如文件已被手动删除）"""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute('DELETE FROM covers WHERE title_key = ? AND source = ?', (title_key(anime_name), source))
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def _to_result(row: sqlite3.Row) -> Dict:
+    """将索引记录转换为与 get_covers 返回项一致的字典"""
+    return {
+        'url': row['url'],
+        'title': row['title'],
+        'source': row['source'],
+        'resolution': (row['width'], row['height']),
+        'file_size': row['file_size'] / (1024 * 1024),  # MB
+        'quality_score': row['quality_score'],
+        'content_hash': row['content_hash'],
+        'path': row['path'],
+        'fetched_at': row['fetched_at'],
+    }
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import threading
+from typing import Iterable, Tuple
+from urllib.parse import urlparse
+
+# 文件名中不允许出现的字符
+_UNSAFE_CHARS = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+
+
+def guess_extension(url: str) -> str:
+    """根据图片 URL 推断扩展名，无法识别时使用 .jpg"""
+    ext = os.path.splitext(urlparse(url).path)[1].lower()
+    return ext if ext in ('.jpg', '.jpeg', '.png', '.webp', '.gif') else '.jpg'
+
+
+def _fsync_dir(directory: str) -> None:
+    """把目录项的变化（新建、重命名）刷到磁盘；不支持打开目录的平台（Windows）上跳过"""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class CoverStore:
+    """
+    按内容寻址的封面存储。
+
+    图片以 SHA-256 命名保存在 objects/ 下（objects/ab/abcdef....jpg），相同内容只保存一次；
+    便于阅读的 "{动漫名称}_{来源}.jpg" 是指向对象文件的符号链接。
+    重复抓取到相同封面时既不写对象文件，也不改动已有链接。
+    对象文件和链接都先写入临时文件、fsync 后再原子地重命名，进程崩溃或断电不会留下截断的封面。
+
+    Args:
+        root (str): 存储根目录。
+    """
+
+    def __init__(self, root: str = 'covers'):
+        self.root = root
+        self.objects_dir = os.path.join(root, 'objects')
+
+    def object_path(self, digest: str, ext: str = '.jpg') -> str:
+        """内容哈希对应的对象文件路径"""
+        return os.path.join(self.objects_dir, digest[:2], digest + ext)
+
+    def link_path(self, anime_name: str, source: str, ext: str = '.jpg') -> str:
+        """便于阅读的文件名路径"""
+        name = _UNSAFE_CHARS.sub('_', f"{anime_name}_{source}")
+        return os.path.join(self.root, name + ext)
+
+    def put(self, data: bytes, ext: str = '.jpg') -> Tuple[str, str]:
+        """保存图片内容，返回 (内容哈希, 对象路径)"""
+        return self.put_stream([data], ext)
+
+    def put_stream(self, chunks: Iterable[bytes], ext: str = '.jpg') -> Tuple[str, str]:
+        """
+        边读取边计算哈希并写入临时文件，fsync 后原子地重命名为对象文件；内容已存在时丢弃临时文件。
+
+        Returns:
+            Tuple[str, str]: (内容哈希, 对象路径)。
+        """
+        os.makedirs(self.objects_dir, exist_ok=True)
+        hasher = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.objects_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chunks:
+                    if chunk:
+                        hasher.update(chunk)
+                        f.write(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+            digest = hasher.hexdigest()
+            path = self.object_path(digest, ext)
+            if os.path.exists(path):
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+                _fsync_dir(os.path.dirname(path))
+            return digest, path
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def put_bytes_if_absent(self, data: bytes, ext: str = '.jpg') -> Tuple[str, str]:
+        """内容已在内存中时先计算哈希，对象已存在则完全不写磁盘"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.object_path(digest, ext)
+        if os.path.exists(path):
+            return digest, path
+        return self.put(data, ext)
+
+    def link(self, object_path: str, anime_name: str, source: str, ext: str = '.jpg') -> str:
+        """
+        让便于阅读的文件名指向对象文件，返回该文件名路径。
+
+        已指向同一对象时不做任何改动；不支持符号链接的文件系统上退回硬链接或复制。
+        """
+        path = self.link_path(anime_name, source, ext)
+        target = os.path.relpath(object_path, os.path.dirname(path))
+        if os.path.exists(path) and os.path.samefile(path, object_path):
+            return path
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        if os.path.lexists(tmp_path):
+            os.remove(tmp_path)
+        try:
+            os.symlink(target, tmp_path)
+        except (OSError, NotImplementedError):
+            try:
+                os.link(object_path, tmp_path)
+            except OSError:
+                shutil.copyfile(object_path, tmp_path)
+        os.replace(tmp_path, path)
+        _fsync_dir(os.path.dirname(path) or '.')
+        return path
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from utils.metrics import METRICS, Metrics
+
+logger = logging.getLogger(__name__)
+
+# 支持的输出格式 -> 扩展名
+FORMAT_EXTENSIONS = {'JPEG': '.jpg', 'WEBP': '.webp', 'AVIF': '.avif', 'PNG': '.png'}
+
+
+class DerivativeSpec(NamedTuple):
+    """一种派生图片：缩放到不超过 width 的宽度（保持宽高比，不放大），以 format 和 quality 保存"""
+    width: int
+    format: str = 'WEBP'
+    quality: int = 80
+
+
+def derivative_path(root: str, digest: str, spec: DerivativeSpec) -> str:
+    """原图内容哈希对应的派生图片路径：root/ab/abcdef..._320.webp"""
+    return os.path.join(root, digest[:2], f"{digest}_{spec.width}{FORMAT_EXTENSIONS[spec.format]}")
+
+
+def supported_specs(specs: Iterable[tuple]) -> List[DerivativeSpec]:
+    """把 (宽度, 格式, 质量) 转换为 DerivativeSpec，去掉当前 Pillow 不支持编码的格式（如未编译 AVIF 支持时的 AVIF）"""
+    from PIL import features
+    supported = []
+    for spec in specs:
+        spec = DerivativeSpec(*spec)
+        spec = spec._replace(format=spec.format.upper())
+        if spec.format not in FORMAT_EXTENSIONS:
+            raise ValueError(f"不支持的派生图片格式: {spec.format}，可选 {', '.join(FORMAT_EXTENSIONS)}")
+        if spec.format in ('WEBP', 'AVIF') and not features.check(spec.format.lower()):
+            logger.warning(f"Pillow 不支持 {spec.format}，跳过 {spec.width}px {spec.format} 派生图片")
+            continue
+        supported.append(spec)
+    return supported
+
+
+def render_derivatives(source_path: str, digest: str, specs: Tuple[DerivativeSpec, ...],
+                       root: str) -> Tuple[List[str], float]:
+    """
+    在工作进程中运行：原图只解码一次，生成所有尚不存在的派生图片。
+
+    JPEG 用 draft() 让解码器直接按 1/2、1/4、1/8 缩小到不小于最大派生尺寸的大小，
+    只解码需要的像素，缩略图的耗时远小于完整解码后再缩放。
+
+    Returns:
+        Tuple[List[str], float]: (新生成的文件路径, 耗时秒数)。
+    """
+    from PIL import Image
+    start = time.perf_counter()
+    pending = [spec for spec in specs if not os.path.exists(derivative_path(root, digest, spec))]
+    if not pending:
+        return [], time.perf_counter() - start
+
+    with Image.open(source_path) as image:
+        largest = max(spec.width for spec in pending)
+        if image.format == 'JPEG' and largest < image.width:
+            image.draft('RGB', (largest, max(1, image.height * largest // image.width)))
+        has_alpha = 'A' in image.getbands() or 'transparency' in image.info
+        decoded = image.convert('RGBA' if has_alpha else 'RGB')
+
+    written = []
+    for spec in sorted(pending, key=lambda s: -s.width):
+        output = decoded
+        if spec.width < decoded.width:
+            output = decoded.resize((spec.width, max(1, round(decoded.height * spec.width / decoded.width))),
+                                    Image.LANCZOS)
+        if spec.format == 'JPEG' and output.mode != 'RGB':
+            output = output.convert('RGB')
+        path = derivative_path(root, digest, spec)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                output.save(f, spec.format, quality=spec.quality)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        written.append(path)
+    return written, time.perf_counter() - start
+
+
+class DerivativePipeline:
+    """
+    可选的下载后处理：在进程池中由每张封面生成缩略图和 WebP / AVIF 等格式。
+
+    submit() 只把任务交给进程池，立即返回，图片解码和编码不占用下载线程，也不受 GIL 限制；
+    派生图片以原图内容哈希命名，相同封面、已生成的尺寸和正在处理的封面都不会重复处理。
+    进程池使用 spawn 方式启动，工作进程不会继承下载器中持有锁的线程。
+
+    Args:
+        root (str): 派生图片的保存目录。
+        specs (Iterable[tuple]): 要生成的 DerivativeSpec 或 (宽度, 格式, 质量)；当前 Pillow 不支持的格式会被跳过。
+        workers (int): 工作进程数，默认为 CPU 核数。
+        metrics (Metrics): 记录生成数、失败数和处理耗时，默认为共享的 METRICS。
+    """
+
+    def __init__(self, root: str, specs: Iterable[tuple], workers: Optional[int] = None,
+                 metrics: Optional[Metrics] = None):
+        self.root = root
+        self.specs = tuple(supported_specs(specs))
+        self.workers = workers or os.cpu_count() or 1
+        self.metrics = metrics or METRICS
+        self._executor = None  # 第一次提交时创建，multiprocessing 只在启用后处理时导入
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def paths(self, digest: str) -> List[str]:
+        """该封面所有派生图片的路径"""
+        return [derivative_path(self.root, digest, spec) for spec in self.specs]
+
+    def submit(self, source_path: str, digest: str, source: str = '') -> Optional[Future]:
+        """
+        为内容哈希为 digest 的封面（保存在 source_path）生成派生图片。
+
+        Returns:
+            Future: 结果为 render_derivatives 的返回值；所有派生图片都已存在时返回 None。
+        """
+        if not self.specs or all(os.path.exists(path) for path in self.paths(digest)):
+            return None
+        with self._lock:
+            future = self._pending.get(digest)
+            if future is not None:
+                return future
+            if self._executor is None:
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+            future = self._executor.submit(render_derivatives, source_path, digest, self.specs, self.root)
+            self._pending[digest] = future
+        future.add_done_callback(lambda f: self._done(digest, source, f))
+        return future
+
+    def close(self, wait: bool = True) -> None:
+        """wait 为 True 时等待已提交的任务完成，然后停止工作进程"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    def _done(self, digest: str, source: str, future: Future) -> None:
+        with self._lock:
+            self._pending.pop(digest, None)
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            logger.warning(f"生成派生图片失败 {digest[:12]}: {error}")
+            self.metrics.inc('derivative_errors', source=source)
+            return
+        written, seconds = future.result()
+        self.metrics.inc('derivatives', len(written), source=source)
+        self.metrics.observe('derive', seconds, source=source)
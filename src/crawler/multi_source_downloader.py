@@ -2,21 +2,56 @@
 # -*- coding: utf-8 -*-
 
 import os                # 文件和目录操作
-from datetime import datetime  # 日期和时间处理
 import json             # JSON 数据处理
 import time             # 时间相关操作
 import io               # 输入/输出流操作
-from urllib.parse import quote  # URL 编码
+from urllib.parse import quote, urlparse  # URL 编码与解析
 import re               # 正则表达式
 import random           # 随机数生成
-from typing import Optional, Dict, List  # 类型注解
+import itertools        # 候选分组
+import logging          # 日志记录
+import threading        # 取消信号
+import contextvars      # 当前线程所属查询的取消信号
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout  # 并发执行
+from typing import Callable, Optional, Dict, List, NamedTuple  # 类型注解
 from enum import Enum                    # 枚举类型
 import requests         # HTTP 请求
-from bs4 import BeautifulSoup  # HTML/XML 解析
-from PIL import Image   # 图像处理
-from tqdm import tqdm   # 进度条显示
-from fuzzywuzzy import fuzz  # 字符串模糊匹配
-from dotenv import load_dotenv  # 环境变量加载
+# bs4、PIL 导入较慢，只在解析网页和图片时导入（见 utils.html_parser、_get_image_info），只查询 JSON API 时不加载
+from utils.helpers import clean_title, setup_cli  # 标题清理、命令行初始化
+from utils.title_matcher import TitleMatcher  # 标题批量匹配
+from utils.rate_limiter import HostRateLimiter  # 按主机限速
+from utils.byte_cache import ByteCache  # 图片字节缓存
+from utils.http_cache import HttpCache  # 搜索响应缓存
+from utils.metrics import METRICS, Metrics  # 分阶段计时与计数
+from utils.latency import LatencyTracker  # 自适应超时与对冲请求
+from utils.circuit_breaker import CircuitBreaker, STATE_VALUES  # 来源熔断
+from utils.retry import RetryPolicy, error_status  # 暂时性错误的退避重试
+from utils.http_client import ConnectionPools  # 共享连接池
+from utils.html_parser import parse_html, page_title  # 只解析需要的子树
+from utils.debug_capture import DebugCapture  # 后台保存调试快照
+from crawler.cover_store import CoverStore, guess_extension  # 内容寻址的封面存储
+from crawler.derivatives import DerivativePipeline  # 下载后生成缩略图和其他格式
+from crawler.cover_index import CoverIndex, quality_score  # 已下载封面索引、统一的质量评分
+from crawler.warm_session import WarmSession  # 持久化 Cookie 的会话
+from crawler.anilist_client import AniListClient, AniListError  # AniList 合并查询
+from crawler.alias_index import AliasIndex  # 多语言别名索引
+from crawler.range_downloader import RangeDownloader  # 分段并行下载
+from config.config import HOST_RATE_LIMITS, DEFAULT_RATE_LIMIT  # 限速配置
+from config.config import IMAGE_CACHE_MEMORY_BUDGET, IMAGE_CACHE_SPILL_THRESHOLD, IMAGE_CACHE_DISK_BUDGET  # 图片缓存配置
+from config.config import HTTP_CACHE_PATH, HTTP_CACHE_MAX_BYTES, HTTP_CACHE_TTLS  # 搜索缓存配置
+from config.config import COVERS_DIR, COVER_INDEX_PATH  # 封面保存目录及索引
+from config.config import COOKIE_DIR, COOKIE_MAX_AGE  # Cookie 持久化配置
+from config.config import ANILIST_BATCH_SIZE, ANILIST_BATCH_WINDOW  # AniList 合并查询配置
+from config.config import CANDIDATE_PROBE_TOP_K  # 候选图片探测数量
+from config.config import ALIAS_INDEX_PATH, ALIAS_MIN_SIMILARITY  # 别名索引配置
+from config.config import RANGE_DOWNLOAD_PART_SIZE, RANGE_DOWNLOAD_MAX_PARTS  # 分段下载配置
+from config.config import HTML_PARSER  # 网页解析后端
+from config.config import DEBUG_CAPTURE_DIR, DEBUG_CAPTURE_MAX_BYTES, DEBUG_CAPTURE_SOURCES, DEBUG_CAPTURE_SAMPLE_RATE, DEBUG_CAPTURE_QUEUE_SIZE  # 调试快照配置
+from config.config import TIMEOUT, ADAPTIVE_TIMEOUT_BOUNDS, ADAPTIVE_TIMEOUT_FACTOR, LATENCY_WINDOW, LATENCY_MIN_SAMPLES  # 自适应超时配置
+from config.config import HEDGE_PERCENTILE, HEDGE_MAX_RATIO, HEDGE_POOL_SIZE  # 对冲请求配置
+from config.config import MAX_RETRIES, RETRY_BASE_DELAY, RETRY_MAX_DELAY, RETRY_BUDGET_RATIO, RETRY_BUDGET_RESERVE  # 重试配置
+from config.config import HOST_POOL_SIZES, DEFAULT_POOL_SIZE, HTTP2_HOSTS  # 连接池配置
+from config.config import CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_ERROR_RATE, CIRCUIT_WINDOW, CIRCUIT_COOLDOWN  # 熔断配置
 # 添加ayf依赖库
 # from selenium import webdriver
 # from selenium.webdriver.chrome.options import Options
@@ -24,10 +59,6 @@ from dotenv import load_dotenv  # 环境变量加载
 # from webdriver_manager.chrome import ChromeDriverManager
 
 
-# 加载 .env 文件
-load_dotenv()
-# 配置日志
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 class AnimeSource(Enum):
@@ -40,9 +71,121 @@ class AnimeSource(Enum):
 
     IYF = "iyf"  # 新增 iyf 数据源 没有直接的html文件进行爬取
     ANILIST = "anilist" #搜索时需要罗马音，暂未解决，且没有直接的html文件进行爬取
-    
+
+
+class QualityTarget(NamedTuple):
+    """
+    "足够好"的封面：宽、高和标题相似度都不低于下限。
+
+    get_covers 拿到满足目标的结果后立即返回，不再等待其他来源；
+    没有相似度信息的结果（4kvm、MAL、AniDB、索引记录）不会满足目标。
+    """
+    min_width: int
+    min_height: int
+    min_similarity: float = 100
+
+    def met_by(self, result: Dict) -> bool:
+        width, height = result.get('resolution', (0, 0))
+        return (width >= self.min_width and height >= self.min_height
+                and result.get('similarity', 0) >= self.min_similarity)
+
+
+class SearchCancelled(BaseException):
+    """
+    查询已被 get_covers 放弃（提前返回或到达截止时间）。
+
+    与 asyncio.CancelledError 一样继承 BaseException，不会被各来源中 except Exception 的容错分支吞掉。
+    """
+
+
+# get_covers 中每个来源的查询情况，见 get_covers 的 outcome 参数
+OUTCOME_FOUND = 'found'            # 得到结果（包括封面索引中的记录）
+OUTCOME_NOT_FOUND = 'not_found'    # 请求正常但没有结果
+OUTCOME_FAILED = 'failed'          # 请求失败或查询抛出异常
+OUTCOME_SKIPPED = 'skipped'        # 熔断中，没有发送请求
+OUTCOME_TIMED_OUT = 'timed_out'    # 到达截止时间仍未返回
+OUTCOME_CANCELLED = 'cancelled'    # 已有结果满足质量目标，不再等待
+
+# 工作线程当前所属查询的取消信号，由 _fetch_from_source 设置
+_cancel_event: contextvars.ContextVar = contextvars.ContextVar('cancel_event', default=None)
+
+# 工作线程当前所属的来源查询：来源名（重试预算按来源划分），以及最近一次请求是否失败（供熔断器判断）
+_call_outcome: contextvars.ContextVar = contextvars.ContextVar('call_outcome', default=None)
+
+
+def _is_failure_status(status_code: int) -> bool:
+    """服务器错误、限流和拒绝访问说明来源当前不可用；404 等其他状态只是没有结果"""
+    return status_code >= 500 or status_code in (403, 429)
+
+
+def _record_shared_failure(error: requests.RequestException) -> None:
+    """
+    合并请求（如 AniList 的批量查询）只由批次中的一个查询发送，其他查询拿到同一个异常时，
+    在这里把失败记入自己的结果，供熔断器使用；状态码不表示来源故障的 HTTPError（如 404）除外。
+    """
+    outcome = _call_outcome.get()
+    if outcome is None:
+        return
+    if isinstance(error, requests.HTTPError) and not isinstance(error, AniListError):
+        status = error_status(error)
+        if status is not None and not _is_failure_status(status):
+            return
+    outcome['failed'] = True
+
+
+def _get_total_size(response: requests.Response) -> int:
+    """从响应头中解析文件总字节数，Range 响应取 Content-Range 的总长度，未知时返回 0"""
+    content_range = response.headers.get('Content-Range', '')
+    if response.status_code == 206:
+        total = content_range.rpartition('/')[2]
+        return int(total) if total.isdigit() else 0
+    length = response.headers.get('Content-Length', '')
+    return int(length) if length.isdigit() else 0
+
+# URL 中表示图片尺寸规格的路径片段，数值越大图片越大（Bangumi: /l/ /c/ /m/ /s/，AniList: /large/ /medium/ /small/）
+_SIZE_VARIANTS = {'l': 3, 'large': 3, 'c': 2, 'medium': 2, 'm': 1, 'small': 1, 's': 0}
+
+def _close_response(future: Future) -> None:
+    """对冲请求中落后的一方完成后关闭其响应，释放连接"""
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+def _parse_html(markup: str, only: Optional[str] = None):
+    """用配置的后端解析 HTML，only 为只需构建的元素（见 utils.html_parser.strainer）"""
+    return parse_html(markup, only, HTML_PARSER)
+
+
+def _image_size(data: bytes) -> tuple:
+    """完整图片内容的 (宽, 高)"""
+    from PIL import Image
+    return Image.open(io.BytesIO(data)).size
+
+
+def _size_variant_rank(url: str) -> int:
+    """根据 URL 推断图片规格，不联网；无法判断时返回 2，缩略图参数（如 Bilibili 的 @..w_..h）降一级"""
+    path = url.split('?', 1)[0]
+    path, _, thumb = path.partition('@')
+    rank = 2
+    for segment in reversed(path.split('/')[:-1]):
+        if segment in _SIZE_VARIANTS:
+            rank = _SIZE_VARIANTS[segment]
+            break
+    return rank - 1 if thumb else rank
+
+def _is_bili_rejected(response: requests.Response) -> bool:
+    """Bilibili 是否因 Cookie 或风控拒绝了请求（HTTP 412 或业务码 -412）"""
+    if response.status_code == 412:
+        return True
+    try:
+        return response.ok and response.json().get('code') == -412
+    except ValueError:
+        return False
+
 class AnimeDownloader:
-    def __init__(self):
+    def __init__(self, max_workers: int = len(AnimeSource), rate_limiter: Optional[HostRateLimiter] = None,
+                 metrics: Optional[Metrics] = None, pools: Optional[ConnectionPools] = None,
+                 capture: Optional[DebugCapture] = None, derivatives: Optional[DerivativePipeline] = None):
         self.headers = {}
         self.sources = {
             # AnimeSource.FOURKVM: self._get_4kvm_cover,
@@ -54,24 +197,93 @@ class AnimeDownloader:
             # AnimeSource.IYF: self._get_iyf_cover，
 
         }
-        # 定义延迟
-        self.delays = {
-            AnimeSource.BILIBILI: 2,
-            # AnimeSource.ANILIST: 1,
-            AnimeSource.BANGUMI: 1,
-            AnimeSource.MAL: 3,
-            AnimeSource.ANIDB: 2,
-            AnimeSource.FOURKVM: 2
-            # AnimeSource.IYF: 2
+        # 按主机限速，所有 HTTP 请求都经过 self._request 取令牌；可传入共享实例以协调多个下载器
+        self.rate_limiter = rate_limiter or HostRateLimiter(HOST_RATE_LIMITS, DEFAULT_RATE_LIMIT)
+        # 各来源、各阶段的耗时和计数，默认使用进程内共享的 METRICS
+        self.metrics = metrics or METRICS
+        # 每个来源一个熔断器：持续失败的来源在冷却期内直接跳过，状态记入 circuit_state 指标
+        self.breakers = {
+            source: CircuitBreaker(source.value, CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_ERROR_RATE, CIRCUIT_WINDOW,
+                                   CIRCUIT_COOLDOWN, on_change=self._on_circuit_change)
+            for source in AnimeSource
         }
-        # 添加session复用
-        self.session = requests.Session()  
-        # 确保 temp_result 目录存在，用于保存 HTML
-        self.output_dir = "temp_html"
-        if not os.path.exists(self.output_dir):
-            os.makedirs(self.output_dir)
+        # 所有会话共用按主机配置大小的长连接池（支持时使用 HTTP/2），可传入共享实例以协调多个下载器
+        self.pools = pools or ConnectionPools(HOST_POOL_SIZES, DEFAULT_POOL_SIZE, HTTP2_HOSTS)
+        self.session = self.pools.session()
+        # 按主机统计请求延迟：超时由 p99 推导，超过 p95 仍未返回的 GET 请求在限速和对冲预算内发送一份副本
+        self.latency = LatencyTracker(LATENCY_WINDOW, LATENCY_MIN_SAMPLES, TIMEOUT, ADAPTIVE_TIMEOUT_BOUNDS,
+                                      ADAPTIVE_TIMEOUT_FACTOR, HEDGE_PERCENTILE, HEDGE_MAX_RATIO)
+        self._hedge_pool = ThreadPoolExecutor(max_workers=HEDGE_POOL_SIZE, thread_name_prefix='hedge')
+        # 连接错误、超时、429 / 5xx 按指数退避重试，遵守 Retry-After，每个来源一份重试预算
+        self.retry_policy = RetryPolicy(MAX_RETRIES, RETRY_BASE_DELAY, RETRY_MAX_DELAY, RETRY_BUDGET_RATIO,
+                                        RETRY_BUDGET_RESERVE, metrics=self.metrics)
+        # 搜索页的调试快照，默认关闭；开启的来源在后台线程中压缩保存，目录大小有上限
+        self.capture = capture or DebugCapture(DEBUG_CAPTURE_DIR, DEBUG_CAPTURE_MAX_BYTES, DEBUG_CAPTURE_SOURCES,
+                                               DEBUG_CAPTURE_SAMPLE_RATE, DEBUG_CAPTURE_QUEUE_SIZE, self.metrics)
         # 相似度阈值，用于提供url,提供在番剧名称不确定时进行搜索
         self.similarity_threshold = 60
+        # 并发查询的最大线程数
+        self.max_workers = max_workers
+        # 下载时是否显示进度条，批量模式下关闭以免多线程输出混杂
+        self.show_progress = True
+        # 探测图片尺寸时最多读取的字节数，JPEG/PNG 的尺寸信息通常在前几 KB
+        self.probe_bytes = 64 * 1024
+        # 候选排序后，每个相似度档位最多探测的图片数
+        self.probe_top_k = CANDIDATE_PROBE_TOP_K
+        # 已完整下载过的图片字节，download_image 命中时不再重复请求
+        self.image_cache = ByteCache(IMAGE_CACHE_MEMORY_BUDGET, IMAGE_CACHE_SPILL_THRESHOLD, IMAGE_CACHE_DISK_BUDGET)
+        # 搜索 API 的持久化响应缓存及各来源的有效期（秒）
+        self.http_cache = HttpCache(HTTP_CACHE_PATH, HTTP_CACHE_MAX_BYTES)
+        self.cache_ttls = {source: HTTP_CACHE_TTLS[source.value] for source in AnimeSource if source.value in HTTP_CACHE_TTLS}
+        # 封面按内容哈希保存，相同图片只存一份
+        self.cover_store = CoverStore(COVERS_DIR)
+        # 可选的下载后处理：保存封面后在进程池中生成缩略图和其他格式，默认关闭
+        self.derivatives = derivatives
+        # 完整下载图片：大图拆成多个 Range 请求并行下载，所有分段都经过 self._request 限速
+        self.range_downloader = RangeDownloader(self._request, RANGE_DOWNLOAD_PART_SIZE, RANGE_DOWNLOAD_MAX_PARTS)
+        # 长期复用的 Bilibili / 4kvm 会话，只在首次使用或 Cookie 失效时访问主页，Cookie 持久化到磁盘
+        self.bili_session = WarmSession(
+            'https://www.bilibili.com',
+            os.path.join(COOKIE_DIR, 'bilibili.lwp'),
+            self.rate_limiter,
+            headers={
+                'User-Agent': self._get_random_user_agent(),
+                'Referer': 'https://www.bilibili.com',
+                'Origin': 'https://www.bilibili.com',
+                'Accept': 'application/json, text/plain, */*',
+                'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+                'Connection': 'keep-alive',
+            },
+            max_age=COOKIE_MAX_AGE,
+            warmup_delay=1.0,  # 等待 Cookie 加载
+            metrics=self.metrics,
+            pools=self.pools
+        )
+        # AniList 合并查询客户端，并发的标题搜索共用一个 GraphQL 请求，结果按标题缓存
+        self.anilist = AniListClient(
+            self._request,
+            batch_size=ANILIST_BATCH_SIZE,
+            batch_window=ANILIST_BATCH_WINDOW,
+            headers={'User-Agent': self._get_random_user_agent()},
+            cache=self.http_cache,
+            cache_ttl=self.cache_ttls.get(AnimeSource.ANILIST)
+        )
+        self.fourkvm_session = WarmSession(
+            'https://www.4kvm.net',
+            os.path.join(COOKIE_DIR, '4kvm.lwp'),
+            self.rate_limiter,
+            headers={
+                'User-Agent': self._get_random_user_agent(),
+                'Referer': 'https://www.4kvm.net/',
+            },
+            max_age=COOKIE_MAX_AGE,
+            metrics=self.metrics,
+            pools=self.pools
+        )
+        # 已下载封面的索引，用于跳过已完成的搜索和下载
+        self.cover_index = CoverIndex(COVER_INDEX_PATH)
+        # 各来源搜索结果积累的多语言别名索引，用于把查询标题直接解析为各来源的搜索词或已知封面
+        self.alias_index = AliasIndex(ALIAS_INDEX_PATH)
 
 
         # 设置 Clash 代理
@@ -116,35 +328,26 @@ class AnimeDownloader:
 
         """从 4kvm.net 获取动漫封面，支持完全匹配和最相似匹配"""
         try:
-            # 随机延迟，防止频率限制
-            time.sleep(random.uniform(self.delays.get(AnimeSource.FOURKVM, 1), 3))
-            # 更新用户代理
-            self.headers['User-Agent'] = self._get_random_user_agent()
-            # 更新 Referer
-            self.headers['Referer'] = 'https://www.4kvm.net/'
-            # 访问主页获取 cookies
-            print("访问 4kvm 主页获取 cookies...")
-            homepage_response = self.session.get('https://www.4kvm.net', headers=self.headers, timeout=10)
-            homepage_response.raise_for_status()
-            print(f"主页响应状态码: {homepage_response.status_code}, Cookies: {list(self.session.cookies.keys())}")
             # URL 编码动漫名称
             encoded_name = quote(anime_name)
             search_url = f"https://www.4kvm.net/xssearch?s={encoded_name}"
             print(f"请求 4kvm 搜索: {search_url}")
-            # 发送搜索请求
-            response = self.session.get(search_url, headers=self.headers, timeout=10)
+            # 发送搜索请求，使用长期复用的会话，Cookie 被拒绝（403）时重新访问主页再试一次
+            with self.metrics.timer('search'):
+                response = self._request('GET', search_url, session=self.fourkvm_session)
+                if response.status_code == 403:
+                    print("4kvm: Cookie 被拒绝，重新获取")
+                    self.metrics.inc('retries', reason='cookie')
+                    self.fourkvm_session.invalidate()
+                    response = self._request('GET', search_url, session=self.fourkvm_session)
             response.raise_for_status()
             print(f"搜索响应状态码: {response.status_code}")
-            # 保存 HTML
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            safe_anime_name = re.sub(r'[^\w\-]', '_', anime_name)
-            html_filename = os.path.join(self.output_dir, f"{safe_anime_name}_{timestamp}_4kvm.html")
-            with open(html_filename, 'w', encoding='utf-8') as f:
-                f.write(response.text)
-            print(f"HTML 保存至: {html_filename}")
+            # 开启调试快照时由后台线程保存 HTML
+            self.capture.capture(AnimeSource.FOURKVM.value, anime_name, response.text)
             # 解析 HTML
-            soup = BeautifulSoup(response.text, 'html.parser')
-            title = soup.select_one('title').text if soup.select_one('title') else '无标题'
+            with self.metrics.timer('parse'):
+                soup = _parse_html(response.text, only='.result-item')
+            title = page_title(response.text) or '无标题'
             print(f"页面标题: {title}")
             # 查找搜索结果条目
             anime_items = soup.select('.result-item article')
@@ -152,7 +355,8 @@ class AnimeDownloader:
             
             best_match = None
             highest_similarity = 0
-            
+
+            entries = []
             for item in anime_items:
                 # 获取封面图片和标题
                 img = item.select_one('.thumbnail img')
@@ -160,38 +364,42 @@ class AnimeDownloader:
                 if img and title_elem:
                     img_url = img.get('data-src', img['src'])
                     title = title_elem.text.strip().replace("'", "_")  # 替换单引号
-                    # 计算标题与输入的相似度
-                    similarity = fuzz.ratio(anime_name.lower(), title.lower())
-                    print(f"4kvm: 标题 '{title}', 相似度: {similarity}")
-                    
-                    # 完全匹配
-                    if re.search(re.escape(anime_name), title, re.IGNORECASE):
-                        size, file_size = self._get_image_info(img_url)
-                        result = {
-                            'url': img_url,
-                            'title': title,
-                            'source': AnimeSource.FOURKVM.value,
-                            'resolution': size,
-                            'file_size': file_size,
-                            'quality_score': size[0] * size[1] * file_size
-                        }
-                        print(f"4kvm: 抓取成功（完全匹配）: {result['url']}")
-                        return result
-                    # 记录最高相似度
-                    if similarity > highest_similarity:
-                        highest_similarity = similarity
-                        size, file_size = self._get_image_info(img_url)
-                        best_match = {
-                            'url': img_url,
-                            'title': title,
-                            'source': AnimeSource.FOURKVM.value,
-                            'resolution': size,
-                            'file_size': file_size,
-                            'quality_score': size[0] * size[1] * file_size
-                        }
+                    entries.append((img_url, title))
                 else:
                     print("4kvm: 条目缺少图片或标题")
-            
+
+            # 一次性计算所有标题与输入的相似度
+            with self.metrics.timer('match'):
+                similarities = TitleMatcher(anime_name).scores([title for _, title in entries])
+            for (img_url, title), similarity in zip(entries, similarities):
+                print(f"4kvm: 标题 '{title}', 相似度: {similarity}")
+                
+                # 完全匹配
+                if re.search(re.escape(anime_name), title, re.IGNORECASE):
+                    size, file_size = self._get_image_info(img_url)
+                    result = {
+                        'url': img_url,
+                        'title': title,
+                        'source': AnimeSource.FOURKVM.value,
+                        'resolution': size,
+                        'file_size': file_size,
+                        'quality_score': quality_score(size, file_size)
+                    }
+                    print(f"4kvm: 抓取成功（完全匹配）: {result['url']}")
+                    return result
+                # 记录最高相似度
+                if similarity > highest_similarity:
+                    highest_similarity = similarity
+                    size, file_size = self._get_image_info(img_url)
+                    best_match = {
+                        'url': img_url,
+                        'title': title,
+                        'source': AnimeSource.FOURKVM.value,
+                        'resolution': size,
+                        'file_size': file_size,
+                        'quality_score': quality_score(size, file_size)
+                    }
+
             # 无完全匹配，返回最相似结果
             if best_match and highest_similarity >= self.similarity_threshold:
                 print(f"4kvm: 无完全匹配，选择最相似标题 '{best_match['title']}'（相似度: {highest_similarity}）")
@@ -208,7 +416,7 @@ class AnimeDownloader:
             print(f"4kvm 获取失败: {str(e)}")
         return None
 
-    def _get_bangumi_cover(self, anime_name: str, min_similarity: int = 90, max_similarity: int = 100, delay: float = 1.0) -> Optional[dict]:
+    def _get_bangumi_cover(self, anime_name: str, min_similarity: int = 90, max_similarity: int = 100) -> Optional[dict]:
         """
         从 Bangumi API 获取动漫封面，支持相似度筛选和图片质量排序。
 
@@ -216,7 +424,6 @@ class AnimeDownloader:
             anime_name (str): 动漫名称。
             min_similarity (int): 标题相似度最小阈值（默认90）。
             max_similarity (int): 标题相似度最大阈值（默认100）。
-            delay (float): 请求前的随机延迟时间（秒，默认1.0）。
 
         Returns:
             Optional[dict]: 包含封面信息的字典（URL、标题、来源等），未找到时返回None.
@@ -230,30 +437,31 @@ class AnimeDownloader:
             return None
 
         try:
-            # 随机延迟，防止频率限制
-            time.sleep(random.uniform(self.delays.get(AnimeSource.BANGUMI, delay), 3))
-
             # 更新用户代理
-            self.headers['User-Agent'] = self._get_random_user_agent()
+            headers = dict(self.headers)
+            headers['User-Agent'] = self._get_random_user_agent()
 
             # 构造搜索 URL
             url = f"https://api.bgm.tv/search/subject/{quote(anime_name)}?type=2"
             logger.debug(f"请求 Bangumi 搜索: {url}")
 
             # 发送搜索请求
-            response = requests.get(url, headers=self.headers, timeout=10)
+            with self.metrics.timer('search'):
+                response = self._request('GET', url, headers=headers,
+                                         cache_ttl=self.cache_ttls.get(AnimeSource.BANGUMI))
             response.raise_for_status()
             logger.debug(f"Bangumi 搜索响应状态码: {response.status_code}")
 
             # 解析 JSON 响应
-            data = response.json()
+            with self.metrics.timer('parse'):
+                data = response.json()
             if not data or not data.get('list'):
                 logger.info("Bangumi: 未找到匹配的动漫条目")
                 return None
 
-            # 初始化候选列表
-            candidates = []
-
+            entries = []
+            aliases = []
+            entry_ids = {}  # 封面 URL -> 条目 ID，选中后记入别名索引
             for item in data['list']:
                 # 提取标题和封面图片 URL
                 title = item.get('name_cn') or item.get('name', '').strip()
@@ -261,57 +469,38 @@ class AnimeDownloader:
 
                 if not title or not img_url or not img_url.endswith(('.jpg', '.jpeg', '.png')):
                     continue
-
-                # 清理和标准化标题
-                cleaned_title = clean_title(title)
-                normalized_title = normalize_title(cleaned_title)
-
-                # 计算标题相似度
-                similarity = fuzz.ratio(normalize_title(anime_name), normalized_title)
+                entries.append((clean_title(title), img_url))
+                entry_ids[img_url] = item.get('id')
+                aliases.append((item.get('id'), [('name_cn', clean_title(item.get('name_cn') or '')),
+                                                 ('name', clean_title(item.get('name') or ''))], None))
+            # 所有条目的中文名和日文原名都记入别名索引，封面只记录最终选中的条目
+            self.alias_index.record_many(AnimeSource.BANGUMI.value, aliases)
+
+            # 第一阶段：只用元数据（相似度）筛选候选，此时不请求图片
+            candidates = []
+            with self.metrics.timer('match'):
+                similarities = TitleMatcher(anime_name).scores([title for title, _ in entries])
+            for (cleaned_title, img_url), similarity in zip(entries, similarities):
                 logger.debug(f"Bangumi: 标题 '{cleaned_title}', 相似度: {similarity}")
 
                 # 筛选相似度在指定范围内的条目
                 min_similarity = self.similarity_threshold
                 if min_similarity <= similarity <= max_similarity:
-                    try:
-                        size, file_size = self._get_image_info(img_url)
-                        # 优化质量评分：分辨率 * 文件大小（KB）
-                        quality_score = size[0] * size[1] * (file_size / 1024)
-                    except Exception as e:
-                        logger.warning(f"获取图片信息失败: {str(e)}")
-                        quality_score = 0
-
-                    # 存储结果
-                    candidate = {
+                    candidates.append({
                         'url': img_url,
                         'title': cleaned_title,
-                        'source': AnimeSource.BANGUMI,
-                        'resolution': size,
-                        'file_size': file_size,
-                        'quality_score': quality_score,
+                        'source': AnimeSource.BANGUMI.value,
                         'similarity': similarity
-                    }
-                    candidates.append(candidate)
+                    })
 
             # 如果没有找到任何符合条件的匹配项
             if not candidates:
                 logger.info("Bangumi: 未找到符合条件的动漫条目")
                 return None
 
-            # 输出所有待选择的结果
-            logger.info("Bangumi: 待选择的候选条目：")
-            for i, candidate in enumerate(candidates, 1):
-                logger.info(
-                    f"候选 {i}: 标题='{candidate['title']}', "
-                    f"URL={candidate['url']}, "
-                    f"相似度={candidate['similarity']}, "
-                    f"质量评分={candidate['quality_score']}, "
-                    f"分辨率={candidate['resolution']}, "
-                    f"文件大小={candidate['file_size']} 字节"
-                )
-
-            # 选择质量最高的图片
-            best_match = max(candidates, key=lambda x: (x['similarity'], x['quality_score']))
+            # 第二阶段：只探测排名靠前的图片，选择最相似且质量最高的
+            best_match = self._select_candidate("Bangumi", candidates)
+            self.alias_index.set_cover(AnimeSource.BANGUMI.value, entry_ids.get(best_match['url']), best_match['url'])
             logger.info(
                 f"Bangumi: 选择质量最高的标题 '{best_match['title']}' "
                 f"(相似度: {best_match['similarity']}, 质量评分: {best_match['quality_score']})"
@@ -328,7 +517,7 @@ class AnimeDownloader:
             logger.error(f"Bangumi 获取失败: {str(e)}")
         return None
 
-    def _get_bili_cover(self, anime_name: str, min_similarity: int = 90, max_similarity: int = 100, delay: float = 1.0) -> Optional[dict]:
+    def _get_bili_cover(self, anime_name: str, min_similarity: int = 90, max_similarity: int = 100) -> Optional[dict]:
         """
         从Bilibili获取动漫封面，支持相似度排序和图片质量筛选。
 
@@ -336,7 +525,6 @@ class AnimeDownloader:
             anime_name (str): 动漫名称。
             min_similarity (int): 标题相似度最小阈值（默认70）。
             max_similarity (int): 标题相似度最大阈值（默认100）。
-            delay (float): 访问主页后的延迟时间（秒，默认1.0）。
 
         Returns:
             Optional[dict]: 包含封面信息的字典（URL、标题、来源等），未找到时返回None.
@@ -354,101 +542,78 @@ class AnimeDownloader:
             'search_type': 'media_bangumi',
             'keyword': anime_name,  # URL 编码关键字
         }
-        headers = {
-            'User-Agent': self._get_random_user_agent(),  # 动态获取随机 User-Agent
-            'Referer': 'https://www.bilibili.com',
-            'Origin': 'https://www.bilibili.com',
-            'Accept': 'application/json, text/plain, */*',
-            'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
-            'Connection': 'keep-alive',
-        }
-
         try:
-            # 使用 session 保持连接状态
-            with requests.Session() as session:
-                session.headers.update(headers)
-                
-                # 访问主页面获取 Cookie
-                response = session.get('https://www.bilibili.com', timeout=10)
-                response.raise_for_status()
-                time.sleep(delay)  # 延迟等待 Cookie 加载
-
-                # 发送搜索请求
-                response = session.get(url, params=params, timeout=10)
-                response.raise_for_status()
+            # 使用长期复用的会话，Cookie 失效或被拒绝时才重新访问主页；
+            # 只缓存成功的搜索结果，新鲜缓存命中时完全不联网
+            with self.metrics.timer('search'):
+                for attempt in range(2):
+                    response = self._request('GET', url, session=self.bili_session, params=params,
+                                             cache_ttl=self.cache_ttls.get(AnimeSource.BILIBILI),
+                                             cache_if=lambda r: r.json().get('code') == 0)
+                    if not _is_bili_rejected(response) or attempt:
+                        break
+                    logger.info("Bilibili: Cookie 被拒绝，重新获取")
+                    self.metrics.inc('retries', reason='cookie')
+                    self.bili_session.invalidate()
+            response.raise_for_status()
+            with self.metrics.timer('parse'):
                 data = response.json()
 
-                # 检查返回数据是否有效
-                if data.get('code') != 0 or not data.get('data', {}).get('result'):
-                    logger.info("Bilibili: 未找到匹配的动漫条目")
-                    return None
-
-                # 初始化候选列表
-                candidates = []
-                for item in data['data']['result']:
-                    # 提取标题和封面图片 URL
-                    raw_title = item.get('title', '').strip()
-                    img_url = item.get('cover', '').replace('http:', 'https:')
-
-                    # 验证标题和封面 URL
-                    if not raw_title or not img_url or not img_url.endswith(('.jpg', '.jpeg', '.png')):
-                        continue
-
-                    # 清理和标准化标题
-                    cleaned_title = clean_title(raw_title)
-                    normalized_title = normalize_title(cleaned_title)
-
-                    # 计算标题相似度
-                    similarity = fuzz.ratio(normalize_title(anime_name), normalized_title)
-                    logger.debug(f"Bilibili: 标题 '{cleaned_title}', 相似度: {similarity}")
-
-                    # 筛选相似度在指定范围内的条目
-                    min_similarity = self.similarity_threshold
-                    if min_similarity <= similarity <= max_similarity:
-                        try:
-                            size, file_size = self._get_image_info(img_url)
-                            # 优化质量评分：分辨率 * 文件大小（KB）
-                            quality_score = size[0] * size[1] * (file_size / 1024)
-                        except Exception as e:
-                            logger.warning(f"获取图片信息失败: {str(e)}")
-                            quality_score = 0
-
-                        # 存储结果
-                        candidate = {
-                            'url': img_url,
-                            'title': cleaned_title,
-                            'source': AnimeSource.BILIBILI,
-                            'resolution': size,
-                            'file_size': file_size,
-                            'quality_score': quality_score,
-                            'similarity': similarity
-                        }
-                        candidates.append(candidate)
-
-                # 如果没有找到任何符合条件的匹配项
-                if not candidates:
-                    logger.info("Bilibili: 未找到符合条件的动漫条目")
-                    return None
-
-                # 输出所有待选择的结果
-                logger.info("Bilibili: 待选择的候选条目：")
-                for i, candidate in enumerate(candidates, 1):
-                    logger.info(
-                        f"候选 {i}: 标题='{candidate['title']}', "
-                        f"URL={candidate['url']}, "
-                        f"相似度={candidate['similarity']}, "
-                        f"质量评分={candidate['quality_score']}, "
-                        f"分辨率={candidate['resolution']}, "
-                        f"文件大小={candidate['file_size']} 字节"
-                    )
-
-                # 选择最相似且质量最高的图片
-                best_match = max(candidates, key=lambda x: (x['similarity'], x['quality_score']))
-                logger.info(
-                    f"Bilibili: 选择最相似且质量最高的标题 '{best_match['title']}' "
-                    f"(相似度: {best_match['similarity']}, 质量评分: {best_match['quality_score']})"
-                )
-                return best_match
+            # 检查返回数据是否有效
+            if data.get('code') != 0 or not data.get('data', {}).get('result'):
+                logger.info("Bilibili: 未找到匹配的动漫条目")
+                return None
+
+            entries = []
+            aliases = []
+            entry_ids = {}  # 封面 URL -> 条目 ID，选中后记入别名索引
+            for item in data['data']['result']:
+                # 提取标题和封面图片 URL
+                raw_title = item.get('title', '').strip()
+                img_url = item.get('cover', '').replace('http:', 'https:')
+
+                # 验证标题和封面 URL
+                if not raw_title or not img_url or not img_url.endswith(('.jpg', '.jpeg', '.png')):
+                    continue
+                # 清理标题中的 <em> 高亮标签
+                entries.append((clean_title(raw_title), img_url))
+                entry_ids[img_url] = item.get('season_id') or item.get('media_id')
+                aliases.append((entry_ids[img_url],
+                                [('title', clean_title(raw_title)), ('org_title', clean_title(item.get('org_title') or ''))],
+                                None))
+            # 所有条目的标题和原名（通常是日文）都记入别名索引，封面只记录最终选中的条目
+            self.alias_index.record_many(AnimeSource.BILIBILI.value, aliases)
+
+            # 第一阶段：只用元数据（相似度）筛选候选，此时不请求图片
+            candidates = []
+            with self.metrics.timer('match'):
+                similarities = TitleMatcher(anime_name).scores([title for title, _ in entries])
+            for (cleaned_title, img_url), similarity in zip(entries, similarities):
+                logger.debug(f"Bilibili: 标题 '{cleaned_title}', 相似度: {similarity}")
+
+                # 筛选相似度在指定范围内的条目
+                min_similarity = self.similarity_threshold
+                if min_similarity <= similarity <= max_similarity:
+                    candidates.append({
+                        'url': img_url,
+                        'title': cleaned_title,
+                        'source': AnimeSource.BILIBILI.value,
+                        'similarity': similarity
+                    })
+
+            # 如果没有找到任何符合条件的匹配项
+            if not candidates:
+                logger.info("Bilibili: 未找到符合条件的动漫条目")
+                return None
+
+            # 第二阶段：只探测排名靠前的图片，选择最相似且质量最高的
+            best_match = self._select_candidate("Bilibili", candidates)
+            self.alias_index.set_cover(AnimeSource.BILIBILI.value, entry_ids.get(best_match['url']), best_match['url'])
+            logger.info(
+                f"Bilibili: 选择最相似且质量最高的标题 '{best_match['title']}' "
+                f"(相似度: {best_match['similarity']}, 质量评分: {best_match['quality_score']})"
+            )
+            return best_match
 
         except requests.ConnectionError:
             logger.error("Bilibili: 网络连接失败")
@@ -460,7 +625,7 @@ class AnimeDownloader:
             logger.error(f"Bilibili 获取失败: {str(e)}")
         return None
     
-    def _get_anilist_cover(self, anime_name: str, min_similarity: int = 90, max_similarity: int = 100, delay: float = 1.0) -> Optional[Dict]:
+    def _get_anilist_cover(self, anime_name: str, min_similarity: int = 90, max_similarity: int = 100) -> Optional[Dict]:
         """
         从 AniList GraphQL API 获取动漫封面，支持相似度筛选和图片质量排序。
 
@@ -468,7 +633,6 @@ class AnimeDownloader:
             anime_name (str): 动漫名称（支持中文、英文等）。
             min_similarity (int): 标题相似度最小阈值（默认90）。
             max_similarity (int): 标题相似度最大阈值（默认100）。
-            delay (float): 请求前的随机延迟时间（秒，默认1.0）。
 
         Returns:
             Optional[Dict]: 包含封面信息的字典（URL、标题、来源等），未找到时返回None.
@@ -482,49 +646,20 @@ class AnimeDownloader:
             return None
 
         try:
-            # 随机延迟
-            time.sleep(random.uniform(self.delays.get(AnimeSource.ANILIST, delay), 3))
-
-            # 构造 GraphQL 查询
-            query = """
-            query ($search: String) {
-                Page(page: 1, perPage: 10) {
-                    media(search: $search, type: ANIME) {
-                        coverImage { large }
-                        title { romaji english native }
-                        synonyms
-                    }
-                }
-            }
-            """
-            variables = {"search": anime_name}
-            self.headers['User-Agent'] = self._get_random_user_agent()
+            # 与其他并发查询的标题合并为一个 GraphQL 请求
             logger.debug(f"AniList: 发送 GraphQL 查询，搜索标题: {anime_name}")
-
-            # 发送请求
-            response = self.session.post(
-                "https://graphql.anilist.co",
-                json={"query": query, "variables": variables},
-                headers=self.headers,
-                timeout=10
-            )
-            response.raise_for_status()
-            logger.debug(f"AniList: 响应状态码: {response.status_code}")
-
-            # 解析响应
-            data = response.json()
-            media_list = data.get('data', {}).get('Page', {}).get('media', [])
+            with self.metrics.timer('search'):
+                media_list = self.anilist.search(anime_name)
             if not media_list:
                 logger.info("AniList: 未找到匹配的动漫条目")
                 return None
 
-            # 初始化候选列表
-            candidates = []
-
-            # 清理和标准化输入标题
-            cleaned_anime_name = clean_title(anime_name)
-            normalized_anime_name = normalize_title(cleaned_anime_name)
+            # 输入标题只标准化一次
+            matcher = TitleMatcher(anime_name)
 
+            entries = []
+            aliases = []
+            entry_ids = {}  # 封面 URL -> 条目 ID，选中后记入别名索引
             for media in media_list:
                 img_url = media.get('coverImage', {}).get('large')
                 main_title = (
@@ -536,83 +671,63 @@ class AnimeDownloader:
                     continue
 
                 main_title = main_title.strip().replace("'", "_")
-                aliases = media.get('synonyms', [])
-                all_titles = [main_title] + [alias.strip().replace("'", "_") for alias in aliases]
-
-                # 清理和标准化主标题
-                cleaned_title = clean_title(main_title)
-                normalized_title = normalize_title(cleaned_title)
-
-                # 计算主标题的模糊相似度
-                similarity = fuzz.ratio(normalized_anime_name, normalized_title)
+                synonyms = media.get('synonyms') or []
+                all_titles = [main_title] + [alias.strip().replace("'", "_") for alias in synonyms]
+                entries.append((clean_title(main_title), img_url, all_titles))
+                titles = media.get('title') or {}
+                entry_ids[img_url] = media.get('id') or img_url
+                aliases.append((entry_ids[img_url],
+                                [(kind, titles.get(kind) or '') for kind in ('romaji', 'english', 'native')]
+                                + [('synonym', alias) for alias in synonyms],
+                                None))
+            # 所有条目的罗马音、英文、日文标题和别名都记入别名索引，封面只记录最终选中的条目
+            self.alias_index.record_many(AnimeSource.ANILIST.value, aliases)
+
+            # 第一阶段：只用元数据（完全匹配别名、模糊相似度）筛选候选，此时不请求图片
+            candidates = []
+            with self.metrics.timer('match'):
+                similarities = matcher.scores([title for title, _, _ in entries])
+            for (cleaned_title, img_url, all_titles), similarity in zip(entries, similarities):
                 logger.debug(f"AniList: 标题 '{cleaned_title}', 模糊相似度: {similarity}")
 
                 # 检查完全匹配（主标题或别名）
-                is_exact_match = False
-                for title in all_titles:
-                    cleaned_alias = clean_title(title)
-                    normalized_alias = normalize_title(cleaned_alias)
-                    if normalized_anime_name == normalized_alias:
-                        is_exact_match = True
-                        break
-
-                # 获取图片信息
-                try:
-                    size, file_size = self._get_image_info(img_url)
-                    quality_score = size[0] * size[1] * (file_size / 1024)
-                except Exception as e:
-                    logger.warning(f"获取图片信息失败: {str(e)}")
-                    quality_score = 0
-
-                # 创建候选条目
-                candidate = {
-                    'url': img_url,
-                    'title': cleaned_title,
-                    'source': AnimeSource.ANILIST,
-                    'resolution': size,
-                    'file_size': file_size,
-                    'quality_score': quality_score,
-                    'similarity': 100 if is_exact_match else similarity
-                }
+                is_exact_match = matcher.is_exact(all_titles)
 
                 # 添加到候选列表（完全匹配或模糊匹配满足阈值）
                 min_similarity = self.similarity_threshold
                 if is_exact_match or (min_similarity <= similarity <= max_similarity):
-                    candidates.append(candidate)
+                    candidates.append({
+                        'url': img_url,
+                        'title': cleaned_title,
+                        'source': AnimeSource.ANILIST.value,
+                        'similarity': 100 if is_exact_match else similarity
+                    })
 
             # 如果没有找到任何符合条件的匹配项
             if not candidates:
                 logger.info("AniList: 未找到符合条件的动漫条目")
                 return None
 
-            # 输出所有待选择的结果
-            logger.info("AniList: 待选择的候选条目：")
-            for i, candidate in enumerate(candidates, 1):
-                logger.info(
-                    f"候选 {i}: 标题='{candidate['title']}', "
-                    f"URL={candidate['url']}, "
-                    f"相似度={candidate['similarity']}, "
-                    f"质量评分={candidate['quality_score']}, "
-                    f"分辨率={candidate['resolution']}, "
-                    f"文件大小={candidate['file_size']} 字节"
-                )
-
-            # 选择质量最高的图片
-            best_match = max(candidates, key=lambda x: x['quality_score'])
+            # 第二阶段：只探测排名靠前的图片，完全匹配优先，同档位内选择质量最高的
+            best_match = self._select_candidate("AniList", candidates)
+            self.alias_index.set_cover(AnimeSource.ANILIST.value, entry_ids.get(best_match['url']), best_match['url'])
             logger.info(
                 f"AniList: 选择质量最高的标题 '{best_match['title']}' "
                 f"(相似度: {best_match['similarity']}, 质量评分: {best_match['quality_score']})"
             )
             return best_match
 
-        except requests.ConnectionError:
+        except requests.ConnectionError as e:
             logger.error("AniList: 网络连接失败")
+            _record_shared_failure(e)
             return None
-        except requests.Timeout:
+        except requests.Timeout as e:
             logger.error("AniList: 请求超时")
+            _record_shared_failure(e)
             return None
         except requests.HTTPError as e:
             logger.error(f"AniList: HTTP 错误: {e}")
+            _record_shared_failure(e)
             return None
         except Exception as e:
             logger.error(f"AniList 获取失败: {str(e)}")
@@ -622,15 +737,20 @@ class AnimeDownloader:
         """从MyAnimeList获取封面"""
         try:
             search_url = f"https://myanimelist.net/anime.php?q={anime_name}"
-            response = requests.get(search_url, headers=self.headers)
+            with self.metrics.timer('search'):
+                response = self._request('GET', search_url, headers=self.headers)
             response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'html.parser')
+            self.capture.capture(AnimeSource.MAL.value, anime_name, response.text)
+            with self.metrics.timer('parse'):
+                soup = _parse_html(response.text, only='a.hoverinfo_trigger')
             
             anime_link = soup.select_one('a.hoverinfo_trigger')
             if anime_link:
                 detail_url = anime_link['href']
-                detail_response = requests.get(detail_url, headers=self.headers)
-                detail_soup = BeautifulSoup(detail_response.text, 'html.parser')
+                with self.metrics.timer('search'):
+                    detail_response = self._request('GET', detail_url, headers=self.headers)
+                with self.metrics.timer('parse'):
+                    detail_soup = _parse_html(detail_response.text, only='img[itemprop="image"]')
                 
                 img = detail_soup.select_one('img[itemprop="image"]')
                 if img:
@@ -643,7 +763,7 @@ class AnimeDownloader:
                         'source': AnimeSource.MAL.value,
                         'resolution': size,
                         'file_size': file_size,
-                        'quality_score': size[0] * size[1] * file_size
+                        'quality_score': quality_score(size, file_size)
                     }
         except Exception as e:
             print(f"MAL获取失败: {str(e)}")
@@ -653,10 +773,12 @@ class AnimeDownloader:
         """从AniDB获取封面"""
         try:
             search_url = f"https://anidb.net/anime/?adb.search={anime_name}&do.search=1"
-            response = requests.get(search_url, headers=self.headers)
+            with self.metrics.timer('search'):
+                response = self._request('GET', search_url, headers=self.headers)
             response.raise_for_status()
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
+            self.capture.capture(AnimeSource.ANIDB.value, anime_name, response.text)
+            with self.metrics.timer('parse'):
+                soup = _parse_html(response.text, only='.thumb_anime')
             anime_item = soup.select_one('.thumb_anime')
             if anime_item:
                 img = anime_item.select_one('img')
@@ -671,7 +793,7 @@ class AnimeDownloader:
                         'source': AnimeSource.ANIDB.value,
                         'resolution': size,
                         'file_size': file_size,
-                        'quality_score': size[0] * size[1] * file_size
+                        'quality_score': quality_score(size, file_size)
                     }
         except Exception as e:
             print(f"AniDB获取失败: {str(e)}")
@@ -687,8 +809,6 @@ class AnimeDownloader:
             #     raise ValueError("未在 .env 文件中配置 PROXY，请设置 PROXY=http://your_proxy_host:your_proxy_port")
             # print(f"使用代理: {proxy}")
 
-            # 随机延迟，防止频率限制
-            time.sleep(random.uniform(self.delays.get(AnimeSource.IYF, 1), 3))
             # 配置 Selenium，模拟真实浏览器
 
             options = Options()
@@ -725,7 +845,8 @@ class AnimeDownloader:
                     driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
                     time.sleep(2)
                     # 解析页面
-                    soup = BeautifulSoup(driver.page_source, 'html.parser')
+                    page_source = driver.page_source
+                    soup = _parse_html(page_source)
                     break
                 except Exception as e:
                     if attempt == 2:
@@ -734,13 +855,8 @@ class AnimeDownloader:
                     if driver:
                         driver.quit()
                     time.sleep(random.uniform(2, 5))
-            # 保存 HTML
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            safe_anime_name = re.sub(r'[^\w\-]', '_', anime_name)
-            html_filename = os.path.join(self.output_dir, f"{safe_anime_name}_{timestamp}_iyf.html")
-            with open(html_filename, 'w', encoding='utf-8') as f:
-                f.write(soup.prettify())
-            print(f"HTML 保存至: {html_filename}")
+            # 开启调试快照时由后台线程保存 HTML
+            self.capture.capture(AnimeSource.IYF.value, anime_name, page_source)
             # 输出页面标题
             title = soup.select_one('title').text if soup.select_one('title') else '无标题'
             print(f"页面标题: {title}")
@@ -759,7 +875,7 @@ class AnimeDownloader:
                     img_url = img.get('data-src', img['src'])
                     title = title_elem.text.strip().replace("'", "_")  # 替换单引号
                     # 计算相似度
-                    similarity = fuzz.ratio(anime_name.lower(), title.lower())
+                    similarity = TitleMatcher(anime_name).score(title)
                     print(f"iyf: 标题 '{title}', 相似度: {similarity}")
                     
                     # 完全匹配或部分匹配 anime_name 的子字符串
@@ -775,7 +891,7 @@ class AnimeDownloader:
                             'source': AnimeSource.IYF.value,
                             'resolution': size,
                             'file_size': file_size,
-                            'quality_score': size[0] * size[1] * file_size
+                            'quality_score': quality_score(size, file_size)
                         }
                         print(f"iyf: 抓取成功（完全或部分匹配）: {result['url']}")
                         return result
@@ -789,7 +905,7 @@ class AnimeDownloader:
                             'source': AnimeSource.IYF.value,
                             'resolution': size,
                             'file_size': file_size,
-                            'quality_score': size[0] * size[1] * file_size
+                            'quality_score': quality_score(size, file_size)
                         }
                 else:
                     print("iyf: 条目缺少图片或标题")
@@ -808,6 +924,175 @@ class AnimeDownloader:
         return None
 
 #工具函数
+    def _probe_candidate(self, candidate: Dict) -> Dict:
+        """探测候选图片的分辨率和文件大小（MB），填入质量评分"""
+        try:
+            with self.metrics.timer('probe'):
+                size, file_size = self._get_image_info(candidate['url'])
+        except Exception as e:
+            logger.warning(f"获取图片信息失败: {str(e)}")
+            size, file_size = (0, 0), 0
+        candidate['resolution'] = size
+        candidate['file_size'] = file_size
+        candidate['quality_score'] = quality_score(size, file_size)
+        return candidate
+
+    def _select_candidate(self, label: str, candidates: List[Dict]) -> Dict:
+        """
+        两阶段选择候选封面。
+
+        第一阶段按元数据排序：相似度从高到低，同相似度时 URL 规格大的在前，全程不联网。
+        第二阶段按排名逐档探测图片：相似度优先于质量，所以只要最高档位中有一张可用图片，
+        排名就已确定，后续档位不再探测；每个档位最多探测 probe_top_k 张。
+        探测到的图片都不可用时返回排名第一的候选。
+
+        Args:
+            label (str): 日志中的来源名称。
+            candidates (List[Dict]): 包含 url、title、source、similarity 的候选条目，不能为空。
+
+        Returns:
+            Dict: 选中的候选，已填入 resolution、file_size 和 quality_score。
+        """
+        ranked = sorted(candidates, key=lambda c: (c['similarity'], _size_variant_rank(c['url'])), reverse=True)
+        logger.info(f"{label}: 待选择的候选条目：")
+        for i, candidate in enumerate(ranked, 1):
+            logger.info(f"候选 {i}: 标题='{candidate['title']}', URL={candidate['url']}, 相似度={candidate['similarity']}")
+
+        probed = []
+        for similarity, group in itertools.groupby(ranked, key=lambda c: c['similarity']):
+            tier = [self._probe_candidate(candidate) for candidate in list(group)[:self.probe_top_k]]
+            probed.extend(tier)
+            for candidate in tier:
+                logger.info(
+                    f"{label}: 探测 '{candidate['title']}': 质量评分={candidate['quality_score']}, "
+                    f"分辨率={candidate['resolution']}, 文件大小={candidate['file_size']} MB"
+                )
+            usable = [candidate for candidate in tier if candidate['quality_score'] > 0]
+            if usable:
+                logger.debug(f"{label}: 共 {len(ranked)} 个候选，探测 {len(probed)} 张图片")
+                return max(usable, key=lambda c: c['quality_score'])
+        return ranked[0]
+
+    def _request(self, method: str, url: str, session=None, cache_ttl: Optional[float] = None,
+                 cache_if: Optional[Callable[[requests.Response], bool]] = None,
+                 validate: Optional[Callable[[requests.Response], None]] = None, **kwargs) -> requests.Response:
+        """
+        所有 HTTP 请求的统一入口：先按主机取令牌，再通过 session 发送。
+
+        session 可以是 requests.Session 或 WarmSession，默认使用 self.session。
+        cache_ttl 不为空时经过持久化响应缓存，新鲜的缓存直接返回且不占用限速令牌；
+        cache_if 用于判断响应是否值得缓存。
+        validate 在每次尝试得到响应后调用，抛出 requests.HTTPError 表示响应不可用（如 AniList 的 GraphQL 错误），
+        状态码为暂时性错误时同样按重试策略重试。
+        未指定 timeout 时使用该主机的自适应超时；GET 请求可能被对冲，见 _send_hedged；
+        暂时性错误按 self.retry_policy 重试，每次尝试都重新取令牌。
+        请求数、响应字节数（流式响应由读取方统计）、限速等待时间和缓存命中都记入 self.metrics；
+        在来源查询中发送时，请求是否失败还会记入该查询的结果，供熔断器使用。
+        """
+        if cache_ttl:
+            response = self.http_cache.request(
+                lambda **kw: self._request(method, url, session=session, validate=validate, **kw),
+                method, url, cache_ttl, cache_if=cache_if, **kwargs
+            )
+            self.metrics.inc('cache_hits' if response.from_cache else 'cache_misses', cache='http')
+            return response
+        host = urlparse(url).hostname
+        kwargs.setdefault('timeout', self.latency.timeout(host))
+        outcome = _call_outcome.get()
+
+        def send() -> requests.Response:
+            # 每次尝试（包括重试）都重新取令牌
+            waited = self.rate_limiter.acquire(url)
+            if waited:
+                self.metrics.inc('sleep_seconds', waited, reason='rate_limit')
+            try:
+                response = self._send_hedged(session or self.session, method, url, host, kwargs)
+            except requests.RequestException as e:
+                self.metrics.inc('request_errors', host=host, error=type(e).__name__)
+                raise
+            self.metrics.inc('requests', host=host, status=response.status_code)
+            if validate is not None:
+                try:
+                    validate(response)
+                except requests.RequestException as e:
+                    response.close()
+                    self.metrics.inc('request_errors', host=host, error=type(e).__name__)
+                    raise
+            return response
+
+        try:
+            response = self.retry_policy.call(send, outcome['source'] if outcome else host)
+        except requests.RequestException:
+            if outcome is not None:
+                outcome['failed'] = True
+            raise
+        if outcome is not None:
+            outcome['failed'] = _is_failure_status(response.status_code)
+        if not kwargs.get('stream'):
+            self.metrics.inc('response_bytes', len(response.content), host=host)
+        return response
+
+    def _send_hedged(self, session, method: str, url: str, host: str, kwargs: dict) -> requests.Response:
+        """
+        发送请求；GET 请求超过该主机的 p95 仍未返回时再发送一份副本，使用先成功的响应。
+
+        副本只在限速器有空闲令牌且未超出对冲预算时发送，不会为此等待；落后的响应到达后直接关闭。
+        主机样本不足或非 GET 请求时直接在当前线程发送。
+        """
+        delay = self.latency.hedge_delay(host) if method == 'GET' else None
+        if delay is None:
+            return self._timed_send(session, method, url, host, kwargs)
+
+        # 每个请求复制一份上下文，使工作线程中记录的指标仍带有来源标签
+        def submit() -> Future:
+            return self._hedge_pool.submit(contextvars.copy_context().run,
+                                           self._timed_send, session, method, url, host, kwargs)
+
+        primary = submit()
+        try:
+            return primary.result(timeout=delay)
+        except FuturesTimeout:
+            pass
+        if not (self.latency.try_hedge(host) and self.rate_limiter.try_acquire(url)):
+            return primary.result()
+        self.metrics.inc('hedged_requests', host=host)
+        hedge = submit()
+        error = None
+        for future in as_completed((primary, hedge)):
+            try:
+                response = future.result()
+            except requests.RequestException as e:
+                error = e
+                continue
+            (hedge if future is primary else primary).add_done_callback(_close_response)
+            if future is hedge:
+                self.metrics.inc('hedge_wins', host=host)
+            return response
+        raise error
+
+    def _timed_send(self, session, method: str, url: str, host: str, kwargs: dict) -> requests.Response:
+        """发送请求并把耗时（流式请求到收到响应头为止）记入 self.latency；超时的请求同样记录"""
+        start = time.perf_counter()
+        try:
+            response = session.request(method, url, **kwargs)
+        except requests.Timeout:
+            self.latency.record(host, time.perf_counter() - start)
+            raise
+        self.latency.record(host, time.perf_counter() - start)
+        return response
+
+    @staticmethod
+    def _check_cancelled() -> None:
+        """
+        当前线程所属的查询已被放弃时抛出 SearchCancelled。
+
+        只在搜索开始和探测图片前检查：已发出的请求无法中断，而 AniList 的合并查询由多个标题共享，
+        不能因为其中一个标题被取消而中止。
+        """
+        event = _cancel_event.get()
+        if event is not None and event.is_set():
+            raise SearchCancelled()
+
     def _get_random_user_agent(self) -> str:
         """返回随机用户代理，模拟不同浏览器，应对用户代理检测"""
         user_agents = [
@@ -818,69 +1103,265 @@ class AnimeDownloader:
         ]
         return random.choice(user_agents)
     def _get_image_info(self, url: str) -> tuple:
-        """获取图片信息（尺寸和文件大小）"""
+        """
+        获取图片信息（尺寸和文件大小）。
+
+        先用 Range 请求读取文件头部，由 ImageFile.Parser 增量解析出尺寸，
+        文件大小取自 Content-Range 或 Content-Length；只有头部信息不足时才完整下载。
+        已缓存的图片直接从缓存中读取。所属查询已被取消时抛出 SearchCancelled，不再发送请求。
+        """
+        self._check_cancelled()
         try:
-            response = self.session.get(url, stream=True)
-            response.raise_for_status()
-            img = Image.open(io.BytesIO(response.content))
-            size = img.size
-            file_size = len(response.content) / (1024 * 1024)  # MB
-            return size, file_size
+            cached = self.image_cache.get(url)
+            if cached is not None:
+                self.metrics.inc('cache_hits', cache='image')
+                return _image_size(cached), len(cached) / (1024 * 1024)  # MB
+
+            headers = {'Range': f'bytes=0-{self.probe_bytes - 1}'}
+            with self._request('GET', url, headers=headers, stream=True) as response:
+                response.raise_for_status()
+                from PIL import ImageFile
+                parser = ImageFile.Parser()
+                data = bytearray()
+                for chunk in response.iter_content(chunk_size=4096):
+                    data += chunk
+                    parser.feed(chunk)
+                    if parser.image is not None or len(data) >= self.probe_bytes:
+                        break
+                self.metrics.inc('response_bytes', len(data), host=urlparse(url).hostname)
+                total_size = _get_total_size(response)
+                if parser.image is not None and total_size:
+                    if total_size == len(data):
+                        # 小图在探测时已完整读取
+                        self.image_cache.put(url, data)
+                    return parser.image.size, total_size / (1024 * 1024)  # MB
+
+                # 头部不足以得到尺寸或大小；未使用 Range 的响应直接读完剩余部分
+                complete = response.status_code != 206 or total_size == len(data)
+                if complete:
+                    probed = len(data)
+                    for chunk in response.iter_content(chunk_size=8192):
+                        data += chunk
+                    self.metrics.inc('response_bytes', len(data) - probed, host=urlparse(url).hostname)
+                    self.image_cache.put(url, data)
+            if not complete:
+                logger.debug(f"图片头部信息不足，完整下载: {url}")
+                data = self.image_cache.fetch(url, lambda: self._fetch_image(url))
+            return _image_size(data), len(data) / (1024 * 1024)  # MB
         except Exception as e:
             print(f"获取图片信息失败: {str(e)}")
             return (0, 0), 0 
-    def download_image(self, url: str, anime_name: str, source: str) -> Optional[str]:
-        """下载图片并显示进度"""
+    def _fetch_image(self, url: str, desc: Optional[str] = None) -> bytes:
+        """完整下载图片内容，大图按 Range 分段并行下载；desc 不为空时显示进度条"""
+        data = self.range_downloader.fetch(url, desc=desc)
+        self.metrics.inc('response_bytes', len(data), host=urlparse(url).hostname)
+        return data
+
+    def download_image(self, url: str, anime_name: str, source: str, result: Optional[Dict] = None) -> Optional[str]:
+        """
+        下载图片并显示进度，返回 "{动漫名称}_{来源}" 文件名路径。
+
+        索引中已有同一 URL 且文件仍在时直接返回；已缓存的图片直接写入，同一 URL 的并发下载只请求一次；
+        图片按内容哈希保存，内容与已有封面相同时不写磁盘。result 为 get_covers 的返回项，用于写入索引。
+        """
+        with self.metrics.labels(source=source, title=anime_name):
+            return self._download_image(url, anime_name, source, result)
+
+    def _download_image(self, url: str, anime_name: str, source: str, result: Optional[Dict]) -> Optional[str]:
+        """download_image 的实现，在来源和标题的指标标签内执行"""
         try:
-            time.sleep(1)
-            response = self.session.get(url, stream=True)
-            response.raise_for_status()
-            
-            total_size = int(response.headers.get('content-length', 0))
-            os.makedirs('covers', exist_ok=True)
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f'covers/{anime_name}_{source}_{timestamp}.jpg'
-            
-            with open(filename, 'wb') as f:
-                with tqdm(
-                    total=total_size,
-                    unit='B',
-                    unit_scale=True,
-                    desc=f"下载 {source} 封面"
-                ) as pbar:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        if chunk:
-                            f.write(chunk)
-                            pbar.update(len(chunk))
-            return filename
+            indexed = self.cover_index.get(anime_name, source)
+            if indexed and indexed['url'] == url and os.path.exists(indexed['path']):
+                self.metrics.inc('cache_hits', cache='index')
+                return indexed['path']
+
+            desc = f"下载 {source} 封面" if self.show_progress else None
+            with self.metrics.timer('download'):
+                data = self.image_cache.fetch(url, lambda: self._fetch_image(url, desc))
+
+            ext = guess_extension(url)
+            with self.metrics.timer('store'):
+                content_hash, object_path = self.cover_store.put_bytes_if_absent(data, ext)
+                path = self.cover_store.link(object_path, anime_name, source, ext)
+            if self.derivatives:
+                self.derivatives.submit(object_path, content_hash, source)
+
+            result = result or {}
+            resolution = _image_size(data)
+            self.cover_index.record(anime_name, source, result.get('title', anime_name), url, resolution,
+                                    len(data), quality_score(resolution, len(data) / (1024 * 1024)), content_hash, path)
+            return path
         except Exception as e:
             print(f"下载失败: {str(e)}")
             return None
         
-    def get_covers(self, anime_name: str, sources: List[AnimeSource] = None) -> List[Dict]:
-        """从多个来源获取封面"""
+    def _fetch_from_source(self, source: AnimeSource, anime_name: str, resolved: Optional[Dict] = None,
+                           cancel: Optional[threading.Event] = None, failed: Optional[set] = None) -> Optional[Dict]:
+        """
+        在工作线程中查询单个来源，请求节奏由 self.rate_limiter 按主机控制。
+
+        resolved 为别名索引的解析结果：查询与某个别名完全相同且该来源有已知封面时直接探测该图片，不再搜索；
+        否则使用别名索引给出的该来源搜索词（如 AniList 的罗马音）代替原始查询。
+        cancel 被设置后，查询在下一个检查点抛出 SearchCancelled。
+        最后一次请求失败（连接错误、超时、5xx、403、429）或查询抛出异常时记为该来源熔断器的一次失败；
+        没有结果但请求正常（如搜索不到）记为成功；被取消的查询不计入。
+        最后一次请求失败时还会把 source 加入 failed（如果提供），供 get_covers 区分失败与未找到。
+        """
+        breaker = self.breakers[source]
+        outcome = {'source': source.value, 'failed': False}
+        cancel_token = _cancel_event.set(cancel)
+        outcome_token = _call_outcome.set(outcome)
+        try:
+            print(f"从 {source.value} 获取封面...")
+            with self.metrics.labels(source=source.value, title=anime_name), self.metrics.timer('total'):
+                result = self._fetch_resolved(source, anime_name, resolved)
+        except SearchCancelled:
+            breaker.release()
+            raise
+        except Exception:
+            breaker.record_failure()
+            raise
+        finally:
+            _call_outcome.reset(outcome_token)
+            _cancel_event.reset(cancel_token)
+        if outcome['failed']:
+            breaker.record_failure()
+            if failed is not None:
+                failed.add(source)
+        else:
+            breaker.record_success()
+        return result
+
+    def _on_circuit_change(self, name: str, state: str) -> None:
+        """熔断器状态变化时更新指标并记录日志"""
+        self.metrics.set('circuit_state', STATE_VALUES[state], source=name)
+        self.metrics.inc('circuit_transitions', source=name, state=state)
+        logger.warning(f"{name} 熔断器状态变为 {state}")
+
+    def _fetch_resolved(self, source: AnimeSource, anime_name: str, resolved: Optional[Dict]) -> Optional[Dict]:
+        """先尝试别名索引给出的已知封面或搜索词，否则按原始查询搜索"""
+        self._check_cancelled()
+        if resolved:
+            known_url = resolved['covers'].get(source.value)
+            term = resolved['terms'].get(source.value, anime_name)
+            # 模糊匹配只用于换搜索词，搜索结果仍会按相似度筛选；跳过搜索需要完全匹配
+            if known_url and resolved['similarity'] == 100:
+                result = self._probe_candidate({
+                    'url': known_url,
+                    'title': term,
+                    'source': source.value,
+                    'similarity': resolved['similarity']
+                })
+                if result['quality_score'] > 0:
+                    self.metrics.inc('cache_hits', cache='alias')
+                    print(f"{source.value}: 别名索引命中，使用已知封面")
+                    return result
+            if term != anime_name:
+                print(f"{source.value}: 别名索引命中，搜索 '{term}'")
+                return self.sources[source](term)
+        return self.sources[source](anime_name)
+
+    def best_cover(self, anime_name: str) -> Optional[Dict]:
+        """查询索引中某个标题已下载的质量最高的封面，不发送网络请求"""
+        return self.cover_index.best(anime_name)
+
+    def get_covers(self, anime_name: str, sources: List[AnimeSource] = None, refresh: bool = False,
+                   target: Optional[QualityTarget] = None, deadline: Optional[float] = None,
+                   outcome: Optional[Dict[AnimeSource, str]] = None) -> List[Dict]:
+        """
+        从多个来源并发获取封面，结果按 sources 的顺序返回。
+
+        索引中已有下载记录（且文件仍在）的来源直接返回索引结果，不再搜索；refresh 为 True 时全部重新搜索。
+        熔断器打开的来源直接跳过。
+        target 不为空时，一旦某个结果满足目标即放弃其余来源并立即返回已得到的结果；
+        deadline 为最长等待时间（秒），到时返回目前为止的结果。被放弃的来源在下一个检查点停止，不再发送新请求。
+        outcome 不为空时，返回前为每个启用的来源写入查询情况（OUTCOME_FOUND、OUTCOME_NOT_FOUND、OUTCOME_FAILED 等），
+        调用方可据此区分"所有来源都确认没有结果"与"部分来源被跳过、失败或超时"。
+        """
         if sources is None:
             sources = list(AnimeSource)
-        
-        results = []
-        for source in sources:
-            if source in self.sources:
-                print(f"从 {source.value} 获取封面...")
-                # 添加延迟
-                delay = self.delays.get(source, 1)
-                time.sleep(delay)
-                result = self.sources[source](anime_name)
-                if result:
-                    results.append(result)
-                
-                # 源之间添加额外延迟
-                if len(results) > 0:
-                    time.sleep(1)
-        return results
-
+        if outcome is None:
+            outcome = {}
+
+        enabled = [source for source in sources if source in self.sources]
+        if not enabled:
+            return []
+
+        found = {}
+        if not refresh:
+            for source in enabled:
+                indexed = self.cover_index.get(anime_name, source.value)
+                if indexed and os.path.exists(indexed['path']):
+                    self.metrics.inc('cache_hits', cache='index', source=source.value)
+                    found[source] = indexed
+                    outcome[source] = OUTCOME_FOUND
+        pending = []
+        for source in enabled:
+            if source in found:
+                continue
+            if not self.breakers[source].allow():
+                # 熔断中的来源不发送任何请求
+                self.metrics.inc('circuit_skips', source=source.value)
+                outcome[source] = OUTCOME_SKIPPED
+                continue
+            pending.append(source)
+        if not pending:
+            return [found[source] for source in enabled if source in found]
+
+        # 查询标题在别名索引中对应的作品；refresh 时只借用搜索词，不使用已知封面
+        resolved = self.alias_index.resolve(anime_name, ALIAS_MIN_SIMILARITY)
+        if resolved and refresh:
+            resolved = dict(resolved, covers={})
+
+        cancel = threading.Event()
+        failed = set()
+        abandoned_as = OUTCOME_CANCELLED
+        executor = ThreadPoolExecutor(max_workers=min(len(pending), self.max_workers))
+        futures = {
+            executor.submit(self._fetch_from_source, source, anime_name, resolved, cancel, failed): source
+            for source in pending
+        }
+        try:
+            for future in as_completed(futures, timeout=deadline):
+                source = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.error(f"{source.value} 获取失败: {str(e)}")
+                    outcome[source] = OUTCOME_FAILED
+                    continue
+                if not result:
+                    outcome[source] = OUTCOME_FAILED if source in failed else OUTCOME_NOT_FOUND
+                    continue
+                found[source] = result
+                outcome[source] = OUTCOME_FOUND
+                if target is not None and target.met_by(result):
+                    self.metrics.inc('early_exits', reason='target')
+                    logger.info(f"{source.value} 的结果已满足质量目标，不再等待其他来源")
+                    break
+        except FuturesTimeout:
+            abandoned_as = OUTCOME_TIMED_OUT
+            self.metrics.inc('early_exits', reason='deadline')
+            logger.info(f"已到达截止时间 {deadline} 秒，返回目前的 {len(found)} 个结果")
+        finally:
+            abandoned = [future for future in futures if not future.done()]
+            if abandoned:
+                cancel.set()
+                self.metrics.inc('cancelled_sources', len(abandoned))
+            # 不等待被放弃的来源：尚未开始的直接取消，进行中的在下一个检查点退出
+            executor.shutdown(wait=False, cancel_futures=True)
+            for future in abandoned:
+                if future.cancelled():
+                    # 没有开始执行的查询也要归还熔断器的试探名额
+                    self.breakers[futures[future]].release()
+            for future, source in futures.items():
+                # 提前返回时已完成但没有取结果的查询也算作被放弃，它的结果不在返回值中
+                outcome.setdefault(source, abandoned_as)
+        return [found[source] for source in enabled if source in found]
 
 
 def main():
+    setup_cli()
     downloader = AnimeDownloader()
     anime_name = input("请输入动漫名称: ")
     
@@ -895,7 +1376,8 @@ def main():
         saved_path = downloader.download_image(
             result['url'],
             anime_name,
-            result['source']
+            result['source'],
+            result=result
         )
         if saved_path:
             size_mb = os.path.getsize(saved_path) / (1024 * 1024)
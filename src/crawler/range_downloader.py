@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import io
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+class IncompleteDownload(IOError):
+    """读取到的字节数与服务器声明的大小不一致"""
+
+
+def _parse_content_range(response: requests.Response) -> Optional[Tuple[int, int, int]]:
+    """解析 206 响应的 Content-Range，返回 (起始, 结束, 总大小)，无法解析时返回 None"""
+    value = response.headers.get('Content-Range', '')
+    unit, _, spec = value.partition(' ')
+    span, _, total = spec.partition('/')
+    start, _, end = span.partition('-')
+    if unit != 'bytes' or not (start.isdigit() and end.isdigit() and total.isdigit()):
+        return None
+    return int(start), int(end), int(total)
+
+
+def _content_encoding(response: requests.Response) -> Optional[str]:
+    """响应体的 Content-Encoding，未压缩时返回 None"""
+    encoding = response.headers.get('Content-Encoding', '').strip().lower()
+    return None if encoding in ('', 'identity') else encoding
+
+
+def _decode_body(data: bytes, encoding: Optional[str]) -> bytes:
+    """按 Content-Encoding 解压完整的响应体，支持的编码与 urllib3 相同（br、zstd 需要安装对应的可选依赖）"""
+    if encoding is None:
+        return data
+    from urllib3.response import HTTPResponse
+    response = HTTPResponse(io.BytesIO(data), headers={'Content-Encoding': encoding}, preload_content=False)
+    return response.read(decode_content=True)
+
+
+class _ChunkSizer:
+    """
+    自适应读取块大小：读取很快时加倍，很慢时减半。
+
+    快速的本地或 CDN 连接用大块减少 Python 层的循环次数，慢速连接用小块保持进度条流畅。
+    """
+
+    def __init__(self, minimum: int, maximum: int, fast: float = 0.05, slow: float = 0.5):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.fast = fast
+        self.slow = slow
+        self.size = minimum
+
+    def update(self, elapsed: float, full: bool) -> None:
+        if full and elapsed < self.fast:
+            self.size = min(self.maximum, self.size * 2)
+        elif elapsed > self.slow:
+            self.size = max(self.minimum, self.size // 2)
+
+
+class RangeDownloader:
+    """
+    大图并行分段下载。
+
+    第一个请求带 Range: bytes=0-(part_size-1)。服务器返回 206 且文件大于 part_size 时，
+    其余部分拆成最多 max_parts - 1 段并行请求（带 If-Range 保证各段来自同一版本），
+    写入预先分配的缓冲区；服务器不支持 Range 时退回单连接下载。
+    读取块大小在 min_chunk 和 max_chunk 之间自适应。
+    每一段以及整体的字节数都会校验，不完整时抛出 IncompleteDownload，不会返回截断的内容。
+
+    Content-Length 和 Content-Range 按传输的字节计算，因此请求带 Accept-Encoding: identity，
+    响应体按原始字节读取、校验后再按 Content-Encoding 解压；服务器仍然压缩了分段响应时，
+    不同响应的压缩结果未必能拼接，退回不带 Range 的单连接下载。
+
+    Args:
+        request (Callable): 发送请求的函数，签名同 AnimeDownloader._request(method, url, **kwargs)。
+        part_size (int): 触发分段下载的大小，也是每段的最小大小（字节）。
+        max_parts (int): 最多同时使用的连接数。
+        min_chunk (int): 最小读取块（字节）。
+        max_chunk (int): 最大读取块（字节）。
+        timeout (float): 每个请求的超时（秒）。
+    """
+
+    def __init__(self, request: Callable[..., requests.Response], part_size: int = 1024 * 1024,
+                 max_parts: int = 4, min_chunk: int = 64 * 1024, max_chunk: int = 1024 * 1024,
+                 timeout: Optional[float] = None):
+        self.request = request
+        self.part_size = part_size
+        self.max_parts = max(1, max_parts)
+        self.min_chunk = min_chunk
+        self.max_chunk = max_chunk
+        self.timeout = timeout
+
+    def fetch(self, url: str, headers: Optional[Dict[str, str]] = None, desc: Optional[str] = None) -> bytes:
+        """下载完整内容；desc 不为空时显示进度条"""
+        headers = dict(headers or {})
+        headers.setdefault('Accept-Encoding', 'identity')
+        first_headers = dict(headers)
+        if self.max_parts > 1:
+            first_headers['Range'] = f'bytes=0-{self.part_size - 1}'
+        kwargs = {'timeout': self.timeout} if self.timeout is not None else {}
+
+        with self.request('GET', url, headers=first_headers, stream=True, **kwargs) as response:
+            response.raise_for_status()
+            content_range = _parse_content_range(response) if response.status_code == 206 else None
+            if content_range is None:
+                # 服务器忽略了 Range，整个文件在这个响应中
+                return self._read_single(url, response, desc)
+
+            start, end, total = content_range
+            if start != 0:
+                raise IncompleteDownload(f"{url}: Range 响应起始位置错误: {start}")
+            encoding = _content_encoding(response)
+            if encoding is None or end + 1 >= total:
+                return self._read_parts(url, headers, response, end, total, encoding, desc, kwargs)
+            logger.debug(f"{url} 的 Range 响应仍被压缩（{encoding}），改为单连接下载")
+
+        with self.request('GET', url, headers=headers, stream=True, **kwargs) as response:
+            response.raise_for_status()
+            return self._read_single(url, response, desc)
+
+    def _read_single(self, url: str, response: requests.Response, desc: Optional[str]) -> bytes:
+        """读取单个响应中的完整内容，按 Content-Length 校验传输的字节数后解压"""
+        length = response.headers.get('Content-Length', '')
+        total = int(length) if length.isdigit() else None
+        with self._progress(total, desc) as progress:
+            data = self._read_all(response, progress)
+        if total is not None and len(data) != total:
+            raise IncompleteDownload(f"{url}: 读取 {len(data)} 字节，应为 {total} 字节")
+        return _decode_body(bytes(data), _content_encoding(response))
+
+    def _read_parts(self, url: str, headers: Dict[str, str], response: requests.Response, end: int, total: int,
+                    encoding: Optional[str], desc: Optional[str], kwargs: dict) -> bytes:
+        """response 为第一段（0-end），其余部分并行请求，全部读完后解压"""
+        buffer = bytearray(total)
+        view = memoryview(buffer)
+        ranges = self._split(end + 1, total)
+        validator = response.headers.get('ETag') or response.headers.get('Last-Modified')
+        with self._progress(total, desc) as progress:
+            if not ranges:
+                self._read_into(response, view[0:end + 1], progress)
+                return _decode_body(bytes(buffer), encoding)
+            logger.debug(f"分段下载 {url}: {total} 字节，{len(ranges) + 1} 个连接")
+            with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+                futures = [
+                    executor.submit(self._fetch_range, url, headers, validator, part_start, part_end,
+                                    view[part_start:part_end + 1], progress, kwargs)
+                    for part_start, part_end in ranges
+                ]
+                # 第一段在当前线程中读取，与其余各段同时进行
+                self._read_into(response, view[0:end + 1], progress)
+                for future in futures:
+                    future.result()
+        return bytes(buffer)
+
+    def _split(self, offset: int, total: int) -> List[Tuple[int, int]]:
+        """把 [offset, total) 拆成最多 max_parts - 1 段，每段不小于 part_size"""
+        remaining = total - offset
+        if remaining <= 0:
+            return []
+        parts = max(1, min(self.max_parts - 1, remaining // self.part_size))
+        size = -(-remaining // parts)
+        return [(start, min(start + size, total) - 1) for start in range(offset, total, size)]
+
+    def _fetch_range(self, url: str, headers: Dict[str, str], validator: Optional[str], start: int, end: int,
+                     target: memoryview, progress, kwargs: dict) -> None:
+        part_headers = dict(headers, Range=f'bytes={start}-{end}')
+        if validator:
+            part_headers['If-Range'] = validator
+        with self.request('GET', url, headers=part_headers, stream=True, **kwargs) as response:
+            response.raise_for_status()
+            content_range = _parse_content_range(response) if response.status_code == 206 else None
+            if content_range is None or content_range[:2] != (start, end):
+                # 文件在两次请求之间发生了变化（If-Range 不匹配时服务器返回 200 全文）
+                raise IncompleteDownload(f"{url}: 分段 {start}-{end} 的响应不匹配")
+            if _content_encoding(response) is not None:
+                raise IncompleteDownload(f"{url}: 分段 {start}-{end} 的响应被压缩，无法与其他分段拼接")
+            self._read_into(response, target, progress)
+
+    def _read_into(self, response: requests.Response, target: memoryview, progress) -> None:
+        """把响应体读入 target，字节数必须恰好等于 target 的长度"""
+        sizer = _ChunkSizer(self.min_chunk, self.max_chunk)
+        position = 0
+        while position < len(target):
+            want = min(sizer.size, len(target) - position)
+            started = time.perf_counter()
+            chunk = response.raw.read(want, decode_content=False)
+            if not chunk:
+                break
+            target[position:position + len(chunk)] = chunk
+            position += len(chunk)
+            progress(len(chunk))
+            sizer.update(time.perf_counter() - started, len(chunk) == want)
+        if position != len(target) or response.raw.read(1, decode_content=False):
+            raise IncompleteDownload(f"{response.url}: 分段长度应为 {len(target)} 字节，实际不符")
+
+    def _read_all(self, response: requests.Response, progress) -> bytearray:
+        sizer = _ChunkSizer(self.min_chunk, self.max_chunk)
+        data = bytearray()
+        while True:
+            started = time.perf_counter()
+            chunk = response.raw.read(sizer.size, decode_content=False)
+            if not chunk:
+                return data
+            data += chunk
+            progress(len(chunk))
+            sizer.update(time.perf_counter() - started, len(chunk) == sizer.size)
+
+    @staticmethod
+    @contextmanager
+    def _progress(total: Optional[int], desc: Optional[str]) -> Iterator[Callable[[int], None]]:
+        """线程安全的进度回调；desc 为空时不显示进度条，也不导入 tqdm"""
+        if desc is None:
+            yield lambda size: None
+            return
+        from tqdm import tqdm
+        lock = threading.Lock()
+        with tqdm(total=total, unit='B', unit_scale=True, desc=desc) as bar:
+            def update(size: int) -> None:
+                with lock:
+                    bar.update(size)
+            yield update
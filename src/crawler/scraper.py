@@ -2,44 +2,69 @@
 # -*- coding: utf-8 -*-
 
 import requests
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 import os
-from datetime import datetime
 import json
 import re
+import time
+from urllib.parse import urlparse
+from crawler.cover_store import CoverStore, guess_extension
+from crawler.anilist_client import AniListClient
+from crawler.range_downloader import RangeDownloader
+from utils.metrics import METRICS
+from utils.retry import RetryPolicy
+from utils.http_client import ConnectionPools
+from config.config import COVERS_DIR, RANGE_DOWNLOAD_PART_SIZE, RANGE_DOWNLOAD_MAX_PARTS
+from config.config import MAX_RETRIES, RETRY_BASE_DELAY, RETRY_MAX_DELAY, RETRY_BUDGET_RATIO, RETRY_BUDGET_RESERVE
+from config.config import HOST_POOL_SIZES, DEFAULT_POOL_SIZE, HTTP2_HOSTS
 
-def get_anime_cover(anime_name: str) -> Optional[dict]:
-    query = '''
-    query ($search: String) {
-        Media (search: $search, type: ANIME) {
-            coverImage {
-                extraLarge
-                large
-            }
-            title {
-                native
-                romaji
-            }
-        }
-    }
-    '''
-    
-    variables = {
-        'search': anime_name
-    }
-    
-    url = 'https://graphql.anilist.co'
-    response = requests.post(url, json={'query': query, 'variables': variables})
-    
-    if response.status_code == 200:
-        data = response.json()
-        media = data['data']['Media']
+# 与多源下载器相同的重试策略：只重试暂时性错误，指数退避加抖动，遵守 Retry-After
+RETRY_POLICY = RetryPolicy(MAX_RETRIES, RETRY_BASE_DELAY, RETRY_MAX_DELAY, RETRY_BUDGET_RATIO, RETRY_BUDGET_RESERVE)
+
+# 模块内所有请求共用的会话和连接池，多次调用之间复用 TCP / TLS 连接
+SESSION = ConnectionPools(HOST_POOL_SIZES, DEFAULT_POOL_SIZE, HTTP2_HOSTS).session()
+
+def _retrying_request(source: str):
+    """
+    返回签名同 requests.request 的函数，请求经过 SESSION 和 RETRY_POLICY，使用 source 的重试预算；
+    validate 在每次尝试得到响应后调用，抛出的 requests.HTTPError 同样按重试策略处理
+    """
+    def request(method: str, url: str, validate=None, **kwargs) -> requests.Response:
+        def send() -> requests.Response:
+            response = SESSION.request(method, url, **kwargs)
+            if validate is not None:
+                try:
+                    validate(response)
+                except requests.RequestException:
+                    response.close()
+                    raise
+            return response
+        return RETRY_POLICY.call(send, source)
+    return request
+
+def get_anime_covers(anime_names: List[str]) -> Dict[str, Optional[dict]]:
+    """从AniList批量获取动漫封面，每 10 个标题合并为一个 GraphQL 请求"""
+    client = AniListClient(_retrying_request('anilist'), per_page=1)
+    results = {}
+    with METRICS.labels(source='anilist'), METRICS.timer('search'):
+        found = client.search_many(anime_names)
+    for anime_name, media_list in found.items():
+        if not media_list:
+            results[anime_name] = None
+            continue
+        media = media_list[0]
         cover_url = media['coverImage'].get('extraLarge') or media['coverImage'].get('large')
-        return {
+        results[anime_name] = {
             'url': cover_url,
             'title': media['title'].get('native') or media['title'].get('romaji')
         }
-    return None
+    return results
+
+def get_anime_cover(anime_name: str) -> Optional[dict]:
+    try:
+        return get_anime_covers([anime_name]).get(anime_name)
+    except requests.exceptions.RequestException:
+        return None
 
 def get_bili_cover(anime_name: str) -> Optional[dict]:
     """从Bilibili获取动漫封面"""
@@ -62,18 +87,26 @@ def get_bili_cover(anime_name: str) -> Optional[dict]:
 
     try:
         # 添加延迟，避免请求过快
-        import time
         time.sleep(1)
+        METRICS.inc('sleep_seconds', 1, reason='throttle')
         
-        session = requests.Session()
-        response = session.get(
-            url, 
-            params=params, 
-            headers=headers,
-            timeout=10
-        )
+        def send() -> requests.Response:
+            response = SESSION.get(
+                url, 
+                params=params, 
+                headers=headers,
+                timeout=10
+            )
+            METRICS.inc('requests', host='api.bilibili.com', status=response.status_code)
+            return response
+
+        # 连接错误、超时和 429 / 5xx 由 RETRY_POLICY 重试，其他错误直接返回
+        with METRICS.timer('search'):
+            response = RETRY_POLICY.call(send, 'bilibili')
+        METRICS.inc('response_bytes', len(response.content), host='api.bilibili.com')
         response.raise_for_status()
-        data = response.json()
+        with METRICS.timer('parse'):
+            data = response.json()
         
         if data['code'] == 0 and data['data'].get('result'):
             anime = data['data']['result'][0]
@@ -92,49 +125,23 @@ def get_bili_cover(anime_name: str) -> Optional[dict]:
         print(f"未知错误: {str(e)}")
     return None
 
-# 添加重试机制的装饰器
-def retry_on_failure(max_retries=3, delay=2):
-    def decorator(func):
-        def wrapper(*args, **kwargs):
-            for i in range(max_retries):
-                try:
-                    result = func(*args, **kwargs)
-                    if result:
-                        return result
-                except Exception as e:
-                    print(f"第 {i+1} 次尝试失败: {str(e)}")
-                    if i < max_retries - 1:
-                        time.sleep(delay)
-                    continue
-            return None
-        return wrapper
-    return decorator
-
-# 使用装饰器
-@retry_on_failure(max_retries=3, delay=2)
-def get_bili_cover_with_retry(anime_name: str) -> Optional[dict]:
-    return get_bili_cover(anime_name)
-
 def download_cover(url: str, anime_name: str, source: str = '') -> str:
-    """下载封面图片"""
+    """下载封面图片（大图分段并行下载），校验完整后按内容寻址原子地保存"""
     headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
         'Referer': 'https://www.bilibili.com'
     }
     
     try:
-        response = requests.get(url, headers=headers, stream=True)
-        response.raise_for_status()
-        
-        os.makedirs('covers', exist_ok=True)
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f'covers/{anime_name}_{source}_{timestamp}.jpg'
+        downloader = RangeDownloader(_retrying_request(source or 'download'), RANGE_DOWNLOAD_PART_SIZE, RANGE_DOWNLOAD_MAX_PARTS)
+        with METRICS.timer('download'):
+            data = downloader.fetch(url, headers=headers)
+        METRICS.inc('response_bytes', len(data), host=urlparse(url).hostname)
         
-        with open(filename, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
-        return filename
+        store = CoverStore(COVERS_DIR)
+        ext = guess_extension(url)
+        _, object_path = store.put(data, ext)
+        return store.link(object_path, anime_name, source, ext)
     except Exception as e:
         print(f"下载图片时出错: {str(e)}")
         return ''
@@ -146,8 +153,13 @@ def start_scraping(anime_name: str = None) -> None:
     
     print(f"正在搜索: {anime_name}")
     
+    with METRICS.labels(source='bilibili', title=anime_name), METRICS.timer('total'):
+        _scrape(anime_name)
+
+def _scrape(anime_name: str) -> None:
+    """start_scraping 的实现，在来源和标题的指标标签内执行"""
     # 从Bilibili获取
-    result = get_bili_cover_with_retry(anime_name)
+    result = get_bili_cover(anime_name)
     
     if result:
         print(f"在Bilibili找到: {result['title']}")
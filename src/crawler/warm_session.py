@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+import os
+import threading
+import time
+from http.cookiejar import LWPCookieJar
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+
+from utils.http_client import ConnectionPools
+from utils.metrics import METRICS, Metrics
+from utils.rate_limiter import HostRateLimiter
+
+logger = logging.getLogger(__name__)
+
+
+class WarmSession:
+    """
+    长期复用的 HTTP 会话：首次使用时访问主页获取 Cookie，之后所有请求共用这些 Cookie。
+
+    Cookie 以 LWP 格式保存到磁盘，下次启动直接加载；过期（Cookie 自身的 expires，
+    或没有 expires 的会话 Cookie 超过 max_age）后才重新访问主页。
+    接口拒绝当前 Cookie 时调用方应调用 invalidate()，下一次请求会自动重新预热。
+
+    Args:
+        home_url (str): 用于获取 Cookie 的主页地址。
+        cookie_path (str): Cookie 文件路径。
+        rate_limiter (HostRateLimiter): 预热请求使用的限速器。
+        headers (dict): 会话固定使用的请求头，同一组 Cookie 始终搭配同一个 User-Agent。
+        max_age (float): Cookie 文件的最长有效时间（秒）。
+        warmup_delay (float): 访问主页后等待 Cookie 生效的时间（秒）。
+        metrics (Metrics): 记录预热耗时、请求数和等待时间，默认使用 METRICS。
+        pools (ConnectionPools): 共享的连接池，默认使用会话自己的连接池。
+    """
+
+    def __init__(self, home_url: str, cookie_path: str, rate_limiter: HostRateLimiter,
+                 headers: Optional[Dict[str, str]] = None, max_age: float = 24 * 3600,
+                 warmup_delay: float = 0, metrics: Optional[Metrics] = None,
+                 pools: Optional[ConnectionPools] = None):
+        self.home_url = home_url
+        self.cookie_path = cookie_path
+        self.rate_limiter = rate_limiter
+        self.max_age = max_age
+        self.warmup_delay = warmup_delay
+        self.metrics = metrics or METRICS
+        self.session = pools.session() if pools else requests.Session()
+        self.session.headers.update(headers or {})
+        self._warmed_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        """从磁盘加载未过期的 Cookie"""
+        if not os.path.exists(self.cookie_path):
+            return
+        saved_at = os.path.getmtime(self.cookie_path)
+        if time.time() - saved_at >= self.max_age:
+            return
+        jar = LWPCookieJar(self.cookie_path)
+        try:
+            jar.load(ignore_discard=True)
+        except (OSError, ValueError) as e:
+            logger.warning(f"加载 Cookie 失败: {self.cookie_path}: {str(e)}")
+            return
+        for cookie in jar:
+            self.session.cookies.set_cookie(cookie)
+        self._warmed_at = saved_at
+
+    def _save(self) -> None:
+        """将当前 Cookie 写入磁盘"""
+        directory = os.path.dirname(self.cookie_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        jar = LWPCookieJar(self.cookie_path)
+        for cookie in self.session.cookies:
+            jar.set_cookie(cookie)
+        jar.save(ignore_discard=True)
+
+    def is_warm(self) -> bool:
+        """已预热且没有 Cookie 过期"""
+        if self._warmed_at is None or time.time() - self._warmed_at >= self.max_age:
+            return False
+        count = len(self.session.cookies)
+        self.session.cookies.clear_expired_cookies()
+        return len(self.session.cookies) == count
+
+    def ensure_warm(self) -> None:
+        """Cookie 无效时访问主页重新获取，并发调用只会预热一次"""
+        if self.is_warm():
+            return
+        with self._lock:
+            if self.is_warm():
+                return
+            logger.info(f"访问 {self.home_url} 获取 cookies...")
+            with self.metrics.timer('warmup'):
+                waited = self.rate_limiter.acquire(self.home_url)
+                response = self.session.get(self.home_url, timeout=10)
+                self.metrics.inc('requests', host=urlparse(self.home_url).hostname, status=response.status_code)
+                response.raise_for_status()
+                if self.warmup_delay:
+                    time.sleep(self.warmup_delay)
+            self.metrics.inc('sleep_seconds', waited, reason='rate_limit')
+            self.metrics.inc('sleep_seconds', self.warmup_delay, reason='warmup')
+            self._warmed_at = time.time()
+            self._save()
+            logger.info(f"获取到 Cookies: {list(self.session.cookies.keys())}")
+
+    def invalidate(self) -> None:
+        """丢弃当前 Cookie，下一次请求时重新预热"""
+        with self._lock:
+            self.session.cookies.clear()
+            self._warmed_at = None
+            if os.path.exists(self.cookie_path):
+                os.remove(self.cookie_path)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """确保已预热后发送请求，可直接作为 AnimeDownloader._request 的 session 参数"""
+        self.ensure_warm()
+        return self.session.request(method, url, **kwargs)
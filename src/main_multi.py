@@ -1,25 +1,134 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-import sys
+import argparse
 import os
-from crawler.multi_source_downloader import AnimeDownloader, AnimeSource
+from crawler.multi_source_downloader import AnimeDownloader, AnimeSource, QualityTarget
+from crawler.batch import Checkpoint, iter_titles, run_batch, SELECT_ALL, SELECT_BEST
+from crawler.derivatives import DerivativePipeline
+from utils.metrics import METRICS
+from utils.helpers import setup_cli
+from utils.debug_capture import ALL_SOURCES, DebugCapture
+from config.config import QUALITY_TARGET_MIN_SIMILARITY
+from config.config import DEBUG_CAPTURE_DIR, DEBUG_CAPTURE_MAX_BYTES, DEBUG_CAPTURE_SAMPLE_RATE, DEBUG_CAPTURE_QUEUE_SIZE
+from config.config import DERIVATIVES_DIR, DERIVATIVE_SPECS, DERIVATIVE_WORKERS
+
+def parse_resolution(value):
+    """解析 "宽x高" 形式的分辨率"""
+    try:
+        width, height = (int(v) for v in value.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"分辨率格式应为 宽x高，例如 1000x1400: {value}")
+    return width, height
+
+def parse_sources(value):
+    """解析逗号分隔的来源名，"all" 表示所有来源"""
+    names = {name.strip() for name in value.split(',') if name.strip()}
+    unknown = names - {source.value for source in AnimeSource} - {ALL_SOURCES}
+    if unknown:
+        raise argparse.ArgumentTypeError(
+            f"未知的来源: {', '.join(sorted(unknown))}，可选 {', '.join(s.value for s in AnimeSource)} 或 {ALL_SOURCES}")
+    return names
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="多源动漫封面下载")
+    parser.add_argument('anime_name', nargs='?', help="动漫名称，不提供时运行中提示输入")
+    parser.add_argument('--batch', metavar='FILE',
+                        help="批量模式：从文件读取标题（每行一个），\"-\" 表示从标准输入读取")
+    parser.add_argument('--select', choices=[SELECT_BEST, SELECT_ALL],
+                        help="下载策略：best 只下载最高质量封面，all 下载所有来源；批量模式默认 best")
+    parser.add_argument('--workers', type=int, default=4, help="批量模式同时处理的标题数（默认 4）")
+    parser.add_argument('--checkpoint', metavar='FILE',
+                        help="批量模式的进度文件，默认为 <FILE>.checkpoint.jsonl；从标准输入读取时需显式指定")
+    parser.add_argument('--refresh', action='store_true', help="忽略已下载封面索引，重新搜索所有来源")
+    parser.add_argument('--target', metavar='WxH', type=parse_resolution,
+                        help="质量目标：得到不低于该分辨率且标题相似度达标的封面后立即返回，不再等待其他来源")
+    parser.add_argument('--target-similarity', type=float, default=QUALITY_TARGET_MIN_SIMILARITY,
+                        help=f"质量目标的最低标题相似度（默认 {QUALITY_TARGET_MIN_SIMILARITY}）")
+    parser.add_argument('--deadline', type=float, metavar='SECONDS',
+                        help="每个标题最多等待的秒数，到时使用目前为止找到的封面")
+    parser.add_argument('--capture-html', metavar='SOURCES', type=parse_sources, default=set(),
+                        help=f"为这些来源（逗号分隔，{ALL_SOURCES} 表示所有来源）在后台保存压缩的搜索页快照，"
+                             f"目录 {DEBUG_CAPTURE_DIR}，总大小超过上限时删除最旧的文件")
+    parser.add_argument('--capture-sample', type=float, default=DEBUG_CAPTURE_SAMPLE_RATE, metavar='RATE',
+                        help=f"开启快照的来源中保存快照的比例（默认 {DEBUG_CAPTURE_SAMPLE_RATE}）")
+    parser.add_argument('--derivatives', action='store_true',
+                        help=f"下载后在多个进程中生成缩略图和 WebP / AVIF 等格式（config.DERIVATIVE_SPECS），保存到 {DERIVATIVES_DIR}")
+    parser.add_argument('--derivative-workers', type=int, default=DERIVATIVE_WORKERS, metavar='N',
+                        help="生成派生图片的进程数（默认为 CPU 核数）")
+    parser.add_argument('--metrics', metavar='FILE',
+                        help="结束时写入各来源、各阶段的耗时和计数：.prom 为 Prometheus 文本格式，其他为 JSON Lines")
+    parser.add_argument('--metrics-events', metavar='FILE',
+                        help="把每次阶段计时（含标题和来源）追加写入 JSON Lines 事件日志")
+    return parser.parse_args()
+
+def quality_target(args):
+    """由 --target / --target-similarity 构造质量目标，未指定 --target 时返回 None"""
+    if not args.target:
+        return None
+    return QualityTarget(args.target[0], args.target[1], args.target_similarity)
+
+def main_batch(downloader, args):
+    """批量模式：不与用户交互，按策略下载并记录进度"""
+    checkpoint_path = args.checkpoint
+    if checkpoint_path is None and args.batch != '-':
+        checkpoint_path = f"{args.batch}.checkpoint.jsonl"
+    checkpoint = Checkpoint(checkpoint_path) if checkpoint_path else None
+
+    downloader.show_progress = False
+    stats = run_batch(
+        downloader,
+        iter_titles(args.batch),
+        select=args.select or SELECT_BEST,
+        workers=max(1, args.workers),
+        checkpoint=checkpoint,
+        refresh=args.refresh,
+        target=quality_target(args),
+        deadline=args.deadline
+    )
+    print(f"\n批量处理完成: 成功 {stats['ok']}，未找到 {stats['not_found']}，"
+          f"失败 {stats['failed']}，跳过 {stats['skipped']}")
 
 def main():
     print("Starting the multi-source anime cover crawler...")
+    args = parse_args()
+    setup_cli()
+    if args.metrics_events:
+        METRICS.log_events(args.metrics_events)
     
     # 创建下载器实例
-    downloader = AnimeDownloader()
-    
+    capture = DebugCapture(DEBUG_CAPTURE_DIR, DEBUG_CAPTURE_MAX_BYTES, args.capture_html, args.capture_sample,
+                           DEBUG_CAPTURE_QUEUE_SIZE)
+    derivatives = DerivativePipeline(DERIVATIVES_DIR, DERIVATIVE_SPECS, args.derivative_workers) if args.derivatives else None
+    downloader = AnimeDownloader(capture=capture, derivatives=derivatives)
+
+    try:
+        if args.batch:
+            main_batch(downloader, args)
+        else:
+            main_interactive(downloader, args)
+    finally:
+        if derivatives:
+            print("等待派生图片生成完成...")
+            derivatives.close()
+        capture.close()
+        METRICS.log_events(None)
+        if args.metrics:
+            METRICS.write(args.metrics)
+            print(f"指标已写入: {args.metrics}")
+
+def main_interactive(downloader, args):
+    """单个标题：显示所有来源的结果，按 --select 或用户选择下载"""
     # 获取动漫名称
-    anime_name = sys.argv[1] if len(sys.argv) > 1 else input("请输入动漫名称: ")
+    anime_name = args.anime_name or input("请输入动漫名称: ")
     
     # 默认使用所有可用源
     sources = list(AnimeSource)
     
     # 获取并下载封面
     print(f"\n正在搜索: {anime_name}")
-    results = downloader.get_covers(anime_name, sources)
+    results = downloader.get_covers(anime_name, sources, refresh=args.refresh,
+                                    target=quality_target(args), deadline=args.deadline)
     
     if not results:
         print("未找到任何封面")
@@ -40,8 +149,11 @@ def main():
         print(f"   文件大小: {file_size:.2f}MB")
         print(f"   质量评分: {result.get('quality_score', 0):.0f}")
 
-    # 询问用户是否只下载最高质量的图片
-    download_all = input("\n是否下载所有封面? (y/n, 默认只下载最高质量): ").lower() == 'y'
+    # 未通过 --select 指定时询问用户是否只下载最高质量的图片
+    if args.select:
+        download_all = args.select == SELECT_ALL
+    else:
+        download_all = input("\n是否下载所有封面? (y/n, 默认只下载最高质量): ").lower() == 'y'
     
     if download_all:
         download_list = sorted_results
@@ -55,7 +167,8 @@ def main():
         saved_path = downloader.download_image(
             result['url'],
             anime_name,
-            result['source']
+            result['source'],
+            result=result
         )
         if saved_path:
             print(f"\n下载完成:")
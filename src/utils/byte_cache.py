@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Callable, Optional
+
+
+class _Call:
+    """一次进行中的加载，供相同键的并发调用方等待结果"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Optional[bytes] = None
+        self.error: Optional[BaseException] = None
+
+
+class ByteCache:
+    """
+    以 URL 为键的字节缓存，按最近最少使用（LRU）淘汰。
+
+    小于 spill_threshold 的内容保存在内存中，总量不超过 memory_budget；
+    更大的内容写入临时目录，总量不超过 disk_budget。临时目录在首次溢出时创建，
+    缓存对象被回收或调用 close() 时删除。
+
+    Args:
+        memory_budget (int): 内存中缓存的最大字节数。
+        spill_threshold (int): 超过该大小的内容写入临时目录。
+        disk_budget (int): 临时目录中缓存的最大字节数。
+    """
+
+    def __init__(self, memory_budget: int = 64 * 1024 * 1024, spill_threshold: int = 4 * 1024 * 1024,
+                 disk_budget: int = 512 * 1024 * 1024):
+        self.memory_budget = memory_budget
+        self.spill_threshold = spill_threshold
+        self.disk_budget = disk_budget
+        # 键 -> (bytes 或临时文件路径, 字节数, 是否在内存中)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._memory_used = 0
+        self._disk_used = 0
+        self._spill_dir: Optional[str] = None
+        self._finalizer = None
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        """返回缓存的内容并将其标记为最近使用，未命中时返回 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            value, _, in_memory = entry
+        if in_memory:
+            return value
+        try:
+            with open(value, 'rb') as f:
+                return f.read()
+        except OSError:
+            # 临时文件被外部删除，视为未命中
+            self.discard(key)
+            return None
+
+    def put(self, key: str, data: bytes) -> None:
+        """写入缓存，超出预算时按 LRU 淘汰"""
+        data = bytes(data)
+        size = len(data)
+        in_memory = size <= self.spill_threshold
+        if size > (self.memory_budget if in_memory else self.disk_budget):
+            return
+        value = data if in_memory else self._spill(key, data)
+        with self._lock:
+            self._remove_locked(key)
+            self._entries[key] = (value, size, in_memory)
+            if in_memory:
+                self._memory_used += size
+            else:
+                self._disk_used += size
+            self._evict_locked()
+
+    def fetch(self, key: str, loader: Callable[[], bytes]) -> bytes:
+        """
+        返回 key 对应的内容，未命中时调用 loader 加载并写入缓存。
+
+        同一个键的并发调用只会执行一次 loader，其余调用方等待并共享结果（single-flight）。
+        """
+        data = self.get(key)
+        if data is not None:
+            return data
+        with self._lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = bytes(loader())
+            self.put(key, call.result)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            call.event.set()
+
+    def discard(self, key: str) -> None:
+        """删除缓存条目"""
+        with self._lock:
+            self._remove_locked(key)
+
+    def close(self) -> None:
+        """清空缓存并删除临时目录"""
+        with self._lock:
+            self._entries.clear()
+            self._memory_used = self._disk_used = 0
+            if self._finalizer is not None:
+                self._finalizer()
+            self._spill_dir = self._finalizer = None
+
+    def _spill(self, key: str, data: bytes) -> str:
+        """将内容写入临时目录，返回文件路径"""
+        with self._lock:
+            if self._spill_dir is None:
+                self._spill_dir = tempfile.mkdtemp(prefix='anime_cover_cache_')
+                self._finalizer = weakref.finalize(self, shutil.rmtree, self._spill_dir, True)
+            spill_dir = self._spill_dir
+        # 每次写入使用独立文件，避免覆盖同一键仍被引用的旧文件
+        prefix = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16] + '_'
+        fd, path = tempfile.mkstemp(prefix=prefix, dir=spill_dir)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        return path
+
+    def _remove_locked(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        value, size, in_memory = entry
+        if in_memory:
+            self._memory_used -= size
+        else:
+            self._disk_used -= size
+            try:
+                os.remove(value)
+            except OSError:
+                pass
+
+    def _evict_locked(self) -> None:
+        for key in list(self._entries):
+            if self._memory_used <= self.memory_budget and self._disk_used <= self.disk_budget:
+                break
+            _, _, in_memory = self._entries[key]
+            over = self._memory_used > self.memory_budget if in_memory else self._disk_used > self.disk_budget
+            if over:
+                self._remove_locked(key)
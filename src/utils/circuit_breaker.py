@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+
+# 熔断器状态，STATE_VALUES 为导出到指标时的数值
+CLOSED = 'closed'
+HALF_OPEN = 'half_open'
+OPEN = 'open'
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitBreaker:
+    """
+    线程安全的熔断器，用于跳过持续失败的来源。
+
+    关闭状态下正常放行；连续失败 failure_threshold 次，或最近 window 次调用中失败比例达到 error_rate 时打开，
+    打开期间 allow() 直接返回 False。cooldown 秒后进入半开状态，只放行一次试探调用：
+    成功则关闭，失败则重新打开并再等待 cooldown 秒。
+
+    Args:
+        name (str): 名称，用于日志和状态回调。
+        failure_threshold (int): 触发熔断的连续失败次数。
+        error_rate (float): 触发熔断的失败比例。
+        window (int): 计算失败比例的最近调用数，不足 window 次时只看连续失败。
+        cooldown (float): 打开后到半开试探的等待时间（秒）。
+        on_change (Callable): 状态变化时调用 on_change(name, state)。
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, error_rate: float = 0.5, window: int = 20,
+                 cooldown: float = 300, on_change: Optional[Callable[[str, str], None]] = None):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.error_rate = error_rate
+        self.cooldown = cooldown
+        self.on_change = on_change
+        self._recent = deque(maxlen=window)  # True 表示失败
+        self._consecutive = 0
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def allow(self) -> bool:
+        """是否放行一次调用；半开状态下只有取得试探名额的调用方得到 True"""
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN:
+                if time.monotonic() - self._opened_at < self.cooldown:
+                    return False
+                self._transition(HALF_OPEN)
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._probing = False
+            self._consecutive = 0
+            if self._state == HALF_OPEN:
+                self._recent.clear()
+                self._transition(CLOSED)
+            else:
+                self._recent.append(False)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._probing = False
+            self._consecutive += 1
+            self._recent.append(True)
+            if self._state == HALF_OPEN or self._should_open():
+                self._opened_at = time.monotonic()
+                self._transition(OPEN)
+
+    def release(self) -> None:
+        """放行的调用没有得出结果（例如被取消）时调用，归还半开状态下的试探名额"""
+        with self._lock:
+            self._probing = False
+
+    def _should_open(self) -> bool:
+        if self._state != CLOSED:
+            return False
+        if self._consecutive >= self.failure_threshold:
+            return True
+        return len(self._recent) == self._recent.maxlen and sum(self._recent) / len(self._recent) >= self.error_rate
+
+    def _transition(self, state: str) -> None:
+        if state == self._state:
+            return
+        self._state = state
+        if self.on_change:
+            self.on_change(self.name, state)
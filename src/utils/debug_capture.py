@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import atexit
+import gzip
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+from collections import deque
+from typing import Iterable, Optional
+
+from utils.metrics import METRICS, Metrics
+
+logger = logging.getLogger(__name__)
+
+# sources 中表示所有来源的名称
+ALL_SOURCES = 'all'
+
+
+class DebugCapture:
+    """
+    调试用的网页快照：按来源开启并抽样保存搜索页，便于排查选择器失效等问题。
+
+    capture() 只把内容放入有界队列，压缩和写盘在后台线程中进行，不会增加查询延迟；
+    队列满时丢弃该快照并记入 debug_capture_dropped。快照以 gzip 压缩保存，
+    目录中文件总大小超过 max_bytes 时从最旧的文件开始删除（目录中已有的文件也计入）。
+
+    Args:
+        directory (str): 快照目录，第一次写入时创建。
+        max_bytes (int): 目录中文件总大小的上限。
+        sources (Iterable[str]): 保存快照的来源名，ALL_SOURCES 表示所有来源；为空时关闭。
+        sample_rate (float): 开启的来源中保存快照的请求比例。
+        queue_size (int): 等待写入的快照数上限。
+        metrics (Metrics): 记录保存、丢弃的快照数和字节数，默认为共享的 METRICS。
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 50 * 1024 * 1024, sources: Iterable[str] = (),
+                 sample_rate: float = 1.0, queue_size: int = 64, metrics: Optional[Metrics] = None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.sources = frozenset(sources)
+        self.sample_rate = sample_rate
+        self.metrics = metrics or METRICS
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._files = None  # 按写入顺序排列的 (路径, 字节数)，第一次写入时扫描目录
+        self._total = 0
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def enabled(self, source: str) -> bool:
+        """是否为该来源保存快照"""
+        return ALL_SOURCES in self.sources or source in self.sources
+
+    def capture(self, source: str, name: str, markup: str) -> bool:
+        """
+        按抽样比例把 markup 交给后台线程保存，立即返回。
+
+        Returns:
+            bool: 快照是否已排队等待写入。
+        """
+        if not self.enabled(source) or random.random() >= self.sample_rate:
+            return False
+        self._start()
+        try:
+            self._queue.put_nowait((source, name, markup, time.time()))
+        except queue.Full:
+            self.metrics.inc('debug_capture_dropped', source=source)
+            return False
+        return True
+
+    def flush(self) -> None:
+        """等待已排队的快照全部写入"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self) -> None:
+        """写完已排队的快照并停止后台线程，之后再调用 capture() 会重新启动"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='debug-capture', daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._write(*item)
+            except Exception as e:
+                logger.warning(f"保存调试快照失败: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _write(self, source: str, name: str, markup: str, when: float) -> None:
+        if self._files is None:
+            self._files = self._scan()
+        timestamp = time.strftime('%Y%m%d_%H%M%S', time.localtime(when)) + f"_{int(when * 1e6) % 1000000:06d}"
+        safe_name = re.sub(r'[^\w\-]', '_', name)[:80]
+        path = os.path.join(self.directory, f"{safe_name}_{timestamp}_{source}.html.gz")
+        data = gzip.compress(markup.encode('utf-8'))
+        os.makedirs(self.directory, exist_ok=True)
+        partial = path + '.part'
+        with open(partial, 'wb') as f:
+            f.write(data)
+        os.replace(partial, path)
+        self._files.append((path, len(data)))
+        self._total += len(data)
+        self.metrics.inc('debug_captures', source=source)
+        self.metrics.inc('debug_capture_bytes', len(data), source=source)
+        self._evict()
+
+    def _scan(self) -> deque:
+        """目录中已有的文件，按修改时间从旧到新"""
+        files = []
+        if os.path.isdir(self.directory):
+            for entry in os.scandir(self.directory):
+                if entry.is_file():
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, entry.path, stat.st_size))
+        files.sort()
+        self._total = sum(size for _, _, size in files)
+        return deque((path, size) for _, path, size in files)
+
+    def _evict(self) -> None:
+        while self._total > self.max_bytes and self._files:
+            path, size = self._files.popleft()
+            self._total -= size
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
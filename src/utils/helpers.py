@@ -1,17 +1,28 @@
+import html
+import logging
+import re
+
+# 预编译的正则：HTML 标签，以及标准化时需要移除的非单词字符
+_TAG_RE = re.compile(r'<[^>]*>')
+_NON_WORD_RE = re.compile(r'[^\w]')
+
 def clean_title(title: str) -> str:
-    from bs4 import BeautifulSoup
     """清理标题中的 HTML 标签和多余字符"""
     if not title:
         return ""
-    soup = BeautifulSoup(title, 'html.parser')
-    return soup.get_text().strip()
+    # 快速路径：绝大多数标题不含标签和实体
+    if '<' not in title and '&' not in title:
+        return title.strip()
+    return html.unescape(_TAG_RE.sub('', title)).strip()
 
 def normalize_title(title: str) -> str:
-    import re
     """标准化标题，移除干扰字符"""
     if not title:
         return ""
-    return re.sub(r'[^\w]', '', title).lower()  # 只保留字母、数字和下划线
-
+    return _NON_WORD_RE.sub('', title).lower()  # 只保留字母、数字和下划线
 
-    
+def setup_cli() -> None:
+    """命令行入口的一次性设置：加载 .env（如代理配置）并配置日志；作为库导入时不做任何全局设置"""
+    from dotenv import load_dotenv
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import html
+import importlib.util
+import logging
+import re
+from functools import lru_cache
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# 可选的解析后端（bs4 的 TreeBuilder 名称），按速度从快到慢；解析结果都是 BeautifulSoup，选择器写法不变
+PARSERS = ('lxml', 'html.parser')
+
+# 支持的简单选择器：标签名、.类名、[属性="值"]，三者可组合，如 'a.hoverinfo_trigger'、'img[itemprop="image"]'
+_SIMPLE_SELECTOR = re.compile(
+    r'^(?P<tag>[\w-]+)?(?:\.(?P<cls>[\w-]+))?(?:\[(?P<attr>[\w-]+)=["\']?(?P<value>[^"\'\]]*)["\']?\])?$')
+_TITLE = re.compile(r'<title[^>]*>(.*?)</title>', re.IGNORECASE | re.DOTALL)
+
+
+@lru_cache(maxsize=None)
+def resolve_parser(preferred: str = 'lxml') -> str:
+    """返回可用的解析后端：preferred 未安装时退回 html.parser（标准库自带）"""
+    if preferred not in PARSERS:
+        raise ValueError(f"未知的 HTML 解析后端: {preferred}，可选 {', '.join(PARSERS)}")
+    if preferred == 'html.parser' or importlib.util.find_spec(preferred) is not None:
+        return preferred
+    logger.debug(f"未安装 {preferred}，使用 html.parser")
+    return 'html.parser'
+
+
+@lru_cache(maxsize=None)
+def strainer(selector: str):
+    """
+    把简单选择器转换成 SoupStrainer，解析时只构建匹配的元素及其子树。
+
+    类名按空白分隔的单个值匹配（与 CSS 一致），因此 '.result-item' 也能匹配 class="result-item movies"。
+    """
+    from bs4 import SoupStrainer
+    match = _SIMPLE_SELECTOR.match(selector.strip())
+    if not match or not any(match.groupdict().values()):
+        raise ValueError(f"不支持的选择器: {selector}")
+    attrs = {}
+    if match['cls']:
+        attrs['class'] = re.compile(rf'(^|\s){re.escape(match["cls"])}(\s|$)')
+    if match['attr']:
+        attrs[match['attr']] = match['value']
+    return SoupStrainer(match['tag'], attrs=attrs)
+
+
+def parse_html(markup: str, only: Optional[str] = None, parser: str = 'lxml'):
+    """
+    解析 HTML，bs4 在第一次解析时才导入。
+
+    Args:
+        markup (str): 网页内容。
+        only (str): 简单选择器（见 strainer），只保留匹配的元素及其子树；
+            之后仍用完整的 CSS 选择器查找，例如 only='.result-item' 后 select('.result-item article')。
+            不指定时构建整个文档。
+        parser (str): 首选的解析后端，见 PARSERS。
+
+    Returns:
+        BeautifulSoup: 解析结果。
+    """
+    from bs4 import BeautifulSoup
+    return BeautifulSoup(markup, resolve_parser(parser), parse_only=strainer(only) if only else None)
+
+
+def page_title(markup: str) -> Optional[str]:
+    """直接从网页内容中取出 <title>，不必为此构建整个文档"""
+    match = _TITLE.search(markup)
+    return html.unescape(match.group(1)).strip() if match else None
@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+# 写入缓存时保留的响应头
+_KEPT_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+
+class HttpCache:
+    """
+    基于 SQLite 的持久化 HTTP 响应缓存，用于搜索类 API。
+
+    新鲜度由调用方按来源传入的 TTL 决定；过期条目若带有 ETag 或 Last-Modified，
+    会发送条件请求进行重新验证，收到 304 时直接复用缓存内容。
+    缓存总大小超过 max_bytes 时按最近访问时间淘汰；总大小在打开数据库时统计一次，之后随写入和淘汰增减，
+    写入时不必扫描整张表。
+
+    Args:
+        path (str): SQLite 数据库文件路径。
+        max_bytes (int): 缓存响应体的总字节数上限。
+    """
+
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._conn: Optional[sqlite3.Connection] = None
+        self._total = 0  # 缓存响应体的总字节数，_connect 时从数据库读取
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """首次使用时打开数据库并建表"""
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS responses ('
+                ' key TEXT PRIMARY KEY,'
+                ' url TEXT NOT NULL,'
+                ' status INTEGER NOT NULL,'
+                ' headers TEXT NOT NULL,'
+                ' body BLOB NOT NULL,'
+                ' size INTEGER NOT NULL,'
+                ' fetched_at REAL NOT NULL,'
+                ' accessed_at REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)')
+            self._total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def make_key(method: str, url: str, params: Optional[dict] = None, json_body=None) -> str:
+        """由请求方法、完整 URL 和 JSON 请求体生成缓存键"""
+        full_url = requests.Request(method, url, params=params).prepare().url
+        body = json.dumps(json_body, sort_keys=True, ensure_ascii=False) if json_body is not None else ''
+        return hashlib.sha256(f"{method.upper()} {full_url}\n{body}".encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[dict]:
+        """读取缓存条目，未命中返回 None"""
+        with self._lock:
+            row = self._connect().execute(
+                'SELECT url, status, headers, body, fetched_at FROM responses WHERE key = ?', (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        url, status, headers, body, fetched_at = row
+        return {'url': url, 'status': status, 'headers': json.loads(headers), 'body': body, 'fetched_at': fetched_at}
+
+    def put(self, key: str, response: requests.Response) -> None:
+        """写入成功的响应，并在超出容量时淘汰最久未访问的条目"""
+        headers = {name: response.headers[name] for name in _KEPT_HEADERS if name in response.headers}
+        self.put_body(key, response.url, response.content, headers, response.status_code)
+
+    def put_body(self, key: str, url: str, body: bytes, headers: Optional[dict] = None, status: int = 200) -> None:
+        """直接写入响应体，用于缓存从合并请求中拆分出的单条结果"""
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                replaced = conn.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+                conn.execute(
+                    'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    (key, url, status, json.dumps(headers or {}), body, len(body), now, now)
+                )
+                total = self._total + len(body) - (replaced[0] if replaced else 0)
+                total = self._evict_locked(conn, total)
+            # 事务提交后才更新总大小，写入失败回滚时保持不变
+            self._total = total
+
+    def touch(self, key: str) -> None:
+        """重新验证成功后刷新条目的获取时间"""
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute('UPDATE responses SET fetched_at = ?, accessed_at = ? WHERE key = ?', (now, now, key))
+
+    def request(self, send: Callable[..., requests.Response], method: str, url: str, ttl: float,
+                cache_if: Optional[Callable[[requests.Response], bool]] = None, **kwargs) -> requests.Response:
+        """
+        带缓存地发送请求。
+
+        Args:
+            send (Callable): 实际发送请求的函数，接收 requests 的关键字参数。
+            method (str): 请求方法。
+            url (str): 请求 URL。
+            ttl (float): 缓存有效期（秒）。
+            cache_if (Callable): 判断 200 响应是否写入缓存，默认全部写入。
+            **kwargs: 透传给 send 的参数（params、json、headers、timeout 等）。
+
+        Returns:
+            requests.Response: 命中缓存时 from_cache 属性为 True。
+        """
+        key = self.make_key(method, url, kwargs.get('params'), kwargs.get('json'))
+        entry = self.get(key)
+        if entry is not None:
+            if time.time() - entry['fetched_at'] < ttl:
+                self._mark_accessed(key)
+                return self._build_response(entry)
+            # 过期条目使用条件请求重新验证
+            headers = dict(kwargs.get('headers') or {})
+            if 'ETag' in entry['headers']:
+                headers['If-None-Match'] = entry['headers']['ETag']
+            if 'Last-Modified' in entry['headers']:
+                headers['If-Modified-Since'] = entry['headers']['Last-Modified']
+            kwargs['headers'] = headers
+
+        response = send(**kwargs)
+        if response.status_code == 304 and entry is not None:
+            self.touch(key)
+            return self._build_response(entry)
+        if response.status_code == 200 and (cache_if is None or _safe_check(cache_if, response)):
+            self.put(key, response)
+        response.from_cache = False
+        return response
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _mark_accessed(self, key: str) -> None:
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (time.time(), key))
+
+    def _evict_locked(self, conn: sqlite3.Connection, total: int) -> int:
+        """总大小为 total 时按访问时间从旧到新删除条目，直到不超过 max_bytes，返回删除后的总大小"""
+        while total > self.max_bytes:
+            # 分批取最旧的条目，不必读出整张表
+            rows = conn.execute('SELECT key, size FROM responses ORDER BY accessed_at LIMIT 64').fetchall()
+            if not rows:
+                return 0
+            for key, size in rows:
+                conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+                total -= size
+                if total <= self.max_bytes:
+                    break
+        return total
+
+    @staticmethod
+    def _build_response(entry: dict) -> requests.Response:
+        """由缓存条目构造 requests.Response"""
+        response = requests.Response()
+        response.status_code = entry['status']
+        response.url = entry['url']
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = entry['body']
+        response.from_cache = True
+        return response
+
+
+def _safe_check(check: Callable[[requests.Response], bool], response: requests.Response) -> bool:
+    """执行 cache_if 判断，判断本身出错（如响应不是 JSON）时不缓存"""
+    try:
+        return bool(check(response))
+    except Exception:
+        return False
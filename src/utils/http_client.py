@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import importlib.util
+import logging
+import threading
+from typing import Dict, Iterable, Optional
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+logger = logging.getLogger(__name__)
+
+
+def http2_available() -> bool:
+    """是否安装了 HTTP/2 所需的可选依赖 httpx 和 h2（pip install "httpx[http2]"）"""
+    return importlib.util.find_spec('httpx') is not None and importlib.util.find_spec('h2') is not None
+
+
+class _Http2Body:
+    """
+    把 httpx 的流式响应包装成 requests.Response.raw 所需的文件接口。
+
+    与 urllib3 一致，decode_content 为 False 时返回未按 Content-Encoding 解压的原始字节；
+    同一个响应只能使用一种方式读取，以第一次 read() 为准。
+    """
+
+    def __init__(self, response):
+        self._response = response
+        self._chunks = None
+        self._buffer = bytearray()
+
+    def read(self, amt: Optional[int] = None, decode_content: bool = True) -> bytes:
+        if self._chunks is None:
+            self._chunks = self._response.iter_bytes() if decode_content else self._response.iter_raw()
+        while amt is None or len(self._buffer) < amt:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        size = len(self._buffer) if amt is None else min(amt, len(self._buffer))
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def close(self) -> None:
+        self._response.close()
+
+
+class Http2Adapter(BaseAdapter):
+    """
+    经 httpx 发送请求的 requests 传输适配器，与主机协商出 HTTP/2 时多个并发请求复用同一个连接。
+
+    只挂载到不依赖 Cookie 的主机（搜索 API、图片 CDN）：响应中的 Set-Cookie 不会写回 Session 的 Cookie。
+    verify、cert、proxies 使用 httpx 客户端的默认值。
+    """
+
+    def __init__(self, max_connections: int = 10):
+        super().__init__()
+        import httpx
+        self._httpx = httpx
+        self.max_connections = max_connections
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        """httpx 客户端；close() 后再次使用时重新创建，因为适配器由多个 Session 共享，其中之一关闭不应影响其他会话"""
+        with self._lock:
+            if self._client is None:
+                limits = self._httpx.Limits(max_connections=self.max_connections,
+                                            max_keepalive_connections=self.max_connections)
+                self._client = self._httpx.Client(http2=True, limits=limits)
+            return self._client
+
+    def send(self, request: requests.PreparedRequest, stream: bool = False, timeout=None, verify=True,
+             cert=None, proxies=None) -> requests.Response:
+        httpx = self._httpx
+        if isinstance(timeout, tuple):
+            connect, read = timeout
+            timeout = httpx.Timeout(read, connect=connect)
+        else:
+            timeout = httpx.Timeout(timeout)
+        client = self.client
+        outgoing = client.build_request(request.method, request.url, headers=list(request.headers.items()),
+                                        content=request.body, timeout=timeout)
+        try:
+            incoming = client.send(outgoing, stream=True)
+        except httpx.ConnectTimeout as e:
+            raise requests.ConnectTimeout(e, request=request)
+        except httpx.TimeoutException as e:
+            raise requests.ReadTimeout(e, request=request)
+        except httpx.TransportError as e:
+            raise requests.ConnectionError(e, request=request)
+
+        response = requests.Response()
+        response.status_code = incoming.status_code
+        # 与 urllib3 一致，同名响应头以逗号合并
+        headers = CaseInsensitiveDict()
+        for name, value in incoming.headers.multi_items():
+            headers[name] = f"{headers[name]}, {value}" if name in headers else value
+        response.headers = headers
+        response.encoding = get_encoding_from_headers(headers)
+        response.reason = incoming.reason_phrase
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response.raw = _Http2Body(incoming)
+        return response
+
+    def close(self) -> None:
+        with self._lock:
+            client, self._client = self._client, None
+        if client is not None:
+            client.close()
+
+
+class ConnectionPools:
+    """
+    所有请求共用的连接池：按主机配置池大小，保持长连接，可选地对部分主机使用 HTTP/2。
+
+    mount() 把同一组传输适配器挂载到任意多个 requests.Session 上，各会话的 Cookie 和默认请求头互不影响，
+    但发往同一主机的请求共用连接，TLS 握手和 TCP 建连只在首次访问时发生。
+    http2_hosts 中的主机在安装了 httpx 和 h2 时经 Http2Adapter 发送，否则与其他主机一样使用 HTTP/1.1 连接池。
+
+    Args:
+        pool_sizes (dict): 主机名 -> 该主机保持的最大连接数。
+        default_size (int): 未配置主机的最大连接数。
+        http2_hosts (Iterable[str]): 尝试使用 HTTP/2 的主机。
+        max_hosts (int): 未配置主机共用的适配器最多缓存的主机连接池数。
+    """
+
+    def __init__(self, pool_sizes: Optional[Dict[str, int]] = None, default_size: int = 10,
+                 http2_hosts: Iterable[str] = (), max_hosts: int = 32):
+        self.pool_sizes = dict(pool_sizes or {})
+        self.default_size = default_size
+        self.http2_hosts = set(http2_hosts) if http2_available() else set()
+        if http2_hosts and not self.http2_hosts:
+            logger.debug("未安装 httpx[http2]，所有主机使用 HTTP/1.1")
+        self.max_hosts = max_hosts
+        self._adapters: Optional[Dict[str, BaseAdapter]] = None
+        self._lock = threading.Lock()
+
+    def adapters(self) -> Dict[str, BaseAdapter]:
+        """URL 前缀 -> 传输适配器，首次调用时创建"""
+        with self._lock:
+            if self._adapters is None:
+                default = HTTPAdapter(pool_connections=self.max_hosts, pool_maxsize=self.default_size)
+                adapters = {'https://': default, 'http://': default}
+                for host in set(self.pool_sizes) | self.http2_hosts:
+                    size = self.pool_sizes.get(host, self.default_size)
+                    if host in self.http2_hosts:
+                        adapter = Http2Adapter(size)
+                    else:
+                        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=size)
+                    adapters[f'https://{host}/'] = adapter
+                    adapters[f'http://{host}/'] = adapter
+                self._adapters = adapters
+            return self._adapters
+
+    def mount(self, session: requests.Session) -> requests.Session:
+        """把共享的适配器挂载到 session 上并返回它"""
+        for prefix, adapter in self.adapters().items():
+            session.mount(prefix, adapter)
+        return session
+
+    def session(self) -> requests.Session:
+        """新建一个使用共享连接池的会话"""
+        return self.mount(requests.Session())
+
+    def close(self) -> None:
+        with self._lock:
+            adapters, self._adapters = self._adapters, None
+        for adapter in set((adapters or {}).values()):
+            adapter.close()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import threading
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+
+class LatencyTracker:
+    """
+    按主机记录最近的请求延迟，由观测到的分位数推导超时和对冲时机。
+
+    每个来源的搜索 API 都在独立的主机上，图片 CDN 也各自分开，因此按主机统计即可区分来源，
+    又不会把搜索请求和图片请求的延迟混在一起。样本不足 min_samples 时使用固定的默认超时且不对冲。
+
+    Args:
+        window (int): 每个主机保留的最近样本数。
+        min_samples (int): 开始使用分位数所需的最少样本数。
+        default_timeout (float): 样本不足时的超时（秒）。
+        timeout_bounds (tuple): 自适应超时的 (下限, 上限)（秒）。
+        timeout_factor (float): 超时 = p99 * timeout_factor。
+        hedge_percentile (float): 请求耗时超过该分位数时发送对冲请求。
+        hedge_ratio (float): 对冲请求数占该主机请求数的上限，避免在主机整体变慢时成倍增加负载。
+    """
+
+    def __init__(self, window: int = 200, min_samples: int = 20, default_timeout: float = 10,
+                 timeout_bounds: Tuple[float, float] = (2, 30), timeout_factor: float = 3,
+                 hedge_percentile: float = 95, hedge_ratio: float = 0.1):
+        self.window = window
+        self.min_samples = min_samples
+        self.default_timeout = default_timeout
+        self.timeout_bounds = timeout_bounds
+        self.timeout_factor = timeout_factor
+        self.hedge_percentile = hedge_percentile
+        self.hedge_ratio = hedge_ratio
+        self._samples: Dict[str, Deque[float]] = {}
+        self._counts: Dict[str, list] = {}  # 主机 -> [请求数, 对冲数]
+        self._lock = threading.Lock()
+
+    def record(self, host: str, seconds: float) -> None:
+        """记录一次请求（到收到响应头为止）的耗时；超时的请求记录实际等待的时间"""
+        with self._lock:
+            samples = self._samples.get(host)
+            if samples is None:
+                samples = self._samples[host] = deque(maxlen=self.window)
+                self._counts[host] = [0, 0]
+            samples.append(seconds)
+            self._counts[host][0] += 1
+
+    def percentile(self, host: str, point: float) -> Optional[float]:
+        """最近样本的分位数（最近秩法），样本不足时返回 None"""
+        with self._lock:
+            samples = sorted(self._samples.get(host, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, max(0, int(round(point / 100 * len(samples))) - 1))]
+
+    def timeout(self, host: str) -> float:
+        """该主机当前的请求超时（秒）"""
+        p99 = self.percentile(host, 99)
+        if p99 is None:
+            return self.default_timeout
+        low, high = self.timeout_bounds
+        return min(high, max(low, p99 * self.timeout_factor))
+
+    def hedge_delay(self, host: str) -> Optional[float]:
+        """请求超过多少秒仍未返回时发送对冲请求，样本不足时返回 None（不对冲）"""
+        return self.percentile(host, self.hedge_percentile)
+
+    def try_hedge(self, host: str) -> bool:
+        """对冲预算内返回 True 并计入一次对冲"""
+        with self._lock:
+            counts = self._counts.get(host)
+            if counts is None or counts[1] + 1 > counts[0] * self.hedge_ratio:
+                return False
+            counts[1] += 1
+            return True
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """各主机的样本数、p50 / p95 / p99 和当前超时，供基准和调试输出"""
+        with self._lock:
+            hosts = list(self._samples)
+        return {
+            host: {
+                'samples': len(self._samples[host]),
+                'p50': self.percentile(host, 50),
+                'p95': self.percentile(host, 95),
+                'p99': self.percentile(host, 99),
+                'timeout': self.timeout(host),
+            }
+            for host in hosts
+        }
@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# 当前线程正在处理的上下文标签（如来源、标题），由 Metrics.labels() 设置
+_context: contextvars.ContextVar = contextvars.ContextVar('metrics_context', default={})
+
+# 从上下文自动带入聚合指标的标签；标题等高基数标签只写入事件日志
+AGGREGATE_LABELS = ('source',)
+
+
+class Metrics:
+    """
+    线程安全的计数器与分阶段计时器。
+
+    计数器（请求数、字节数、重试、缓存命中、等待时间等）、计时器（warmup、search、parse、
+    match、probe、download 等阶段耗时）和取最新值的状态量（如熔断器状态）按标签聚合，
+    可导出为 JSON Lines 或 Prometheus 文本格式。
+    labels() 设置的来源标签会自动加到其间记录的所有指标上，因此下层代码无需知道自己属于哪个来源。
+    调用 log_events() 后，每次计时还会追加一行 JSON 事件（包含标题等上下文），便于逐个标题分析耗时。
+    """
+
+    def __init__(self):
+        self._counters: Dict[Tuple[str, Tuple], float] = {}
+        self._timers: Dict[Tuple[str, Tuple], List[float]] = {}
+        self._gauges: Dict[Tuple[str, Tuple], float] = {}
+        self._lock = threading.Lock()
+        self._events = None
+
+    @contextmanager
+    def labels(self, **labels) -> Iterator[None]:
+        """在当前线程内为之后记录的指标附加标签"""
+        token = _context.set({**_context.get(), **labels})
+        try:
+            yield
+        finally:
+            _context.reset(token)
+
+    @staticmethod
+    def _key(name: str, labels: Dict) -> Tuple[str, Tuple]:
+        context = _context.get()
+        merged = {label: context[label] for label in AGGREGATE_LABELS if label in context}
+        merged.update((label, value) for label, value in labels.items() if value is not None)
+        return name, tuple(sorted((label, str(value)) for label, value in merged.items()))
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        """累加计数器"""
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels) -> None:
+        """设置状态量的当前值"""
+        key = self._key(name, labels)
+        with self._lock:
+            self._gauges[key] = value
+
+    def observe(self, stage: str, seconds: float, **labels) -> None:
+        """记录一次阶段耗时"""
+        key = self._key('stage_seconds', dict(labels, stage=stage))
+        with self._lock:
+            stats = self._timers.get(key)
+            if stats is None:
+                stats = self._timers[key] = [0, 0.0, 0.0]  # 次数, 总耗时, 最大耗时
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+            if self._events is not None:
+                event = {'ts': time.time(), 'stage': stage, 'seconds': round(seconds, 6),
+                         **_context.get(), **labels}
+                self._events.write(json.dumps(event, ensure_ascii=False, default=str) + '\n')
+
+    @contextmanager
+    def timer(self, stage: str, **labels) -> Iterator[None]:
+        """计时上下文，异常退出时同样记录耗时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start, **labels)
+
+    def log_events(self, path: Optional[str]) -> None:
+        """开始（path 为 None 时停止）把每次计时追加写入 JSON Lines 事件日志"""
+        with self._lock:
+            if self._events is not None:
+                self._events.close()
+                self._events = None
+            if path:
+                directory = os.path.dirname(path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._events = open(path, 'a', encoding='utf-8', buffering=1)
+
+    def snapshot(self) -> List[Dict]:
+        """当前所有指标的快照，每个指标一项"""
+        with self._lock:
+            counters = list(self._counters.items())
+            timers = [(key, list(stats)) for key, stats in self._timers.items()]
+            gauges = list(self._gauges.items())
+        result = [{'type': 'counter', 'name': name, 'labels': dict(labels), 'value': value}
+                  for (name, labels), value in sorted(counters)]
+        result += [{'type': 'gauge', 'name': name, 'labels': dict(labels), 'value': value}
+                   for (name, labels), value in sorted(gauges)]
+        result += [{'type': 'timer', 'name': name, 'labels': dict(labels),
+                    'count': count, 'sum': total, 'max': peak}
+                   for (name, labels), (count, total, peak) in sorted(timers)]
+        return result
+
+    def to_json_lines(self) -> str:
+        """快照导出为 JSON Lines，每行一个指标"""
+        now = time.time()
+        return ''.join(json.dumps(dict(item, ts=now), ensure_ascii=False) + '\n' for item in self.snapshot())
+
+    def to_prometheus(self, prefix: str = 'anime_cover') -> str:
+        """快照导出为 Prometheus 文本格式；计数器加 _total 后缀，计时器导出为 summary，最大耗时和状态量导出为 gauge"""
+        families: Dict[str, Tuple[str, List[str]]] = {}
+
+        def add(name: str, kind: str, line: str) -> None:
+            families.setdefault(name, (kind, []))[1].append(line)
+
+        for item in self.snapshot():
+            name = f"{prefix}_{item['name']}"
+            labels = _format_labels(item['labels'])
+            if item['type'] == 'counter':
+                add(f"{name}_total", 'counter', f"{name}_total{labels} {_format_value(item['value'])}")
+            elif item['type'] == 'gauge':
+                add(name, 'gauge', f"{name}{labels} {_format_value(item['value'])}")
+            else:
+                add(name, 'summary', f"{name}_count{labels} {item['count']}")
+                add(name, 'summary', f"{name}_sum{labels} {_format_value(item['sum'])}")
+                add(f"{name}_max", 'gauge', f"{name}_max{labels} {_format_value(item['max'])}")
+        lines = []
+        for name, (kind, samples) in families.items():
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path: str) -> None:
+        """写入快照文件：.prom / .txt 为 Prometheus 文本格式，其他为 JSON Lines"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        text = self.to_prometheus() if path.endswith(('.prom', '.txt')) else self.to_json_lines()
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    def reset(self) -> None:
+        """清空全部指标"""
+        with self._lock:
+            self._counters.clear()
+            self._timers.clear()
+            self._gauges.clear()
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    """Prometheus 标签，值中的反斜杠、双引号和换行需要转义"""
+    if not labels:
+        return ''
+    escaped = []
+    for name, value in sorted(labels.items()):
+        value = value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        escaped.append(f'{name}="{value}"')
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# 进程内共享的默认指标集合
+METRICS = Metrics()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+
+class TokenBucket:
+    """
+    线程安全的令牌桶。
+
+    令牌以 rate 个/秒的速度补充，最多积攒 burst 个。取令牌时允许余额为负，
+    相当于预约未来的令牌，后到的调用方会按顺序等待更久，从而保证总体速率不超限。
+    """
+
+    def __init__(self, rate: float, burst: float):
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate 必须大于 0，burst 不能小于 1")
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: float = 1) -> float:
+        """预约令牌，返回调用方需要等待的秒数（0 表示可以立即发送）"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """余额足够时立即取走令牌并返回 True，否则不预约、返回 False"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < tokens:
+                return False
+            self._tokens -= tokens
+            return True
+
+    def acquire(self, tokens: float = 1) -> float:
+        """阻塞直到取得令牌，返回实际等待的秒数"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class HostRateLimiter:
+    """
+    按主机名划分的限速器，每个主机一个令牌桶。
+
+    Args:
+        limits (dict): 主机名到 (每秒请求数, 突发上限) 的映射。
+        default (tuple): 未配置主机使用的 (每秒请求数, 突发上限)。
+    """
+
+    def __init__(self, limits: Optional[Dict[str, Tuple[float, float]]] = None,
+                 default: Tuple[float, float] = (5, 10)):
+        self.limits = dict(limits or {})
+        self.default = default
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, host: str) -> TokenBucket:
+        """返回主机对应的令牌桶，首次访问时创建"""
+        host = (host or '').lower()
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                rate, burst = self.limits.get(host, self.default)
+                bucket = self._buckets[host] = TokenBucket(rate, burst)
+            return bucket
+
+    def acquire(self, url: str) -> float:
+        """在向 url 发送请求前调用，阻塞直到该主机有可用令牌，返回等待秒数"""
+        return self.bucket(urlparse(url).hostname).acquire()
+
+    def try_acquire(self, url: str) -> bool:
+        """该主机有空闲令牌时立即取走并返回 True，不等待；用于可有可无的请求（如对冲请求）"""
+        return self.bucket(urlparse(url).hostname).try_acquire()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Optional
+
+import requests
+
+from utils.metrics import METRICS, Metrics
+
+# 可能在稍后成功的 HTTP 状态码；其他 4xx（如 404、403）重试也不会有不同结果
+TRANSIENT_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+# 服务器用 Retry-After 指明等待时间的状态码
+RETRY_AFTER_STATUSES = frozenset({429, 503})
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After（秒数或 HTTP 日期），返回需要等待的秒数，无法解析时返回 None"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def error_status(error: requests.HTTPError) -> Optional[int]:
+    """HTTPError 对应的状态码：优先使用异常自带的 status（如 GraphQL 错误中的状态码），否则为响应的状态码"""
+    status = getattr(error, 'status', None)
+    if status is None and error.response is not None:
+        status = error.response.status_code
+    return status
+
+
+class RetryBudget:
+    """
+    重试预算：每个首次请求存入 ratio 个令牌，每次重试取走 1 个，最多积攒 reserve 个。
+
+    来源整体故障时重试数不会超过正常请求数的 ratio 倍，不会成倍放大对方的负载；
+    偶发错误可以用积攒的令牌立即重试。
+    """
+
+    def __init__(self, ratio: float = 0.2, reserve: float = 10):
+        self.ratio = ratio
+        self.reserve = reserve
+        self._tokens = float(reserve)
+        self._lock = threading.Lock()
+
+    def deposit(self) -> None:
+        with self._lock:
+            self._tokens = min(self.reserve, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class RetryPolicy:
+    """
+    统一的 HTTP 重试策略：指数退避加全抖动，遵守 429 / 503 的 Retry-After，每个来源一份重试预算。
+
+    只重试暂时性错误：连接错误、超时，以及 TRANSIENT_STATUSES 中的状态码（包括 send 抛出的带有这些状态码的
+    requests.HTTPError，例如 HTTP 200 响应体中报告的限流错误）；
+    其他响应（包括 404 这类"确实没有"的结果）原样返回，由调用方处理。
+    Retry-After 超过 max_delay 时不再重试，直接返回该响应。
+
+    Args:
+        max_attempts (int): 包括首次请求在内的最多尝试次数。
+        base_delay (float): 第一次重试的退避上限（秒），之后每次翻倍。
+        max_delay (float): 单次等待的上限（秒）。
+        budget_ratio (float): 每个来源的重试数占请求数的上限，见 RetryBudget。
+        budget_reserve (float): 每个来源可积攒的重试次数。
+        metrics (Metrics): 记录重试次数和等待时间，默认为共享的 METRICS。
+        sleep (Callable): 等待函数，默认 time.sleep。
+    """
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 30,
+                 budget_ratio: float = 0.2, budget_reserve: float = 10, metrics: Optional[Metrics] = None,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget_ratio = budget_ratio
+        self.budget_reserve = budget_reserve
+        self.metrics = metrics or METRICS
+        self.sleep = sleep
+        self._budgets: Dict[str, RetryBudget] = {}
+        self._lock = threading.Lock()
+
+    def budget(self, key: str) -> RetryBudget:
+        """返回 key（来源名）对应的重试预算，首次访问时创建"""
+        with self._lock:
+            budget = self._budgets.get(key)
+            if budget is None:
+                budget = self._budgets[key] = RetryBudget(self.budget_ratio, self.budget_reserve)
+            return budget
+
+    def backoff(self, attempt: int) -> float:
+        """第 attempt 次重试（从 1 开始）的等待时间：[0, min(max_delay, base_delay * 2^(attempt-1))] 内均匀分布"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def call(self, send: Callable[[], requests.Response], key: str) -> requests.Response:
+        """
+        调用 send 发送请求，遇到暂时性错误时按策略重试。
+
+        Returns:
+            requests.Response: 最后一次得到的响应（可能仍是错误状态码）。
+
+        Raises:
+            requests.RequestException: 最后一次尝试的网络异常，以及非暂时性的网络异常。
+        """
+        budget = self.budget(key)
+        budget.deposit()
+        attempt = 1
+        while True:
+            try:
+                response = send()
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if not self._may_retry(attempt, budget, key):
+                    raise
+                reason, delay = type(e).__name__, self.backoff(attempt)
+            except requests.HTTPError as e:
+                status = error_status(e)
+                if status not in TRANSIENT_STATUSES or not self._may_retry(attempt, budget, key):
+                    raise
+                reason, delay = f'status_{status}', self.backoff(attempt)
+            else:
+                if response.status_code not in TRANSIENT_STATUSES:
+                    return response
+                reason, delay = f'status_{response.status_code}', self.backoff(attempt)
+                if response.status_code in RETRY_AFTER_STATUSES:
+                    retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                    if retry_after is not None:
+                        if retry_after > self.max_delay:
+                            return response
+                        delay = retry_after
+                if not self._may_retry(attempt, budget, key):
+                    return response
+                response.close()
+            self.metrics.inc('retries', reason=reason)
+            self.metrics.inc('sleep_seconds', delay, reason='retry')
+            self.sleep(delay)
+            attempt += 1
+
+    def _may_retry(self, attempt: int, budget: RetryBudget, key: str) -> bool:
+        if attempt >= self.max_attempts:
+            return False
+        if not budget.withdraw():
+            self.metrics.inc('retry_budget_exhausted', budget=key)
+            return False
+        return True
@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from typing import List, Sequence
+
+from rapidfuzz import fuzz, process
+
+from utils.helpers import clean_title, normalize_title
+
+
+def title_key(title: str) -> str:
+    """标题的比较键：清理 HTML 后标准化"""
+    return normalize_title(clean_title(title))
+
+
+class TitleMatcher:
+    """
+    标题匹配器：查询标题只标准化一次，候选标题一次性批量打分。
+
+    分数与 fuzzywuzzy 的 fuzz.ratio 一致（0-100 的整数），打分在 rapidfuzz 的 C 实现中完成。
+
+    Args:
+        query (str): 要搜索的动漫名称。
+    """
+
+    def __init__(self, query: str):
+        self.query = query
+        self.key = title_key(query)
+
+    def scores(self, titles: Sequence[str]) -> List[int]:
+        """返回每个候选标题与查询标题的相似度，顺序与 titles 一致"""
+        keys = [title_key(title) for title in titles]
+        result = [0] * len(keys)
+        for _, score, index in process.extract(self.key, keys, scorer=fuzz.ratio, limit=None):
+            result[index] = int(round(score))
+        return result
+
+    def score(self, title: str) -> int:
+        """单个候选标题的相似度"""
+        return int(round(fuzz.ratio(self.key, title_key(title))))
+
+    def is_exact(self, titles: Sequence[str]) -> bool:
+        """任一标题（如主标题或别名）标准化后与查询标题完全相同"""
+        return any(title_key(title) == self.key for title in titles)